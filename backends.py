@@ -0,0 +1,373 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtest import METRICS, run_backtest, threshold_sweep
+from batching import create_batcher
+from incremental import IncrementalForecaster
+from lstm_runtime import load_lstm
+from metrics import stage
+from response_formats import json_options, json_response
+from scaling import fit_min_max, min_max_inverse, min_max_transform
+from svm_pipeline import model_feature_columns, svm_features
+from windowing import WINDOW, lookback_windows
+
+MODEL_LOAD_TIMEOUT = float(os.environ.get('MODEL_LOAD_TIMEOUT', 30))
+MAX_BATCH_SYMBOLS = 500
+
+
+def _number(value):
+    # JSON-friendly float (NaN becomes null)
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+# ---------------- LSTM ----------------
+class LSTMBackend:
+    """Closing-price forecasts of the LSTM (``model/model.pkl``, ``model/lstm/<version>/``).
+
+    Only the validation tail is predicted, through the shared batcher and the
+    incremental forecaster that ``setup`` builds around every loaded model.
+    A current NumPy export (``model.npz`` next to the pickle) is served
+    without TensorFlow; ``LSTM_RUNTIME=keras|numpy`` forces one or the other.
+    """
+
+    name = 'lstm'
+    default_file = 'model.pkl'
+
+    def loader(self, path):
+        return load_lstm(path, os.environ.get('LSTM_RUNTIME', 'auto'))
+
+    def setup(self, model):
+        # Concurrent /predictions requests share one model.predict call
+        batcher = create_batcher(model.predict)
+        return {'batcher': batcher, 'forecaster': IncrementalForecaster(batcher.predict)}  # Per-symbol prediction series
+
+    def teardown(self, extras):
+        # The batcher thread holds the model; stop it when the registry drops this version
+        extras['batcher'].close()
+
+    def predict_many(self, loaded, jobs):
+        """Date/Close/Predictions frames (or the exception raised) for every ``(symbol, start_date, bars)`` job."""
+        series = [((symbol, pd.Timestamp(start_date).strftime('%Y-%m-%d')), df['Date'].values, df['Close'].values)
+                  for symbol, start_date, df in jobs]
+        # One stacked inference pass; only windows for bars added since a series was last served are scored
+        results = loaded.extras['forecaster'].forecast_many(series)
+        frames = []
+        for (_, _, df), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                frames.append(result)
+                continue
+            predictions, training_data_len = result
+            valid = df[['Date', 'Close']][training_data_len:].copy()
+            valid['Predictions'] = predictions
+            frames.append(valid)
+        return frames
+
+    def score_many(self, model, frames, window=WINDOW, train_fraction=0.8):
+        """Next-close forecast and validation RMSE of every bars frame, or the exception raised for it.
+
+        The windows are scaled and split as in /predictions; every frame also
+        gets one window past its last bar, the forecast.  All windows go
+        through one ``model.predict`` call.
+        """
+        jobs = []
+        for df in frames:
+            try:
+                closes = np.asarray(df['Close'], dtype=np.float64)
+                training_data_len = math.ceil(len(closes) * train_fraction)
+                if training_data_len < window:
+                    raise ValueError(f"At least {window} bars of history are needed before the validation split")
+                params = fit_min_max(closes.reshape(-1, 1))
+                scaled = min_max_transform(closes[training_data_len - window:].reshape(-1, 1), params)[:, 0]
+                x = np.concatenate([lookback_windows(scaled, window), scaled[np.newaxis, -window:, np.newaxis]])
+                jobs.append((df, closes, training_data_len, params, x))
+            except Exception as e:
+                jobs.append(e)
+        pending = [job for job in jobs if not isinstance(job, Exception)]
+        if not pending:
+            return jobs
+        try:
+            with stage('predict'):
+                scored = np.asarray(model.predict(np.concatenate([job[4] for job in pending]), verbose=0))
+        except Exception as e:
+            return [job if isinstance(job, Exception) else e for job in jobs]
+
+        results, offset = [], 0
+        for job in jobs:
+            if isinstance(job, Exception):
+                results.append(job)
+                continue
+            df, closes, training_data_len, params, x = job
+            predictions = min_max_inverse(scored[offset:offset + len(x)].reshape(-1, 1), params)[:, 0]
+            offset += len(x)
+            forecast = predictions[-1]
+            errors = predictions[:-1] - closes[training_data_len:]
+            results.append({
+                'date': pd.Timestamp(df['Date'].iloc[-1]).strftime('%Y-%m-%d'),
+                'close': _number(closes[-1]),
+                'forecast': _number(forecast),
+                'forecast_return': _number(forecast / closes[-1] - 1.0),
+                'rmse': _number(np.sqrt(np.mean(errors ** 2))),
+            })
+        return results
+
+    def register_routes(self, app, models, fetch_many, live):
+        """GET /batch_stats and /forecast_stats."""
+        from flask import jsonify
+
+        @app.route("/batch_stats", methods=["GET"])
+        def get_batch_stats():
+            # Batch size and queue wait metrics of the prediction batcher
+            return jsonify(models.get(timeout=MODEL_LOAD_TIMEOUT).extras['batcher'].stats())
+
+        @app.route("/forecast_stats", methods=["GET"])
+        def get_forecast_stats():
+            # Incremental vs full recompute counts of the forecaster
+            return jsonify(models.get(timeout=MODEL_LOAD_TIMEOUT).extras['forecaster'].stats())
+
+
+# ---------------- SVM ----------------
+def svm_predictions(df, predicted_signal):
+    """Strategy returns for ``df`` and the Date/Close/Predictions response frame."""
+    df['Predicted_Signal'] = predicted_signal
+
+    # Daily, strategy and cumulative returns from the shared backtest engine
+    result = run_backtest(df[['Close']].to_numpy(), df[['Predicted_Signal']].to_numpy())
+    df['Return'] = result['returns'][:, 0]
+    df['Strategy_Return'] = result['strategy_returns'][:, 0]
+    df['Cum_Ret'] = result['cum_returns'][:, 0]
+    df['Cum_Strategy'] = result['cum_strategy'][:, 0]
+
+    data = df[['Date', 'Close']].copy()
+
+    #Shift the 'Close' prices by 1 day to simulate the prediction and use the prediction to simulate a possible action, if the signal is one then use close and if 0 then use close from the day before
+    data['Predictions'] = (df['Close'].shift(1) * (df['Predicted_Signal'])) + (df['Close'].shift(1) * (1 - df['Predicted_Signal']))
+    data['Predictions'] = data['Predictions'].fillna(data['Close'])
+    return data
+
+
+def _complete_rows(model, X):
+    # Rows with every feature present (indicators warm up over the first bars), in the form the model was fitted on
+    mask = X.notna().all(axis=1).to_numpy()
+    rows = X[mask]
+    return mask, rows if hasattr(model, "feature_names_in_") else rows.to_numpy()
+
+
+def svm_signals(model, X):
+    """0/1 signals of the rows of ``X``; rows with missing features get 0 (no position)."""
+    mask, rows = _complete_rows(model, X)
+    signals = np.zeros(len(X))
+    if mask.any():
+        with stage('predict'):
+            signals[mask] = model.predict(rows)
+    return signals
+
+
+def svm_scores(model, X):
+    """Continuous SVM scores (signed distance to the boundary, > 0 means up); falls back to the 0/1 signal.
+
+    Rows with missing features score NaN.
+    """
+    mask, rows = _complete_rows(model, X)
+    scores = np.full(len(X), np.nan)
+    if mask.any():
+        with stage('predict'):
+            scores[mask] = model.decision_function(rows) if hasattr(model, "decision_function") else model.predict(rows)
+    return scores
+
+
+def metrics_dict(metrics, symbols):
+    """Per-symbol metrics as JSON-friendly floats (NaN becomes null)."""
+    return {
+        s: {name: (None if np.isnan(metrics[name][i]) else metrics[name][i].item()) for name in METRICS}
+        for i, s in enumerate(symbols)
+    }
+
+
+class SVMBackend:
+    """Up/down signals of the SVM (``model/svm.pkl``, ``model/svm/<version>/``), plus /backtest and live-bar signals."""
+
+    name = 'svm'
+    default_file = 'svm.pkl'
+    setup = None
+    teardown = None
+    loader = None
+
+    def predict_many(self, loaded, jobs):
+        """Date/Close/Predictions frames (or the exception raised) for every ``(symbol, start_date, bars)`` job."""
+        frames, features = [], []
+        columns = model_feature_columns(loaded.model)
+        for _, _, df in jobs:
+            try:
+                with stage('features'):
+                    features.append((df, svm_features(df, columns)))
+                frames.append(None)
+            except Exception as e:
+                frames.append(e)
+        if not features:
+            return frames
+
+        # One stacked model.predict over the features of every symbol
+        try:
+            signals = svm_signals(loaded.model, pd.concat([X for _, X in features], ignore_index=True))
+        except Exception as e:
+            return [frame if frame is not None else e for frame in frames]
+        offset = 0
+        results = iter(features)
+        for i, frame in enumerate(frames):
+            if frame is None:
+                df, X = next(results)
+                with stage('strategy'):
+                    frames[i] = svm_predictions(df, signals[offset:offset + len(X)])
+                offset += len(X)
+        return frames
+
+    def score_many(self, model, frames):
+        """Latest SVM score and signal of every bars frame plus its backtest metrics, or the exception raised.
+
+        Positions follow the score as in /backtest; one stacked
+        ``decision_function`` call covers every frame.
+        """
+        results, features = [], []
+        columns = model_feature_columns(model)
+        for df in frames:
+            try:
+                with stage('features'):
+                    features.append((df, svm_features(df, columns)))
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        if not features:
+            return results
+        try:
+            scores = svm_scores(model, pd.concat([X for _, X in features], ignore_index=True))
+        except Exception as e:
+            return [result if result is not None else e for result in results]
+
+        offset = 0
+        pending = iter(features)
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            df, X = next(pending)
+            score = scores[offset:offset + len(X)]
+            offset += len(X)
+            signal = np.where(np.isnan(score), 0.0, score > 0)
+            with stage('strategy'):
+                backtest = run_backtest(df[['Close']].to_numpy(dtype=np.float64), signal[:, np.newaxis], keep_series=False)
+            results[i] = {
+                'date': pd.Timestamp(df['Date'].iloc[-1]).strftime('%Y-%m-%d'),
+                'close': _number(df['Close'].iloc[-1]),
+                'score': _number(score[-1]),
+                'signal': int(signal[-1]),
+                'metrics': metrics_dict(backtest['metrics'], [None])[None],
+            }
+        return results
+
+    def register_routes(self, app, models, fetch_many, live):
+        """POST /backtest and POST /predictions/live."""
+        from datetime import date
+
+        from flask import jsonify, request
+
+        @app.route("/backtest", methods=["POST"])
+        def get_backtest():
+            # Backtest the SVM strategy over a universe of symbols, optionally sweeping signal thresholds
+            request_data = request.get_json(silent=True) or {}
+            symbols = request_data.get("symbols")
+            start_date = request_data.get("start_date", '2015-01-01')
+            end_date = request_data.get("end_date", str(date.today()))
+            thresholds = request_data.get("thresholds")
+            if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) for s in symbols):
+                return jsonify({"error": "'symbols' must be a non-empty list of ticker symbols"}), 400
+            if len(symbols) > MAX_BATCH_SYMBOLS:
+                return jsonify({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per backtest"}), 400
+            try:
+                cost_bps = float(request_data.get("cost_bps", 0.0))
+                compound = bool(request_data.get("compound", False))
+                if thresholds is not None:
+                    thresholds = [float(t) for t in thresholds]
+            except (TypeError, ValueError):
+                return jsonify({"error": "'cost_bps' and 'thresholds' must be numbers"}), 400
+            loaded = models.get(request_data.get("model"), timeout=MODEL_LOAD_TIMEOUT)
+
+            # Fetch bars concurrently, then align every symbol on one date index
+            closes, frames, errors = {}, {}, {}
+            for stock_symbol, df, error in fetch_many(symbols, start_date, end_date):
+                if error is not None:
+                    errors[stock_symbol] = error
+                else:
+                    frames[stock_symbol] = df
+            if not frames:
+                return jsonify({"error": "Failed to retrieve stock data", "errors": errors}), 500
+
+            # One stacked decision_function over the features of every symbol
+            names = [s for s in dict.fromkeys(symbols) if s in frames]
+            columns = model_feature_columns(loaded.model)
+            with stage('features'):
+                features = [svm_features(frames[s], columns) for s in names]
+            scores = svm_scores(loaded.model, pd.concat(features, ignore_index=True))
+            offset = 0
+            score_columns = {}
+            for stock_symbol, X in zip(names, features):
+                index = pd.DatetimeIndex(frames[stock_symbol]['Date'])
+                closes[stock_symbol] = pd.Series(frames[stock_symbol]['Close'].to_numpy(), index=index)
+                score_columns[stock_symbol] = pd.Series(scores[offset:offset + len(X)], index=index)
+                offset += len(X)
+            close_panel = pd.DataFrame(closes)[names]
+            score_panel = pd.DataFrame(score_columns).reindex(close_panel.index)[names].to_numpy()
+
+            # Positions follow model.predict: long when the score is above the decision boundary
+            signal = np.where(np.isnan(score_panel), 0.0, score_panel > 0)
+            result = run_backtest(close_panel.to_numpy(), signal, cost_bps=cost_bps, compound=compound, keep_series=False)
+            response = {
+                "start": close_panel.index[0].strftime('%Y-%m-%d'),
+                "end": close_panel.index[-1].strftime('%Y-%m-%d'),
+                "dates": len(close_panel),
+                "metrics": metrics_dict(result['metrics'], names),
+                "errors": errors,
+            }
+            if thresholds:
+                sweep = threshold_sweep(close_panel.to_numpy(), score_panel, thresholds, cost_bps=cost_bps, compound=compound)
+                response["sweep"] = [
+                    {"threshold": t, "metrics": metrics_dict({name: sweep[name][k] for name in METRICS}, names)}
+                    for k, t in enumerate(thresholds)
+                ]
+            return jsonify(response)
+
+        @app.route("/predictions/live", methods=["POST"])
+        def get_live_predictions_data():
+            # SVM signals on the live bars aggregated from the WebSocket trades
+            request_data = request.get_json()
+            stock_symbol = request_data.get("symbol", "BINANCE:BTCUSDT")
+            interval = request_data.get("interval", "1m")
+            try:
+                options = json_options(request)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            live.start()  # Live bars need the feed
+            if interval not in live.bar_aggregator.intervals:
+                return jsonify({"error": f"'interval' must be one of {list(live.bar_aggregator.intervals)}"}), 400
+            df = live.bar_aggregator.bars(stock_symbol, interval, request_data.get("n"))
+            if df.empty:
+                return jsonify({"error": f"No completed {interval} bars for {stock_symbol} yet"}), 404
+            model = models.get(request_data.get("model"), timeout=MODEL_LOAD_TIMEOUT).model
+            with stage('features'):
+                X = svm_features(df, model_feature_columns(model))
+            data = svm_predictions(df, svm_signals(model, X))
+            with stage('serialize'):
+                return json_response(data[['Date', 'Close', 'Predictions']], **options)
+
+
+BACKENDS = {'lstm': LSTMBackend, 'svm': SVMBackend}
+
+
+def create_backend(name=None):
+    """Prediction backend by name, or from ``PREDICTION_BACKEND`` (default ``lstm``)."""
+    name = name or os.environ.get('PREDICTION_BACKEND', 'lstm')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown prediction backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
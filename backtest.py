@@ -0,0 +1,122 @@
+import numpy as np
+
+METRICS = ['total_return', 'sharpe', 'max_drawdown', 'hit_rate', 'turnover', 'trades']
+
+
+def asset_returns(close):
+    """Daily simple returns of a (dates x symbols) close panel; the first row and gaps are NaN."""
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.full_like(close, np.nan)
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    return returns
+
+
+def _accumulate(ufunc, values, out=None):
+    """``ufunc.accumulate`` along the dates axis (-2), row by row.
+
+    Each step is one vectorized op over every (signal set, symbol) pair, which
+    is several times faster than NumPy's strided accumulate for wide panels.
+    """
+    if out is None:
+        out = np.array(values, copy=True)
+    elif out is not values:
+        out[...] = values
+    for t in range(1, out.shape[-2]):
+        ufunc(out[..., t - 1, :], out[..., t, :], out=out[..., t, :])
+    return out
+
+
+def run_backtest(close, signal, cost_bps=0.0, periods_per_year=252, compound=False, keep_series=True,
+                 dtype=np.float64):
+    """Vectorized backtest of position signals over a (dates x symbols) panel.
+
+    ``signal`` has shape ``(dates, symbols)`` or ``(..., dates, symbols)`` to
+    evaluate several signal sets at once.  The position held over day t is
+    the signal of day t-1 (``Strategy_Return = Return * Predicted_Signal.shift(1)``
+    as in service2.py), and every unit of position change costs ``cost_bps``.
+    Cumulative returns are summed like the original ``Cum_Ret``/``Cum_Strategy``
+    columns unless ``compound`` is set.
+
+    Returns a dict with per-symbol ``metrics`` (arrays shaped like
+    ``signal`` without the dates axis) and, with ``keep_series``, the
+    ``positions``, ``returns``, ``strategy_returns``, ``cum_returns``,
+    ``cum_strategy`` and ``drawdown`` series.  A boolean ``signal`` skips NaN handling, and
+    ``dtype=np.float32`` halves memory traffic for large sweeps.
+    """
+    returns = asset_returns(close)
+    valid = ~np.isnan(returns)
+    filled = np.where(valid, returns, 0.0).astype(dtype)
+    signal = np.asarray(signal)
+
+    # Work in place on full-size arrays: sweeps make these (thresholds x dates x symbols)
+    position = np.zeros(signal.shape, dtype=dtype)
+    position[..., 1:, :] = signal[..., :-1, :]
+    if signal.dtype != bool:
+        position[np.isnan(position)] = 0.0
+    turnover = np.zeros_like(position)
+    np.subtract(position[..., 1:, :], position[..., :-1, :], out=turnover[..., 1:, :])
+    np.abs(turnover, out=turnover)
+    strategy = position * filled
+    if cost_bps:
+        # Days without a price carry no return and no cost
+        strategy -= turnover * (valid * (cost_bps / 1e4)).astype(dtype)
+
+    observations = valid.sum(axis=0)
+    mean = strategy.sum(axis=-2) / np.maximum(observations, 1)
+    squares = np.einsum('...ij,...ij->...j', strategy, strategy)
+    variance = np.maximum(squares - observations * mean ** 2, 0.0) / np.maximum(observations - 1, 1)
+    std = np.sqrt(variance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), np.nan)
+        invested = ((position != 0) & valid).sum(axis=-2)
+        hit_rate = (strategy > 0).sum(axis=-2) / invested
+    metrics = {
+        'sharpe': sharpe,
+        'hit_rate': hit_rate,
+        'turnover': turnover.sum(axis=-2) / np.maximum(observations, 1),
+        'trades': np.count_nonzero(turnover, axis=-2),
+    }
+    positions = position if keep_series else None
+    del position, turnover
+
+    if compound:
+        cum_strategy = _accumulate(np.multiply, np.add(strategy, 1.0, out=None if keep_series else strategy))
+        cum_strategy -= 1.0
+        peak = _accumulate(np.maximum, cum_strategy)
+        drawdown = (1.0 + cum_strategy) / (1.0 + peak) - 1.0
+    else:
+        cum_strategy = _accumulate(np.add, strategy, out=None if keep_series else strategy)
+        # Peak starts at 0 so an initial loss counts as drawdown
+        peak = _accumulate(np.maximum, np.maximum(cum_strategy, 0.0))
+        drawdown = np.subtract(cum_strategy, peak, out=peak)
+    metrics['total_return'] = cum_strategy[..., -1, :]
+    metrics['max_drawdown'] = drawdown.min(axis=-2)
+
+    result = {'metrics': {name: metrics[name] for name in METRICS}}
+    if keep_series:
+        if compound:
+            cum_returns = np.cumprod(1.0 + filled, axis=0) - 1.0
+        else:
+            cum_returns = np.cumsum(filled, axis=0)
+        result.update(positions=positions, returns=returns, strategy_returns=strategy, cum_returns=cum_returns,
+                      cum_strategy=cum_strategy, drawdown=drawdown)
+    return result
+
+
+def threshold_sweep(close, scores, thresholds, max_elements=10_000_000, **kwargs):
+    """Backtest ``signal = scores > threshold`` for every threshold in one vectorized pass.
+
+    Thresholds are processed in chunks of at most ``max_elements`` panel cells
+    to bound memory, in float32 unless ``dtype`` says otherwise (metrics agree
+    with float64 to ~1e-5).  Returns metrics shaped ``(thresholds, symbols)``.
+    """
+    kwargs.setdefault('dtype', np.float32)
+    scores = np.asarray(scores, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    chunk = max(1, max_elements // max(scores.size, 1))
+    parts = []
+    for offset in range(0, len(thresholds), chunk):
+        # NaN scores (no bar that day) compare False, i.e. flat
+        signal = scores[None] > thresholds[offset:offset + chunk, None, None]
+        parts.append(run_backtest(close, signal, keep_series=False, **kwargs)['metrics'])
+    return {name: np.concatenate([part[name] for part in parts]) for name in METRICS}
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+INTERVALS = {'1s': 1000, '1m': 60 * 1000, '5m': 5 * 60 * 1000, '1h': 60 * 60 * 1000}
+
+# Slots of a bar list; a list (not a dict) keeps the per-tick update cheap
+START, OPEN, HIGH, LOW, CLOSE, VOLUME, COUNT, FIRST_T, LAST_T = range(9)
+
+
+def _new_bar(start, price, volume, timestamp):
+    return [start, price, price, price, price, volume, 1, timestamp, timestamp]
+
+
+def _update_bar(bar, price, volume, timestamp):
+    if price > bar[HIGH]:
+        bar[HIGH] = price
+    if price < bar[LOW]:
+        bar[LOW] = price
+    # Open/close follow trade time, not arrival order, so reordered ticks land correctly
+    if timestamp < bar[FIRST_T]:
+        bar[OPEN] = price
+        bar[FIRST_T] = timestamp
+    if timestamp >= bar[LAST_T]:
+        bar[CLOSE] = price
+        bar[LAST_T] = timestamp
+    bar[VOLUME] += volume
+    bar[COUNT] += 1
+
+
+class BarAggregator:
+    """Incremental OHLCV bars per symbol and interval, built from trade ticks in O(1) per tick.
+
+    A bar is completed when a tick of a later interval arrives, or by ``flush``
+    once its interval plus ``grace_ms`` has passed.  A late tick that belongs
+    to one of the last ``late_bars`` completed bars amends that bar; older
+    late ticks are dropped and counted.  Every completed bar is also passed
+    to the ``listeners`` (``listener(symbol, interval, bar)``, called under
+    the aggregator's lock, so they must be quick).
+    """
+
+    def __init__(self, intervals=tuple(INTERVALS), max_bars=1000, late_bars=2, grace_ms=2000):
+        self.intervals = {name: INTERVALS[name] for name in intervals}
+        self.max_bars = max_bars
+        self.late_bars = late_bars
+        self.grace_ms = grace_ms
+        self._current = {}  # (symbol, interval) -> bar being built
+        self._completed = {}  # (symbol, interval) -> deque of completed bars, oldest first
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._stats = {'ticks': 0, 'bars_completed': 0, 'late_amended': 0, 'late_dropped': 0}
+
+    def ingest(self, parsed_message):
+        """Add every trade of a parsed Finnhub WebSocket message."""
+        trades = parsed_message.get("data")
+        if parsed_message.get("type") != "trade" or not trades:
+            return
+        with self._lock:
+            for trade in trades:
+                self._add(trade["s"], trade["p"], trade.get("v", 0.0), trade["t"])
+
+    def add_tick(self, symbol, price, volume, timestamp):
+        with self._lock:
+            self._add(symbol, price, volume, timestamp)
+
+    def _add(self, symbol, price, volume, timestamp):
+        self._stats['ticks'] += 1
+        for name, length in self.intervals.items():
+            key = (symbol, name)
+            start = timestamp - timestamp % length
+            bar = self._current.get(key)
+            if bar is None:
+                completed = self._completed.get(key)
+                if completed and start <= completed[-1][START]:
+                    # Late tick after the open bar was flushed
+                    self._late(key, start, price, volume, timestamp)
+                else:
+                    self._current[key] = _new_bar(start, price, volume, timestamp)
+            elif start == bar[START]:
+                _update_bar(bar, price, volume, timestamp)
+            elif start > bar[START]:
+                # Rollover: the open bar is complete, this tick starts the next one
+                self._complete(key, bar)
+                self._current[key] = _new_bar(start, price, volume, timestamp)
+            else:
+                self._late(key, start, price, volume, timestamp)
+
+    def _complete(self, key, bar):
+        completed = self._completed.get(key)
+        if completed is None:
+            completed = self._completed[key] = deque(maxlen=self.max_bars)
+        completed.append(bar)
+        self._stats['bars_completed'] += 1
+        for listener in self.listeners:
+            listener(key[0], key[1], bar)
+
+    def _late(self, key, start, price, volume, timestamp):
+        completed = self._completed.get(key, ())
+        for i in range(1, min(self.late_bars, len(completed)) + 1):
+            bar = completed[-i]
+            if bar[START] == start:
+                _update_bar(bar, price, volume, timestamp)
+                self._stats['late_amended'] += 1
+                return
+            if bar[START] < start:
+                break
+        self._stats['late_dropped'] += 1
+
+    def flush(self, now_ms=None):
+        """Complete open bars whose interval (plus grace) has ended, e.g. when ticks stop."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock:
+            for key, bar in list(self._current.items()):
+                if bar[START] + self.intervals[key[1]] + self.grace_ms <= now_ms:
+                    self._complete(key, bar)
+                    del self._current[key]
+
+    def bars(self, symbol, interval, n=None, include_partial=False):
+        """Completed bars (oldest first) as a DataFrame shaped like ``fetch_stock_data``'s."""
+        with self._lock:
+            rows = list(self._completed.get((symbol, interval), ()))
+            if include_partial and (symbol, interval) in self._current:
+                rows.append(self._current[(symbol, interval)])
+            rows = [row[:COUNT + 1] for row in rows]
+        if n is not None:
+            rows = rows[-n:] if n > 0 else []
+        frame = pd.DataFrame(rows, columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Trades'])
+        frame['Date'] = pd.to_datetime(frame['Date'], unit='ms')
+        return frame
+
+    def current(self, symbol, interval):
+        """A copy of the bar being built for ``symbol``/``interval``, or None."""
+        with self._lock:
+            bar = self._current.get((symbol, interval))
+            return None if bar is None else list(bar)
+
+    def symbols(self):
+        with self._lock:
+            return sorted({symbol for symbol, _ in list(self._current) + list(self._completed)})
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def register_bar_routes(app, aggregator):
+    """GET /bars?symbol=...&interval=1m&n=100[&partial=1]: completed live OHLCV bars."""
+    from flask import jsonify, request
+
+    from response_formats import json_options, json_response
+
+    @app.route("/bars", methods=["GET"])
+    def get_live_bars():
+        symbol = request.args.get("symbol")
+        interval = request.args.get("interval", "1m")
+        if not symbol:
+            return jsonify({"error": "'symbol' is required"}), 400
+        if interval not in aggregator.intervals:
+            return jsonify({"error": f"'interval' must be one of {list(aggregator.intervals)}"}), 400
+        try:
+            options = json_options(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        n = request.args.get("n", default=100, type=int)
+        partial = request.args.get("partial", "0") in ("1", "true")
+        bars = aggregator.bars(symbol, interval, n, include_partial=partial)
+        return json_response(bars, precision=options['precision'], date_format=options['date_format'] or 'iso')
+
+
+def create_bar_aggregator():
+    intervals = os.environ.get('LIVE_BAR_INTERVALS', ','.join(INTERVALS)).split(',')
+    return BarAggregator(intervals=intervals, max_bars=int(os.environ.get('LIVE_BAR_HISTORY', 1000)))
@@ -0,0 +1,405 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import stage
+from singleflight import SingleFlight
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, each process keeps its own view
+    fcntl = None
+
+BAR_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+VERSION_ROWS = 5  # Trailing bars hashed into the version; providers revise the latest days
+
+
+def normalize_bars(stock_data):
+    """Flatten a provider frame to one row per day with a 'Date' column."""
+    if stock_data is None or len(stock_data) == 0:
+        return pd.DataFrame(columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+    stock_data = stock_data.copy()
+    if 'Date' not in stock_data.columns:
+        stock_data.reset_index(inplace=True)
+    # Flatten the column names if they are tuples (yfinance multi index)
+    stock_data.columns = [col[0] if isinstance(col, tuple) else col for col in stock_data.columns]
+    if 'Date' not in stock_data.columns:
+        stock_data.rename(columns={stock_data.columns[0]: 'Date'}, inplace=True)
+    stock_data['Date'] = pd.to_datetime(stock_data['Date']).dt.tz_localize(None)
+    columns = [col for col in BAR_COLUMNS if col in stock_data.columns]
+    return stock_data[columns].sort_values('Date').reset_index(drop=True)
+
+
+def tail_digest(bars, rows=VERSION_ROWS):
+    """Short hash of the OHLCV of the last ``rows`` bars, so a bar revised in place changes the version."""
+    columns = [col for col in ('Open', 'High', 'Low', 'Close', 'Volume') if col in bars.columns]
+    tail = bars[columns].tail(rows).to_numpy(dtype=np.float64)
+    return hashlib.sha1(np.ascontiguousarray(tail).tobytes()).hexdigest()[:8]
+
+
+def bars_version(symbol, bars):
+    """Identifier of exactly these bars: last date, row count and a hash of the latest rows.
+
+    Result and chart caches key on the version of the frame they computed
+    from, not on ``BarCache.version``, which a concurrent refresh may
+    already have moved on.
+    """
+    last = bars['Date'].iloc[-1].strftime('%Y-%m-%d') if len(bars) else 'empty'
+    return f"{symbol}:{last}:{len(bars)}:{tail_digest(bars)}"
+
+
+# ---------------- Data Providers ----------------
+class YahooProvider:
+    """Download daily bars from Yahoo Finance with retry logic."""
+
+    def __init__(self, retries=3, delay=5):
+        self.retries = retries
+        self.delay = delay
+
+    def fetch(self, symbol, start, end):
+        import yfinance as yf
+
+        for attempt in range(self.retries):
+            try:
+                stock_data = yf.download(symbol, start=start, end=end, progress=False)
+                if stock_data is None or stock_data.empty:
+                    # yfinance reports most failures as an empty frame; an empty range looks the same, so no retry
+                    return None
+                return normalize_bars(stock_data)
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {e}")
+                if attempt + 1 < self.retries:
+                    time.sleep(self.delay)
+        return None
+
+
+class FixtureProvider:
+    """Serve bars from local '<SYMBOL>.csv' files, for tests and benchmarks."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.calls = []  # (symbol, start, end) of every fetch, to check incremental refresh
+
+    def fetch(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        path = os.path.join(self.directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            return None
+        bars = normalize_bars(pd.read_csv(path, parse_dates=['Date']))
+        mask = (bars['Date'] >= pd.Timestamp(start)) & (bars['Date'] < pd.Timestamp(end))
+        return bars[mask].reset_index(drop=True)
+
+
+# ---------------- Bar Store ----------------
+class BarCache:
+    """Per-symbol daily bar store: columnar files on disk plus an in-process LRU.
+
+    Each symbol keeps the date range it has already asked the provider for
+    ('covered'), so a request only downloads the part of [start, end) that is
+    missing, typically the tail since the last cached day.  The current day is
+    never marked as covered, but it is re-checked at most every
+    ``refresh_interval`` seconds.  An empty download counts as failed: nothing
+    is stored and the range stays uncovered, and a request whose head or tail
+    fails is served the bars already cached.
+
+    With ``shared`` set, several processes (e.g. gunicorn workers) use one
+    ``cache_dir``: a symbol is refreshed under a file lock, so only one of
+    them downloads it, and the others pick up the new files instead of
+    serving their older in-memory copy.
+
+    Concurrent ``get`` calls for the same symbol and range share one lookup
+    (``flights``), so a failing download is tried once for all of them rather
+    than once per waiting request.
+    """
+
+    def __init__(self, cache_dir, provider=None, max_bytes=256 * 1024 * 1024, refresh_interval=900, shared=False,
+                 coalesce_timeout=30.0):
+        self.cache_dir = cache_dir
+        self.provider = provider if provider is not None else YahooProvider()
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.shared = shared and fcntl is not None
+        self._memory = OrderedDict()  # symbol -> entry dict, most recently used last
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._symbol_locks = {}
+        self._stats = {'memory_hits': 0, 'disk_loads': 0, 'misses': 0, 'downloads': 0, 'download_errors': 0}
+        self.flights = SingleFlight('bars', timeout=coalesce_timeout)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ---- public API ----
+    def get(self, symbol, start, end):
+        """Return the bars of ``symbol`` with ``start <= Date < end``, or None."""
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        entry = self.flights.do((symbol, start, end), self._get_entry, symbol, start, end)
+        if entry is None:
+            return None
+        # Every caller gets its own frame; the routes add columns to it
+        bars = entry['bars']
+        mask = (bars['Date'] >= start) & (bars['Date'] < end)
+        return bars[mask].reset_index(drop=True)
+
+    def _get_entry(self, symbol, start, end):
+        with self._symbol_lock(symbol):
+            entry = self._load(symbol)
+            return self._refresh(symbol, entry, start, end)
+
+    def cached(self, symbol, start=None, end=None):
+        """Bars already stored for ``symbol`` (memory or disk), without contacting the provider."""
+        with self._symbol_lock(symbol):
+            entry = self._load(symbol)
+        if entry is None:
+            return None
+        bars = entry['bars']
+        mask = pd.Series(True, index=bars.index)
+        if start is not None:
+            mask &= bars['Date'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= bars['Date'] < pd.Timestamp(end)
+        return bars[mask].reset_index(drop=True)
+
+    def version(self, symbol):
+        """Identifier of the cached bars of ``symbol``; changes whenever new bars are stored."""
+        with self._lock:
+            entry = self._memory.get(symbol)
+        if entry is None:
+            return None
+        return entry['version']
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._memory), memory_bytes=self._memory_bytes)
+        lookups = stats['memory_hits'] + stats['disk_loads'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_loads']) / lookups if lookups else 0.0
+        return stats
+
+    def invalidate(self, symbol):
+        with self._symbol_lock(symbol):
+            self._evict(symbol)
+            for path in self._paths(symbol):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # ---- refresh ----
+    def _refresh(self, symbol, entry, start, end):
+        today = pd.Timestamp.today().normalize()
+        if entry is None:
+            bars = self._download(symbol, start, end)
+            if bars is None:
+                return None
+            entry = self._make_entry(symbol, normalize_bars(bars), start, min(end, today))
+            self._store(symbol, entry)
+            return entry
+
+        changed = False
+        frames = [entry['bars']]
+        covered_start, covered_end = entry['covered_start'], entry['covered_end']
+
+        # Missing head: the caller asks for older history than we hold
+        if start < covered_start:
+            head = self._download(symbol, start, covered_start)
+            # On failure serve what we have; the head stays uncovered and is asked for again next time
+            if head is not None:
+                frames.insert(0, normalize_bars(head))
+                covered_start = start
+                changed = True
+
+        # Missing tail: only download what happened since the last covered day
+        stale = time.time() - entry['checked_at'] > self.refresh_interval
+        retry = covered_end < today and not entry.get('tail_failed')
+        if end > covered_end and (retry or stale):
+            tail = self._download(symbol, covered_end, end)
+            if tail is None:
+                # Serve what we have rather than failing the request, and wait refresh_interval
+                # before asking again (a weekend or holiday tail is empty too)
+                entry['checked_at'] = time.time()
+                entry['tail_failed'] = True
+            else:
+                frames.append(normalize_bars(tail))
+                covered_end = max(covered_end, min(end, today))
+                changed = True
+
+        if not changed:
+            return entry
+        frames = [frame for frame in frames if len(frame)] or frames[:1]
+        bars = pd.concat(frames, ignore_index=True)
+        bars = bars.drop_duplicates('Date', keep='last').sort_values('Date').reset_index(drop=True)
+        entry = self._make_entry(symbol, bars, covered_start, covered_end)
+        self._store(symbol, entry)
+        return entry
+
+    def _download(self, symbol, start, end):
+        with stage('download'):
+            bars = self.provider.fetch(symbol, start, end)
+        if bars is not None and len(bars) == 0:
+            bars = None  # Nothing to store, and the range must not be marked covered
+        self._count('downloads' if bars is not None else 'download_errors')
+        return bars
+
+    def _count(self, event):
+        with self._lock:
+            self._stats[event] += 1
+
+    def _make_entry(self, symbol, bars, covered_start, covered_end):
+        return {
+            'bars': bars,
+            'covered_start': pd.Timestamp(covered_start),
+            'covered_end': pd.Timestamp(covered_end),
+            'checked_at': time.time(),
+            'version': bars_version(symbol, bars),
+        }
+
+    # ---- disk ----
+    def _paths(self, symbol):
+        base = self._base_path(symbol)
+        return base + '.parquet', base + '.pkl', base + '.meta.json'
+
+    def _base_path(self, symbol):
+        safe = symbol.replace('/', '_').replace(':', '_')
+        return os.path.join(self.cache_dir, safe)
+
+    def _store(self, symbol, entry):
+        import json
+
+        parquet_path, pickle_path, meta_path = self._paths(symbol)
+        try:
+            entry['bars'].to_parquet(parquet_path + '.tmp', index=False)
+            os.replace(parquet_path + '.tmp', parquet_path)
+        except ImportError:
+            # No parquet engine installed, fall back to a pickled frame
+            entry['bars'].to_pickle(pickle_path)
+        meta = {
+            'covered_start': entry['covered_start'].strftime('%Y-%m-%d'),
+            'covered_end': entry['covered_end'].strftime('%Y-%m-%d'),
+            'checked_at': entry['checked_at'],
+            'version': entry['version'],
+        }
+        with open(meta_path + '.tmp', 'w') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + '.tmp', meta_path)
+        entry['meta_mtime'] = self._meta_mtime(meta_path)
+        self._remember(symbol, entry)
+
+    def _load(self, symbol):
+        import json
+
+        parquet_path, pickle_path, meta_path = self._paths(symbol)
+        with self._lock:
+            entry = self._memory.get(symbol)
+            if entry is not None:
+                self._memory.move_to_end(symbol)
+        # Another process may have stored newer bars since this copy was read
+        if entry is not None and (not self.shared or entry['meta_mtime'] == self._meta_mtime(meta_path)):
+            self._count('memory_hits')
+            return entry
+
+        meta_mtime = self._meta_mtime(meta_path)
+        if meta_mtime is None:
+            self._evict(symbol)
+            self._count('misses')
+            return None
+        try:
+            if os.path.exists(parquet_path):
+                bars = pd.read_parquet(parquet_path)
+            elif os.path.exists(pickle_path):
+                bars = pd.read_pickle(pickle_path)
+            else:
+                return None
+            with open(meta_path) as file:
+                meta = json.load(file)
+        except Exception as e:
+            print(f"Ignoring unreadable cache for {symbol}: {e}")
+            return None
+        entry = {
+            'bars': bars,
+            'covered_start': pd.Timestamp(meta['covered_start']),
+            'covered_end': pd.Timestamp(meta['covered_end']),
+            'checked_at': meta['checked_at'],
+            'version': meta['version'],
+            'meta_mtime': meta_mtime,
+        }
+        self._remember(symbol, entry)
+        self._count('disk_loads')
+        return entry
+
+    def _meta_mtime(self, meta_path):
+        try:
+            return os.stat(meta_path).st_mtime_ns
+        except OSError:
+            return None
+
+    # ---- memory LRU ----
+    def _remember(self, symbol, entry):
+        entry['nbytes'] = int(entry['bars'].memory_usage(deep=True).sum())
+        with self._lock:
+            self._evict(symbol)
+            self._memory[symbol] = entry
+            self._memory_bytes += entry['nbytes']
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                oldest = next(iter(self._memory))
+                self._evict(oldest)
+
+    def _evict(self, symbol):
+        with self._lock:
+            entry = self._memory.pop(symbol, None)
+            if entry is not None:
+                self._memory_bytes -= entry['nbytes']
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            lock = self._symbol_locks.get(symbol)
+            if lock is None:
+                if self.shared:
+                    lock = SharedLock(self._base_path(symbol) + '.lock')
+                else:
+                    lock = threading.Lock()
+                self._symbol_locks[symbol] = lock
+            return lock
+
+
+class SharedLock:
+    """A thread lock plus an exclusive ``flock`` on ``path``, held together across processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        finally:
+            self._file = None
+            self._lock.release()
+
+
+def create_bar_cache(base_dir):
+    """Build the bar cache the services share, configured through the environment."""
+    cache_dir = os.environ.get('BAR_CACHE_DIR', os.path.join(base_dir, 'cache', 'bars'))
+    fixture_dir = os.environ.get('BAR_FIXTURE_DIR')
+    provider = FixtureProvider(fixture_dir) if fixture_dir else YahooProvider()
+    max_bytes = int(os.environ.get('BAR_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    shared = os.environ.get('BAR_CACHE_SHARED', '0') in ('1', 'true')  # Set by gunicorn.conf.py for its workers
+    return BarCache(cache_dir, provider=provider, max_bytes=max_bytes, shared=shared,
+                    coalesce_timeout=float(os.environ.get('COALESCE_TIMEOUT', 30)))
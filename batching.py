@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import STAGE_SECONDS, stage
+
+
+class PredictBatcher:
+    """Coalesce concurrent ``predict`` calls into one batched model call.
+
+    Callers block in ``predict(x)``.  A single worker thread takes the first
+    waiting request, keeps collecting for up to ``max_wait_ms`` or until the
+    next request would take the batch past ``max_batch_size`` rows, runs
+    ``predict_fn`` once on the stacked rows and hands every caller back its
+    own slice.  Requests larger than ``max_batch_size`` are queued in parts.
+    ``close()`` stops the worker once the queued requests are scored; later
+    calls run ``predict_fn`` directly.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=2048, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._held = None  # Request that did not fit in the last batch; starts the next one
+        self._closed = False
+        self._stopping = False  # Set by the worker once it has taken the stop marker off the queue
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'batches': 0,
+            'errors': 0,
+            'rows': 0,
+            'max_batch_rows': 0,
+            'max_batch_requests': 0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0,
+            'predict_seconds_total': 0.0,
+        }
+
+    def predict(self, x, timeout=None):
+        """Predict ``x`` as part of the next batch; blocks until its rows are scored."""
+        if len(x) == 0:
+            return self.predict_fn(x)
+        x = np.asarray(x)
+        enqueued = time.perf_counter()
+        futures = []
+        with self._start_lock:  # Nothing is queued behind the stop marker of close()
+            if self._closed:
+                return self.predict_fn(x)  # e.g. a request still holding a model the registry has dropped
+            self._ensure_worker()
+            for offset in range(0, len(x), self.max_batch_size):
+                future = Future()
+                self._queue.put((x[offset:offset + self.max_batch_size], future, enqueued))
+                futures.append(future)
+        if len(futures) == 1:
+            return futures[0].result(timeout)
+        deadline = None if timeout is None else enqueued + timeout
+        parts = [future.result(None if deadline is None else max(deadline - time.perf_counter(), 0))
+                 for future in futures]
+        return np.concatenate(parts)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats['batches'] or 1
+        requests = stats['requests'] or 1
+        stats['mean_batch_rows'] = stats['rows'] / batches
+        stats['mean_batch_requests'] = stats['requests'] / batches
+        stats['mean_queue_wait_seconds'] = stats['queue_wait_seconds_total'] / requests
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout=None):
+        """Score what is queued, then stop and join the worker thread."""
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            if worker is not None:
+                self._queue.put(None)
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def _ensure_worker(self):
+        # Called with _start_lock held
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='predict-batcher', daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        first, self._held = self._held, None
+        if first is None:
+            first = self._queue.get()
+            if first is None:
+                return None, 0  # Stop marker
+        batch = [first]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True  # Score this last batch, then stop
+                break
+            if rows + len(item[0]) > self.max_batch_size:
+                self._held = item  # Leads the next batch instead of overfilling this one
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch, rows
+
+    def _run(self):
+        while not self._stopping:
+            batch, rows = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            for wait in waits:
+                STAGE_SECONDS.observe(wait, 'queue_wait')
+            error = None
+            try:
+                x = np.concatenate([item[0] for item in batch]) if len(batch) > 1 else batch[0][0]
+                with stage('predict'):
+                    predictions = self.predict_fn(x)
+            except Exception as e:
+                error = e
+            finally:
+                # Before the callers wake up, so their next stats() read includes this batch
+                self._record(batch, rows, waits, time.perf_counter() - started, error is not None)
+            if error is not None:
+                for _, future, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            offset = 0
+            for x_part, future, _ in batch:
+                future.set_result(predictions[offset:offset + len(x_part)])
+                offset += len(x_part)
+
+    def _record(self, batch, rows, waits, elapsed, failed):
+        # Failed batches count too, so the stats show every model call
+        with self._stats_lock:
+            stats = self._stats
+            stats['requests'] += len(batch)
+            stats['batches'] += 1
+            stats['errors'] += failed
+            stats['rows'] += rows
+            stats['max_batch_rows'] = max(stats['max_batch_rows'], rows)
+            stats['max_batch_requests'] = max(stats['max_batch_requests'], len(batch))
+            stats['queue_wait_seconds_total'] += sum(waits)
+            stats['queue_wait_seconds_max'] = max(stats['queue_wait_seconds_max'], max(waits))
+            stats['predict_seconds_total'] += elapsed
+
+
+def create_batcher(predict_fn):
+    """Batcher for the services, configured through the environment."""
+    return PredictBatcher(
+        predict_fn,
+        max_batch_size=int(os.environ.get('PREDICT_MAX_BATCH', 2048)),
+        max_wait_ms=float(os.environ.get('PREDICT_MAX_WAIT_MS', 5)),
+    )
@@ -0,0 +1,67 @@
+"""Benchmark: per-symbol pandas strategy returns vs the vectorized backtest engine.
+
+Run from the repository root: ``python benchmarks/bench_backtest.py``
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest import run_backtest, threshold_sweep
+
+
+def pandas_backtest(close, signal):
+    # The per-symbol computation previously inlined in service2.py, plus the metrics
+    out = []
+    for j in range(close.shape[1]):
+        df = pd.DataFrame({'Close': close[:, j], 'Predicted_Signal': signal[:, j]})
+        df['Return'] = df.Close.pct_change()
+        df['Strategy_Return'] = df.Return * df.Predicted_Signal.shift(1)
+        df['Cum_Strategy'] = df['Strategy_Return'].cumsum()
+        peak = df['Cum_Strategy'].cummax().clip(lower=0)
+        sharpe = df.Strategy_Return.mean() / df.Strategy_Return.std() * np.sqrt(252)
+        out.append((df['Cum_Strategy'].iloc[-1], (df['Cum_Strategy'] - peak).min(), sharpe))
+    return out
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    dates, symbols = 2520, 500  # ten years of a 500-symbol universe
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, (dates, symbols)), axis=0)
+    scores = rng.normal(0, 1, (dates, symbols))
+    signal = (scores > 0).astype(float)
+
+    expected = pandas_backtest(close, signal)
+    metrics = run_backtest(close, signal)['metrics']
+    assert np.allclose([e[0] for e in expected], metrics['total_return'])
+    assert np.allclose([e[1] for e in expected], metrics['max_drawdown'])
+    assert np.allclose([e[2] for e in expected], metrics['sharpe'])
+
+    loop = timed(lambda: pandas_backtest(close, signal), repeat=1)
+    engine = timed(lambda: run_backtest(close, signal, cost_bps=5))
+    print(f"{dates} dates x {symbols} symbols")
+    print(f"  pandas per symbol  {loop:>9.1f} ms")
+    print(f"  vectorized engine  {engine:>9.1f} ms  ({loop / engine:.0f}x)")
+
+    for count in (10, 50, 100):
+        thresholds = np.linspace(-1, 1, count)
+        sweep = timed(lambda: threshold_sweep(close, scores, thresholds, cost_bps=5), repeat=1)
+        print(f"  sweep {count:>3} thresholds {sweep:>9.1f} ms  ({sweep / count:.1f} ms per threshold, float32)")
+    sweep = timed(lambda: threshold_sweep(close, scores, thresholds, cost_bps=5, dtype=np.float64), repeat=1)
+    print(f"  sweep {count:>3} thresholds {sweep:>9.1f} ms  ({sweep / count:.1f} ms per threshold, float64)")
+
+
+if __name__ == "__main__":
+    main()
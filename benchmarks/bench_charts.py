@@ -0,0 +1,82 @@
+"""Benchmark: pyplot per request vs the object-oriented Agg path with downsampling and the chart cache.
+
+Run from the repository root: ``python benchmarks/bench_charts.py``
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts import ChartRenderer, downsample, lttb_indices, minmax_indices
+from result_cache import ResultCache
+
+
+def pyplot_chart(df, symbol):
+    # What /plot_stock_data did before: a global pyplot figure per request
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(df['Date'], df['Close'], label=f'{symbol} Closing Price')
+    plt.xlabel("Date")
+    plt.ylabel("Closing Price (USD)")
+    plt.title(f"{symbol} Stock Price Over Time")
+    plt.legend()
+    img = io.BytesIO()
+    plt.savefig(img, format='png')
+    plt.close()
+    return img.getvalue()
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    pyplot_chart(pd.DataFrame({'Date': pd.date_range('2020-01-01', periods=10), 'Close': np.arange(10.0)}), 'WARM')
+
+    for rows, freq in ((1250, 'D'), (100_000, 'min')):
+        df = pd.DataFrame({
+            'Date': pd.date_range('2020-01-01', periods=rows, freq=freq),
+            'Close': 100 * np.cumprod(1 + rng.normal(0, 0.01, rows)),
+        })
+        close = df['Close'].to_numpy()
+
+        # Both decimations keep the ends; min/max also keeps every bucket's extremes
+        kept = minmax_indices(close, 500)
+        assert close[kept].max() == close.max() and close[kept].min() == close.min()
+        assert lttb_indices(np.arange(rows), close, 1000)[[0, -1]].tolist() == [0, rows - 1]
+
+        cache = ResultCache()
+        renderer = ChartRenderer()
+        fresh = ChartRenderer(max_figures=0)  # A new figure for every chart
+        print(f"{rows} points, 1000x500 px")
+        base = timed(lambda: pyplot_chart(df, 'SYM'))
+        print(f"  pyplot, all points       {base:8.1f} ms")
+        cost = timed(lambda: fresh.render(downsample(df, 1000, 'lttb'), 'SYM', 1000, 500))
+        print(f"  Agg OO, new figure, lttb {cost:8.1f} ms  ({base / cost:.1f}x)")
+        for method in ('none', 'minmax', 'lttb'):
+            cost = timed(lambda: renderer.render(downsample(df, 1000, method), 'SYM', 1000, 500))
+            print(f"  Agg OO, {method:<7} {len(downsample(df, 1000, method)):>7} pts {cost:8.1f} ms  ({base / cost:.1f}x)")
+        svg = timed(lambda: renderer.render(downsample(df, 1000, 'lttb'), 'SYM', 1000, 500, 'svg'))
+        print(f"  Agg OO, lttb, svg        {svg:8.1f} ms")
+        lttb = timed(lambda: lttb_indices(np.arange(rows), close, 1000))
+        print(f"  lttb indices alone       {lttb:8.1f} ms")
+        cache.put('chart', renderer.render(downsample(df, 1000, 'lttb'), 'SYM', 1000, 500))
+        hit = timed(lambda: cache.get('chart'), repeat=1000)
+        print(f"  chart cache hit          {hit:8.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: the indicator engine over a (dates x symbols) panel vs pandas per symbol, and incremental updates.
+
+Run from the repository root: ``python benchmarks/bench_features.py [--dates 2500] [--symbols 500]``
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import FeatureEngine, IncrementalFeatures
+
+
+def pandas_indicators(df):
+    """The same indicators for one symbol, written the usual pandas way."""
+    close, high, low = df['Close'], df['High'], df['Low']
+    prev = close.shift(1)
+    out = {}
+    for w in (10, 20, 50):
+        out[f'sma_{w}'] = close.rolling(w).mean()
+    for span in (12, 26):
+        out[f'ema_{span}'] = close.ewm(span=span, adjust=False, min_periods=span).mean()
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    out['rsi_14'] = 100 * gain / (gain + loss)
+    out['macd'] = out['ema_12'] - out['ema_26']
+    out['macd_signal'] = out['macd'].ewm(span=9, adjust=False, min_periods=9).mean()
+    out['macd_hist'] = out['macd'] - out['macd_signal']
+    mid, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+    out['bb_upper'], out['bb_lower'] = mid + 2 * std, mid - 2 * std
+    out['bb_pctb'] = (close - out['bb_lower']) / (out['bb_upper'] - out['bb_lower'])
+    out['bb_width'] = (out['bb_upper'] - out['bb_lower']) / mid
+    true_range = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    out['atr_14'] = true_range.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    out['vol_20'] = np.log(close / prev).rolling(20).std()
+    for k in (1, 5, 10):
+        out[f'ret_{k}'] = close.pct_change(k)
+    return pd.DataFrame(out)
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dates', type=int, default=2500)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=100_000, help="incremental bars to time")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    T, S = args.dates, args.symbols
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, (T, S)), axis=0)
+    spread = np.abs(rng.normal(0, 1, (T, S)))
+    high, low = close + spread, close - spread
+    engine = FeatureEngine()
+    cells = T * S * len(engine.names)
+    print(f"{T} dates x {S} symbols, {len(engine.names)} indicators")
+
+    panel = engine.compute(high, low, close)
+    batch = timed(lambda: engine.compute(high, low, close))
+    print(f"  engine, whole panel       {batch * 1000:9.1f} ms  {cells / batch / 1e6:8.1f} M values/s")
+
+    frames = [pd.DataFrame({'High': high[:, j], 'Low': low[:, j], 'Close': close[:, j]}) for j in range(S)]
+    per_symbol = timed(lambda: [pandas_indicators(frame) for frame in frames], repeat=1)
+    print(f"  pandas, per symbol        {per_symbol * 1000:9.1f} ms  {cells / per_symbol / 1e6:8.1f} M values/s"
+          f"  ({per_symbol / batch:.1f}x slower)")
+    single = timed(lambda: engine.frame(frames[0]), repeat=10)
+    print(f"  engine, one symbol        {single * 1000:9.2f} ms")
+
+    # Same values as pandas
+    reference = pandas_indicators(frames[0])
+    for i, name in enumerate(engine.names):
+        np.testing.assert_allclose(panel[i, :, 0], reference[name].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=name)
+
+    # Incremental: replay the panel bar by bar and compare the last bar with the batch result
+    incremental = IncrementalFeatures(engine)
+    symbols = min(S, 50)
+    for t in range(T):
+        for j in range(symbols):
+            values = incremental.update(j, high[t, j], low[t, j], close[t, j])
+    np.testing.assert_allclose([values[name] for name in engine.names], panel[:, -1, symbols - 1], rtol=1e-8)
+
+    steps = min(args.updates, T * symbols)
+    incremental = IncrementalFeatures(engine)
+    start = time.perf_counter()
+    for step in range(steps):
+        t, j = divmod(step, symbols)
+        incremental.update(j, high[t, j], low[t, j], close[t, j])
+    cost = (time.perf_counter() - start) / steps
+    print(f"  incremental, one bar      {cost * 1e6:9.1f} us  {1 / cost:10.0f} bars/s (all {len(engine.names)} indicators)")
+    recompute = timed(lambda: engine.frame(frames[0].iloc[-1000:]), repeat=10)
+    print(f"  batch over the last 1000  {recompute * 1e6:9.1f} us  (what a new live bar would cost without it)")
+
+
+if __name__ == "__main__":
+    main()
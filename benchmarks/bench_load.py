@@ -0,0 +1,196 @@
+"""Load test: requests per second of the Flask dev server vs the gunicorn profile.
+
+Run from the repository root: ``python benchmarks/bench_load.py [--duration 10] [--concurrency 16] [--workers 4]``
+
+Both servers run the same app (``prediction_service``, SVM backend by
+default, since it needs no TensorFlow) on generated fixture bars, with the
+feed pointed at a closed local port so nothing touches the network:
+
+  * flask    : ``flask --app prediction_service run``, the current Dockerfile command
+  * gunicorn : ``gunicorn -c gunicorn.conf.py`` with ``--workers`` x ``--threads``
+
+Clients are spread over several processes, so the load generator is not
+held back by its own GIL; on a machine with few cores it still competes
+with the server for CPU, so compare the two rows, not absolute numbers.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_fixtures(directory, symbols, days=2500, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime_as_string(np.arange(np.datetime64('2015-01-01'), np.datetime64('2015-01-01') + days), unit='D')
+    for symbol in symbols:
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.02, days))
+        spread = np.abs(rng.normal(0, 1, days))
+        with open(os.path.join(directory, f"{symbol}.csv"), 'w') as file:
+            file.write("Date,Open,High,Low,Close,Volume\n")
+            for row in zip(dates, close + rng.normal(0, 0.5, days), close + spread, close - spread, close):
+                file.write("{},{:.4f},{:.4f},{:.4f},{:.4f},1000\n".format(*row))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(connection, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    connection.request(method, path, body=data, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            if request(connection, 'GET', '/ready').status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def workload(symbols):
+    """The request mix: raw bars and (result-cached) predictions over every symbol."""
+    requests = []
+    for symbol in symbols:
+        requests.append(('POST', '/get_stock_data', {"symbol": symbol}))
+        requests.append(('POST', '/predictions', {"symbol": symbol, "start_date": "2015-01-01", "end_date": "2021-01-01"}))
+        requests.append(('GET', '/ticks/latest', None))
+    return requests
+
+
+def client_process(args):
+    """Run ``connections`` keep-alive clients in threads for ``duration`` seconds; returns latencies and errors."""
+    import threading
+
+    port, requests, connections, duration, seed = args
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(k):
+        rng = random.Random(seed * 1000 + k)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            method, path, body = rng.choice(requests)
+            started = time.perf_counter()
+            try:
+                response = request(connection, method, path, body)
+                if response.status >= 500:
+                    failed += 1
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def load(port, requests, concurrency, duration, processes):
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (i < concurrency % processes) for i in range(processes)]
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(client_process, [(port, requests, n, duration, i) for i, n in enumerate(shares)])
+    latencies = np.array([latency for result in results for latency in result[0]])
+    return len(latencies) / duration, latencies, sum(result[1] for result in results)
+
+
+def serve(kind, port, env, workers, threads):
+    if kind == 'flask':
+        command = [sys.executable, '-m', 'flask', '--app', 'prediction_service', 'run', '--port', str(port)]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+                   '--threads', str(threads), '--bind', f'127.0.0.1:{port}']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', nargs='*', default=['flask', 'gunicorn'], choices=['flask', 'gunicorn'])
+    parser.add_argument('--backend', default='svm', choices=['lstm', 'svm'])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of load per server")
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent keep-alive connections")
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument('--symbols', type=int, default=8)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_load_')
+    try:
+        symbols = [f"SYM{i}" for i in range(args.symbols)]
+        os.makedirs(os.path.join(work_dir, 'fixtures'))
+        write_fixtures(os.path.join(work_dir, 'fixtures'), symbols)
+        requests = workload(symbols)
+        print(f"{os.cpu_count()} cores, {args.concurrency} connections, {args.duration:.0f}s per server, "
+              f"{args.backend} backend, {len(requests)} distinct requests")
+        for kind in args.servers:
+            port = free_port()
+            env = dict(os.environ)
+            env.update(
+                PREDICTION_BACKEND=args.backend,
+                BAR_FIXTURE_DIR=os.path.join(work_dir, 'fixtures'),
+                BAR_CACHE_DIR=os.path.join(work_dir, kind, 'bars'),
+                RESULT_CACHE_DIR=os.path.join(work_dir, kind, 'results') if kind == 'gunicorn' else '',
+                FINNHUB_WS_URL='ws://127.0.0.1:9',
+                FEED_HUB_PORT=str(free_port()),
+                TF_CPP_MIN_LOG_LEVEL='3',
+                PYTHONWARNINGS='ignore',
+            )
+            env.pop('FEED_HUB_URL', None)
+            process = serve(kind, port, env, args.workers, args.threads)
+            try:
+                if not wait_ready(port):
+                    print(f"{kind:<9} did not become ready")
+                    continue
+                # Warm every worker's bar cache, model and result cache before measuring
+                load(port, requests, args.concurrency, 2.0, args.client_processes)
+                rps, latencies, errors = load(port, requests, args.concurrency, args.duration, args.client_processes)
+            finally:
+                process.terminate()
+                process.wait(30)
+            p50, p95, p99 = (np.percentile(latencies, q) * 1000 for q in (50, 95, 99))
+            label = kind if kind == 'flask' else f"gunicorn {args.workers}x{args.threads}"
+            print(f"{label:<14} {rps:8.1f} req/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   p99 {p99:7.1f} ms   errors {errors}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
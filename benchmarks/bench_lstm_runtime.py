@@ -0,0 +1,123 @@
+"""Benchmark: the pickled Keras LSTM vs its NumPy export (float32 and int8), each in a fresh process.
+
+For every runtime it reports the load time (imports included), predict
+throughput on min-max scaled windows, peak RSS, and the largest difference
+from the Keras predictions.  Without Keras installed the Keras run is
+skipped and the NumPy runtime is timed on random weights of the notebook's
+shape (LSTM 50, LSTM 50, Dense 25, Dense 1).
+
+Run from the repository root: ``python benchmarks/bench_lstm_runtime.py [--rows 5000]``
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from lstm_runtime import NumpyLSTM, export_lstm, save_layers, sample_windows
+from windowing import WINDOW
+
+
+def load_pickle(path):
+    import pickle
+
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def random_layers(seed=0):
+    rng = np.random.default_rng(seed)
+    layers = []
+    for inputs, units, sequences in ((1, 50, True), (50, 50, False)):
+        layers.append({'type': 'LSTM', 'units': units, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+                       'return_sequences': sequences, 'go_backwards': False,
+                       'kernel': rng.normal(0, 0.3, (inputs, 4 * units)),
+                       'recurrent_kernel': rng.normal(0, 0.15, (units, 4 * units)),
+                       'bias': rng.normal(0, 0.1, 4 * units)})
+    for inputs, units in ((50, 25), (25, 1)):
+        layers.append({'type': 'Dense', 'units': units, 'activation': 'linear',
+                       'kernel': rng.normal(0, 0.3, (inputs, units)), 'bias': rng.normal(0, 0.1, units)})
+    return layers
+
+
+def child(runtime, path, rows, repeat, output):
+    """Runs in the fresh process: load, predict, report."""
+    started = time.perf_counter()
+    model = load_pickle(path) if runtime == 'keras' else NumpyLSTM.load(path)
+    load_seconds = time.perf_counter() - started
+    x = sample_windows(rows)
+    kwargs = {'verbose': 0} if runtime == 'keras' else {}
+    predictions = np.asarray(model.predict(x[:WINDOW], **kwargs))  # Warm-up
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        predictions = np.asarray(model.predict(x, **kwargs))
+        best = min(best, time.perf_counter() - started)
+    np.save(output, predictions)
+    print(json.dumps({'load_seconds': load_seconds, 'rows_per_second': rows / best,
+                      'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run_child(runtime, path, rows, repeat, output):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', runtime, '--path', path,
+                             '--rows', str(rows), '--repeat', str(repeat), '--output', output],
+                            capture_output=True, text=True, env=env)
+    if result.returncode:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+    return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(ROOT, 'model', 'model.pkl'))
+    parser.add_argument('--rows', type=int, default=5000, help="windows per predict call")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child, args.path, args.rows, args.repeat, args.output)
+
+    workdir = tempfile.mkdtemp(prefix='bench-lstm-')
+    exports = {'numpy float32': os.path.join(workdir, 'float32.npz'), 'numpy int8': os.path.join(workdir, 'int8.npz')}
+    try:
+        model = load_pickle(args.model)
+        for name, quantize in (('numpy float32', None), ('numpy int8', 'int8')):
+            export_lstm(model, exports[name], quantize=quantize)
+        runs = [('keras', args.model)] + list(exports.items())
+        del model
+    except Exception as e:  # Keras (TensorFlow) not installed
+        print(f"Cannot load {args.model} ({e.__class__.__name__}: {e}); timing random weights of the same shape")
+        for name, quantize in (('numpy float32', None), ('numpy int8', 'int8')):
+            save_layers(random_layers(), exports[name], quantize=quantize)
+        runs = list(exports.items())
+
+    print(f"{args.rows} windows of {WINDOW} steps per predict call")
+    reference = None
+    for name, path in runs:
+        output = os.path.join(workdir, name.replace(' ', '-') + '.npy')
+        result, error = run_child(name.split()[0], path, args.rows, args.repeat, output)
+        if result is None:
+            print(f"  {name:14s} failed: {error}")
+            continue
+        predictions = np.load(output)
+        if reference is None and name in ('keras', 'numpy float32'):
+            reference, reference_name = predictions, name
+            parity = ''
+        else:
+            parity = f"  max |diff| vs {reference_name} {np.abs(predictions - reference).max():.1e}"
+        print(f"  {name:14s} load {result['load_seconds']:6.2f} s  {result['rows_per_second']:9.0f} rows/s  "
+              f"peak RSS {result['max_rss_mb']:7.1f} MB  file {os.path.getsize(path) / 1024:6.0f} KiB{parity}")
+
+
+if __name__ == "__main__":
+    main()
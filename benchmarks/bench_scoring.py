@@ -0,0 +1,106 @@
+"""Benchmark: scoring a universe of symbols in one process vs on the shared-memory process pool.
+
+Builds a synthetic universe (500 symbols of 10 years of daily bars by
+default) and scores it with the backend's ``score_many``: first in this
+process (the single-threaded baseline), then with ``UniverseScorer`` on 1,
+2, 4, ... workers up to the number of cores.  Pool start (spawning the
+workers and loading their models) is timed separately from scoring.
+
+The SVM uses ``model/svm.pkl``; the LSTM uses the NumPy runtime on random
+weights of the notebook's shape, so neither needs TensorFlow.
+
+Run from the repository root: ``python benchmarks/bench_scoring.py [--backend svm|lstm] [--symbols 500]``
+"""
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backends import create_backend
+from bench_lstm_runtime import random_layers
+from lstm_runtime import npz_path, save_layers
+from model_registry import load_pickle
+from result_cache import model_identity
+from scoring import UniverseScorer
+
+
+def universe(symbols, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-01', periods=bars)
+    frames = {}
+    for i in range(symbols):
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.015, bars))
+        spread = np.abs(rng.normal(0, 0.01, bars)) * close
+        frames[f"SYM{i:03d}"] = pd.DataFrame({
+            'Date': dates,
+            'Open': close * (1 + rng.normal(0, 0.005, bars)),
+            'High': close + spread,
+            'Low': close - spread,
+            'Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, bars).astype(np.float64),
+        })
+    return frames
+
+
+def lstm_model(directory):
+    # A placeholder pickle plus a NumPy export that names it as its source, so load_lstm serves the export
+    path = os.path.join(directory, 'model.pkl')
+    with open(path, 'wb') as file:
+        pickle.dump(None, file)
+    save_layers(random_layers(), npz_path(path), source=model_identity(path))
+    os.environ['LSTM_RUNTIME'] = 'numpy'  # Inherited by the spawned workers
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='svm', choices=['svm', 'lstm'])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--workers', type=int, nargs='*', help="pool sizes (default 1, 2, 4, ... up to the cores)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    sizes = args.workers or sorted({min(2 ** k, cores) for k in range(cores.bit_length() + 1)})
+    frames = universe(args.symbols, 252 * args.years)
+    workdir = tempfile.mkdtemp(prefix='bench-scoring-')
+    try:
+        path = lstm_model(workdir) if args.backend == 'lstm' else os.path.join(ROOT, 'model', 'svm.pkl')
+        backend = create_backend(args.backend)
+        model = (backend.loader or load_pickle)(path)
+        print(f"{args.backend}: {args.symbols} symbols x {252 * args.years} bars, {cores} cores")
+
+        started = time.perf_counter()
+        reference = backend.score_many(model, [df.copy() for df in frames.values()])
+        baseline = time.perf_counter() - started
+        print(f"  in-process       {baseline:8.2f} s")
+
+        for workers in sizes:
+            scorer = UniverseScorer(args.backend, workers=workers)
+            started = time.perf_counter()
+            scorer.start(path)
+            start_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            results, errors = scorer.score(path, frames)
+            seconds = time.perf_counter() - started
+            scorer.close()
+            key = 'forecast' if args.backend == 'lstm' else 'score'
+            same = all(np.isclose(results[s][key], r[key]) for s, r in zip(frames, reference) if s in results)
+            print(f"  {workers:3d} workers      {seconds:8.2f} s  speedup {baseline / seconds:5.2f}x  "
+                  f"efficiency {baseline / seconds / workers:4.0%}  (pool start {start_seconds:.1f} s, "
+                  f"{len(errors)} errors, {'same' if same else 'DIFFERENT'} results)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: JSON time-series responses, ``to_dict(orient="records")`` + jsonify vs the column encoder.
+
+Two responses: 10 years of daily bars and one year of minute bars (252
+sessions of 390 minutes).  Also prints the size and cost of gzip and, when
+installed, brotli on each body.
+
+Run from the repository root: ``python benchmarks/bench_serialization.py``
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_formats import brotli, columnar_json, orjson, records_json
+
+
+def bars(dates):
+    rng = np.random.default_rng(0)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.001, len(dates)))
+    spread = np.abs(rng.normal(0, 0.2, len(dates)))
+    return pd.DataFrame({
+        'Date': dates,
+        'Open': close + rng.normal(0, 0.1, len(dates)),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, len(dates)),
+    })
+
+
+def minute_dates(sessions):
+    days = pd.bdate_range('2023-01-02', periods=sessions)
+    minutes = pd.timedelta_range('14:30:00', periods=390, freq='1min')
+    return (days.values[:, None] + minutes.values[None, :]).ravel()
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, seconds, size, baseline=None):
+    speedup = f"  ({baseline / seconds:5.1f}x)" if baseline else ''
+    print(f"  {label:28s} {seconds * 1000:9.1f} ms  {size / 1e6:7.2f} MB{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=10, help="years of daily bars")
+    parser.add_argument('--sessions', type=int, default=252, help="sessions of minute bars")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    for name, df in (('daily', bars(pd.bdate_range('2015-01-01', periods=252 * args.years))),
+                     ('minute', bars(minute_dates(args.sessions)))):
+        print(f"{name}: {len(df)} rows")
+        with app.app_context():
+            old = jsonify(df.to_dict(orient="records")).get_data()
+            baseline = timed(lambda: jsonify(df.to_dict(orient="records")).get_data())
+        body = records_json(df)
+        assert body == old, "records_json must match jsonify byte for byte"
+        report("to_dict + jsonify", baseline, len(old))
+        report("records_json", timed(lambda: records_json(df)), len(body), baseline)
+        rounded = records_json(df, precision=4)
+        report("records_json, precision=4", timed(lambda: records_json(df, precision=4)), len(rounded), baseline)
+        iso = records_json(df, date_format='iso')
+        report("records_json, iso dates", timed(lambda: records_json(df, date_format='iso')), len(iso), baseline)
+        columns = columnar_json(df)
+        report("columnar_json", timed(lambda: columnar_json(df)), len(columns), baseline)
+
+        # Compression of the default body
+        for level in (1, 5, 9):
+            report(f"gzip -{level}", timed(lambda: gzip.compress(body, compresslevel=level, mtime=0)),
+                   len(gzip.compress(body, compresslevel=level, mtime=0)))
+        if brotli is not None:
+            for quality in (1, 4, 9):
+                report(f"brotli q{quality}", timed(lambda: brotli.compress(body, quality=quality)),
+                       len(brotli.compress(body, quality=quality)))
+        report("gzip -5, precision=4", timed(lambda: gzip.compress(rounded, compresslevel=5, mtime=0)),
+               len(gzip.compress(rounded, compresslevel=5, mtime=0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Startup benchmark: import time (``python -X importtime``) and time to first response of each app.
+
+Run from the repository root: ``python benchmarks/bench_startup.py [--apps service service2] [--repeat 5]``
+
+For every app it reports
+  * import   : wall time of ``import <app>; <app>.create_app()`` in a fresh interpreter
+  * top      : the packages with the most ``-X importtime`` self time
+  * first    : process start until ``GET /data`` gets any answer from a real ``flask run`` server
+  * ready    : process start until ``GET /ready`` answers 200 (model in memory), for model apps
+
+The feed URL points at a closed local port so no run touches the network.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = {
+    'service': ('service', True),
+    'service2': ('service2', True),
+    'main': ('main', True),
+    'mainflask': (os.path.join('realtimeData', 'mainflask.py'), False),
+}
+
+
+def bench_env():
+    env = dict(os.environ)
+    env.setdefault('FINNHUB_WS_URL', 'ws://127.0.0.1:9')
+    env.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    return env
+
+
+def import_module_code(target):
+    if target.endswith('.py'):
+        directory, name = os.path.split(target[:-3])
+        return f"import sys; sys.path.insert(0, {directory!r}); import {name} as m; m.create_app()"
+    return f"import {target} as m; m.create_app()"
+
+
+def import_time(target):
+    """Wall time of importing the app and building it, plus the -X importtime breakdown."""
+    code = import_module_code(target)
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=bench_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.perf_counter() - started
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=bench_env(),
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        # Self time summed per top-level package: where the import time actually goes
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+    return wall, packages
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline, any_status=False):
+    """Poll ``url`` until it answers 200 (or anything at all with ``any_status``)."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except urllib.error.HTTPError:
+            if any_status:
+                return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def wait_ready(url, deadline):
+    """Poll /ready until 200; gives up early when it reports a load error (e.g. TensorFlow missing)."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except urllib.error.HTTPError as e:
+            if 'error' in json.loads(e.read() or b'{}'):
+                return False
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def first_response(target, has_model, timeout=120):
+    """Seconds from process start to the first HTTP answer and to /ready == 200."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'flask', '--app', target, 'run', '--port', str(port)],
+                               cwd=ROOT, env=bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        first = None
+        if wait_for(f"http://127.0.0.1:{port}/data", deadline, any_status=True):
+            first = time.perf_counter() - started
+        ready = None
+        if has_model and wait_ready(f"http://127.0.0.1:{port}/ready", deadline):
+            ready = time.perf_counter() - started
+        return first, ready
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def fmt(value):
+    return f"{value:7.2f}s" if value is not None else "    n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', nargs='*', default=list(APPS), choices=list(APPS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+
+    for name in args.apps:
+        target, has_model = APPS[name]
+        walls, firsts, readies, tops = [], [], [], []
+        for _ in range(args.repeat):
+            wall, top = import_time(target)
+            walls.append(wall)
+            tops.append(top)
+            first, ready = first_response(target, has_model)
+            firsts.append(first)
+            readies.append(ready)
+
+        def median(values):
+            values = [v for v in values if v is not None]
+            return statistics.median(values) if values else None
+
+        print(f"{name:<10} import {fmt(median(walls))}  first {fmt(median(firsts))}  ready {fmt(median(readies))}")
+        slowest = sorted(tops[-1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print("           " + ", ".join(f"{module} {seconds:.2f}s" for module, seconds in slowest))
+
+
+if __name__ == "__main__":
+    main()
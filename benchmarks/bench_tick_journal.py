@@ -0,0 +1,101 @@
+"""Benchmark: the tick journal, writing, time-range reads and replay through the live message path.
+
+Records a synthetic day of trades for a few symbols into a temporary
+journal (messages of one to three trades, like Finnhub's), then times
+range reads through the block index against reading the whole day, and
+a full-speed replay through ``LiveData.handle_message``.
+
+Run from the repository root: ``python benchmarks/bench_tick_journal.py [--ticks 1000000]``
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+from replay_ticks import replay_in_process
+from tick_journal import DAY_MS, TickJournal
+
+DAY = 1731542400000  # 2024-11-14 00:00 UTC
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_messages(ticks, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.integers(DAY, DAY + DAY_MS, ticks)).tolist()
+    prices = (100 * np.cumprod(1 + rng.normal(0, 1e-4, ticks))).tolist()
+    volumes = rng.random(ticks).round(6).tolist()
+    names = rng.integers(0, len(symbols), ticks).tolist()
+    messages, i = [], 0
+    while i < ticks:
+        size = min(int(rng.integers(1, 4)), ticks - i)
+        messages.append({"type": "trade", "data": [{"p": prices[j], "s": symbols[names[j]], "t": times[j], "v": volumes[j]}
+                                                   for j in range(i, i + size)]})
+        i += size
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=1_000_000)
+    parser.add_argument('--symbols', type=int, default=3)
+    args = parser.parse_args()
+
+    symbols = [f"BINANCE:SYM{i}USDT" for i in range(args.symbols)]
+    messages = synthetic_messages(args.ticks, symbols)
+    root = tempfile.mkdtemp(prefix='bench-journal-')
+    try:
+        journal = TickJournal(root)
+        started = time.perf_counter()
+        for message in messages:
+            journal.append(message)
+        journal.flush()
+        seconds = time.perf_counter() - started
+        journal.close()
+        size = sum(os.stat(os.path.join(d, f)).st_blocks * 512 for d, _, files in os.walk(root) for f in files)  # Sparse files
+        print(f"{args.ticks} ticks in {len(messages)} messages, {args.symbols} symbols, one day")
+        print(f"  append          {seconds:8.2f} s  {args.ticks / seconds:9.0f} ticks/s  {seconds / args.ticks * 1e6:5.1f} us/tick  "
+              f"{size / 1e6:.0f} MB on disk")
+
+        reader = TickJournal(root, record=False)
+        symbol = symbols[0]
+        whole = timed(lambda: reader.read(symbol))
+        print(f"  read whole day  {whole * 1000:8.2f} ms  ({len(reader.read(symbol))} rows)")
+        for label, span in (('1 minute', 60_000), ('1 hour', 3_600_000)):
+            start = DAY + DAY_MS // 2
+            indexed = timed(lambda: reader.read(symbol, start, start + span), repeat=20)
+
+            def scan():
+                rows = reader.read(symbol)
+                return rows[(rows['t'] >= start) & (rows['t'] < start + span)]
+
+            print(f"  read {label:10s} {indexed * 1000:8.2f} ms  vs {timed(scan) * 1000:7.2f} ms scanning the day  "
+                  f"({len(reader.read(symbol, start, start + span))} rows)")
+
+        started = time.perf_counter()
+        count = sum(1 for _ in reader.messages())
+        print(f"  rebuild messages {time.perf_counter() - started:7.2f} s  ({count} messages)")
+        stats = replay_in_process(reader.messages(), speed=0)
+        print(f"  replay (speed 0) {stats['seconds']:7.2f} s  {stats['messages_per_second']:9.0f} messages/s  "
+              f"handler p50 {stats['p50_us']:.0f} us, p99 {stats['p99_us']:.0f} us, "
+              f"{stats['live_bars']['bars_completed']} live bars")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Micro-benchmark: Python loop vs strided view for the LSTM input windows.
+
+Run from the repository root: ``python benchmarks/bench_windows.py``
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from windowing import WINDOW, lookback_windows
+
+
+def loop_windows(test_data):
+    # The construction previously inlined in get_predictions_data
+    x_test = []
+    for i in range(WINDOW, len(test_data)):
+        x_test.append(test_data[i - WINDOW:i, 0])
+    x_test = np.array(x_test)
+    return np.reshape(x_test, (x_test.shape[0], x_test.shape[1], 1))
+
+
+def main():
+    print(f"{'bars':>8} {'loop ms':>10} {'view ms':>10} {'view+copy ms':>14} {'speedup':>8}")
+    for bars in (10_000, 25_000, 50_000, 100_000):
+        test_data = np.random.rand(bars, 1)
+        assert np.array_equal(loop_windows(test_data), lookback_windows(test_data))
+        repeat = 5
+        loop = min(timeit.repeat(lambda: loop_windows(test_data), number=1, repeat=repeat)) * 1000
+        view = min(timeit.repeat(lambda: lookback_windows(test_data), number=1, repeat=repeat)) * 1000
+        # What it costs if a consumer needs a contiguous copy anyway
+        copy = min(timeit.repeat(lambda: np.ascontiguousarray(lookback_windows(test_data)),
+                                 number=1, repeat=repeat)) * 1000
+        print(f"{bars:>8} {loop:>10.2f} {view:>10.4f} {copy:>14.2f} {loop / view:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import bars_version
+from response_formats import columnar_json
+from result_cache import ResultCache
+
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'json': 'application/json'}
+DOWNSAMPLERS = ('lttb', 'minmax', 'none')
+MAX_PIXELS = 4000  # Largest width/height a request may ask for
+
+
+# ---------------- Downsampling ----------------
+def lttb_indices(x, y, threshold):
+    """Indices of the ``threshold`` points Largest-Triangle-Three-Buckets keeps of ``(x, y)``.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket, which preserves peaks
+    and the visual shape of the line.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the points between the first and the last one
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Average point of every bucket, the last point being a bucket of its own
+    starts = np.append(edges[:-1], n - 1)
+    sizes = np.diff(np.append(starts, n))
+    avg_x = np.add.reduceat(x, starts) / sizes
+    avg_y = np.add.reduceat(y, starts) / sizes
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        xs, ys = x[start:stop], y[start:stop]
+        # Twice the triangle area of (a, candidate, next bucket average)
+        area = np.abs((x[a] - avg_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (avg_y[i + 1] - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y, buckets):
+    """Indices of the minimum and maximum of ``y`` in each of ``buckets`` equal slices, in order."""
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    # Sorting by (bucket, value) puts every bucket's min first and its max last
+    order = np.lexsort((y, bucket))
+    bounds = np.searchsorted(bucket[order], np.arange(buckets))
+    lows = order[bounds]
+    highs = order[np.append(bounds[1:], n) - 1]
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def downsample(df, points, method='lttb'):
+    """At most about ``points`` rows of ``df`` (Date/Close) chosen by ``method``."""
+    if method == 'none' or len(df) <= points:
+        return df
+    if method == 'minmax':
+        indices = minmax_indices(df['Close'].to_numpy(), max(points // 2, 1))
+    else:
+        indices = lttb_indices(df['Date'].to_numpy().astype('datetime64[s]').astype(np.int64), df['Close'].to_numpy(), points)
+    return df.iloc[indices].reset_index(drop=True)
+
+
+# ---------------- Rendering ----------------
+class ChartRenderer:
+    """Closing-price line charts drawn with the object-oriented Agg API, never pyplot.
+
+    Building a figure and its axes costs about as much as drawing it, so one
+    figure per image size is kept (up to ``max_figures``) and only its line
+    data, limits and labels change between charts.  Figures are not safe to
+    draw from several threads and matplotlib's font cache is shared, so
+    rendering is serialized; cached charts never take the lock.
+    """
+
+    def __init__(self, max_figures=4, dpi=100, png_compress_level=3):
+        self.max_figures = max_figures
+        self.dpi = dpi
+        self.png_compress_level = png_compress_level  # zlib level: 1-3 encode much faster than the default 6
+        self._figures = OrderedDict()  # (width, height) -> (figure, axes, line), most recently used last
+        self._lock = threading.Lock()
+
+    def render(self, df, symbol, width=1000, height=500, fmt='png'):
+        """PNG or SVG bytes of the Date/Close line of ``df``."""
+        dates, closes = df['Date'].to_numpy(), df['Close'].to_numpy()
+        with self._lock:
+            fig, ax, line = self._figure(width, height, dates, closes)
+            line.set_data(dates, closes)
+            line.set_label(f'{symbol} Closing Price')
+            ax.relim()
+            ax.autoscale_view()
+            ax.set_title(f"{symbol} Stock Price Over Time")
+            ax.legend(loc='upper left')  # 'best' scans every point of the line for a free spot
+            img = io.BytesIO()
+            if fmt == 'png':
+                fig.savefig(img, format='png', pil_kwargs={'compress_level': self.png_compress_level})
+            else:
+                fig.savefig(img, format=fmt)
+        return img.getvalue()
+
+    def _figure(self, width, height, dates, closes):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        key = (width, height)
+        figure = self._figures.get(key)
+        if figure is not None:
+            self._figures.move_to_end(key)
+            return figure
+        fig = Figure(figsize=(width / self.dpi, height / self.dpi), dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        # The first plot sets up the date axis; later charts only swap the data
+        line, = ax.plot(dates, closes)
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Closing Price (USD)")
+        figure = self._figures[key] = (fig, ax, line)
+        while len(self._figures) > self.max_figures:
+            self._figures.popitem(last=False)
+        return figure
+
+
+def chart_key(symbol, start, end, width, height, fmt, method, data_version):
+    """Cache key and ETag of one rendered chart."""
+    start = pd.Timestamp(start).strftime('%Y-%m-%d')
+    end = pd.Timestamp(end).strftime('%Y-%m-%d')
+    raw = f"{symbol}|{start}|{end}|{width}x{height}|{fmt}|{method}|{data_version}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def register_chart_routes(app, bar_cache, chart_cache, renderer):
+    """GET/POST /plot_stock_data: closing-price chart as PNG (default), SVG or downsampled JSON series.
+
+    Parameters come from the query string or the JSON body: ``symbol``,
+    ``start_date``, ``end_date``, ``width`` and ``height`` (pixels),
+    ``format`` (png|svg|json) and ``downsample`` (lttb|minmax|none).  The
+    response carries an ETag; a matching ``If-None-Match`` gets a 304.
+    """
+    from flask import Response, jsonify, request
+
+    @app.route("/plot_stock_data", methods=["GET", "POST"])
+    def plot_stock_data():
+        params = dict(request.args)
+        params.update(request.get_json(silent=True) or {})
+        stock_symbol = params.get("symbol", "META")
+        start_date = params.get("start_date", '2020-01-01')
+        end_date = params.get("end_date", '2024-11-15')
+        fmt = str(params.get("format", "png")).lower()
+        method = str(params.get("downsample", "lttb")).lower()
+        try:
+            width = int(params.get("width", 1000))
+            height = int(params.get("height", 500))
+        except (TypeError, ValueError):
+            return jsonify({"error": "'width' and 'height' must be integers"}), 400
+        if fmt not in CHART_FORMATS:
+            return jsonify({"error": f"'format' must be one of {list(CHART_FORMATS)}"}), 400
+        if method not in DOWNSAMPLERS:
+            return jsonify({"error": f"'downsample' must be one of {list(DOWNSAMPLERS)}"}), 400
+        if not (50 <= width <= MAX_PIXELS and 50 <= height <= MAX_PIXELS):
+            return jsonify({"error": f"'width' and 'height' must be between 50 and {MAX_PIXELS}"}), 400
+
+        stock_data = bar_cache.get(stock_symbol, start_date, end_date)
+        if stock_data is None or stock_data.empty:
+            return jsonify({"error": "Failed to retrieve stock data"}), 500
+
+        # Same symbol, range, size and bars: same chart, whichever worker drew it
+        key = chart_key(stock_symbol, start_date, end_date, width, height, fmt, method,
+                        bars_version(stock_symbol, stock_data))
+        body = chart_cache.get(key)
+        revalidating = request.method in ("GET", "HEAD") and request.if_none_match.contains_weak(key)
+        if body is None and not revalidating:
+            # One point per horizontal pixel is all a line chart can show
+            data = downsample(stock_data[['Date', 'Close']], width, method)
+            if fmt == 'json':
+                body = columnar_json(data)
+            else:
+                body = renderer.render(data, stock_symbol, width, height, fmt)
+            chart_cache.put(key, body)
+        response = Response(body or b'', mimetype=CHART_FORMATS[fmt])
+        response.set_etag(key)
+        response.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response.make_conditional(request)
+
+
+def create_chart_cache():
+    """Rendered charts (bytes), configured through the environment."""
+    return ResultCache(
+        max_entries=int(os.environ.get('CHART_CACHE_MAX_ENTRIES', 256)),
+        ttl=float(os.environ.get('CHART_CACHE_TTL', 3600)),
+        disk_dir=os.environ.get('CHART_CACHE_DIR') or None,
+    )
+
+
+def create_chart_renderer():
+    return ChartRenderer(
+        max_figures=int(os.environ.get('CHART_MAX_FIGURES', 4)),
+        png_compress_level=int(os.environ.get('CHART_PNG_COMPRESSION', 3)),
+    )
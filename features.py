@@ -0,0 +1,476 @@
+"""Technical indicators over many symbols at once, and incrementally bar by bar.
+
+``FeatureEngine.compute`` takes High/Low/Close panels shaped ``(dates,
+symbols)`` and returns every indicator in one contiguous ``(features,
+dates, symbols)`` float64 block: rolling windows come from running sums,
+moving averages from a linear filter down the dates axis, so the cost is
+a few passes over the panel whatever the number of symbols.
+
+``IncrementalFeatures`` keeps the same indicators as running state per
+symbol (ring buffers, window sums, smoothing states) and folds in one new
+bar in O(1), e.g. every live bar completed from the WebSocket trades.  It
+gives the values the batch engine gives for the same bars.
+"""
+import os
+import threading
+
+import numpy as np
+
+from bar_aggregator import CLOSE, HIGH, LOW
+from response_formats import columnar_json
+
+
+# ---------------- Batch building blocks ----------------
+def _shift(x, periods):
+    """``x`` moved down ``periods`` rows, NaN on top."""
+    out = np.full_like(x, np.nan)
+    if periods < len(x):
+        out[periods:] = x[:len(x) - periods]
+    return out
+
+
+def _rolling_sums(x, window):
+    """Sum of the last ``window`` rows and whether all of them are present (non-NaN)."""
+    valid = ~np.isnan(x)
+    if valid.all():
+        # No gaps: only the first ``window - 1`` rows are short of a full window
+        total = np.cumsum(x, axis=0)
+        total[window:] = total[window:] - total[:-window]
+        return total, (np.arange(len(x)) >= window - 1)[:, None]
+    total = np.cumsum(np.where(valid, x, 0.0), axis=0)
+    count = np.cumsum(valid, axis=0, dtype=np.int64)
+    total[window:] = total[window:] - total[:-window]
+    count[window:] = count[window:] - count[:-window]
+    return total, count == window
+
+
+def rolling_mean(x, window):
+    total, full = _rolling_sums(x, window)
+    return np.where(full, total / window, np.nan)
+
+
+def rolling_std(x, window, ddof=0):
+    """Rolling standard deviation from running sums of the column-centered values."""
+    # Centering on each column's first value keeps the sums of squares small
+    first = np.argmax(~np.isnan(x), axis=0)
+    centered = x - np.nan_to_num(x[first, np.arange(x.shape[1])])
+    total, full = _rolling_sums(centered, window)
+    squares, _ = _rolling_sums(centered * centered, window)
+    var = np.maximum((squares - total * total / window) / (window - ddof), 0.0)
+    return np.where(full, np.sqrt(var), np.nan)
+
+
+def ema(x, alpha, min_periods=1):
+    """Exponential moving average down the rows, like ``ewm(alpha=alpha, adjust=False)``.
+
+    Missing (NaN) values are skipped and stay NaN; the average starts at the
+    first value and is NaN until ``min_periods`` values have been seen.
+    """
+    from scipy.signal import lfilter
+
+    b, a = [alpha], [1.0, alpha - 1.0]
+    out = np.full_like(x, np.nan)
+    valid = ~np.isnan(x)
+    start = int(np.argmax(valid, axis=0).max()) if x.size else 0
+    if x.size and valid[start:].all() and not valid[:start].any():
+        # Every symbol starts on the same row with no gaps: one filter over the whole panel
+        rows = x[start:]
+        out[start:], _ = lfilter(b, a, rows, axis=0, zi=(1.0 - alpha) * rows[:1])
+        out[start:start + min_periods - 1] = np.nan
+        return out
+    for j in range(x.shape[1]):
+        rows = np.flatnonzero(valid[:, j])
+        if not len(rows):
+            continue
+        values = x[rows, j]
+        smoothed, _ = lfilter(b, a, values, zi=[(1.0 - alpha) * values[0]])
+        smoothed[:min_periods - 1] = np.nan
+        out[rows, j] = smoothed
+    return out
+
+
+def _panel(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.ascontiguousarray(values.reshape(len(values), -1))
+
+
+# ---------------- Batch engine ----------------
+class FeatureEngine:
+    """The indicator library and its parameters; ``names`` lists the features it produces.
+
+    * ``sma_<w>``, ``ema_<span>``: simple and exponential moving averages of the close
+    * ``rsi_<n>``: Wilder's relative strength index, 0-100
+    * ``macd``, ``macd_signal``, ``macd_hist``: EMA(fast) - EMA(slow), its EMA and their difference
+    * ``bb_upper``, ``bb_lower``, ``bb_pctb``, ``bb_width``: Bollinger bands (population std)
+    * ``atr_<n>``: Wilder's average true range
+    * ``vol_<w>``: standard deviation of the last ``w`` log returns
+    * ``ret_<k>``: return over the last ``k`` bars
+    """
+
+    def __init__(self, sma_windows=(10, 20, 50), ema_spans=(12, 26), rsi_period=14, macd=(12, 26, 9),
+                 bollinger=(20, 2.0), atr_period=14, vol_window=20, return_lags=(1, 5, 10)):
+        self.sma_windows = tuple(sma_windows)
+        self.ema_spans = tuple(ema_spans)
+        self.rsi_period = rsi_period
+        self.macd = tuple(macd)
+        self.bollinger = (int(bollinger[0]), float(bollinger[1]))
+        self.atr_period = atr_period
+        self.vol_window = vol_window
+        self.return_lags = tuple(return_lags)
+        self.names = (
+            [f'sma_{w}' for w in self.sma_windows]
+            + [f'ema_{span}' for span in self.ema_spans]
+            + [f'rsi_{rsi_period}', 'macd', 'macd_signal', 'macd_hist',
+               'bb_upper', 'bb_lower', 'bb_pctb', 'bb_width', f'atr_{atr_period}', f'vol_{vol_window}']
+            + [f'ret_{k}' for k in self.return_lags]
+        )
+        # Closes the incremental mode has to remember: the longest window or lag
+        self.history = max(self.sma_windows + (self.bollinger[0],) + tuple(k + 1 for k in self.return_lags))
+
+    def check(self, names):
+        unknown = [name for name in names if name not in self.names]
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}, expected some of {self.names}")
+        return list(names)
+
+    def compute(self, high, low, close, names=None):
+        """``(features, dates, symbols)`` array of ``names`` (default: all) for the given panels.
+
+        Rows where a symbol has no bar are NaN; a window touching such a row
+        is NaN too, while the moving averages skip it.
+        """
+        names = self.check(names) if names is not None else self.names
+        close = _panel(close)
+        out = np.full((len(names),) + close.shape, np.nan)
+        if not names:
+            return out
+        wanted = set(names)
+        values = {}
+        prev_close = _shift(close, 1)
+
+        for w in self.sma_windows:
+            if f'sma_{w}' in wanted:
+                values[f'sma_{w}'] = rolling_mean(close, w)
+        for span in self.ema_spans:
+            if f'ema_{span}' in wanted:
+                values[f'ema_{span}'] = ema(close, 2.0 / (span + 1), span)
+
+        rsi_name = f'rsi_{self.rsi_period}'
+        if rsi_name in wanted:
+            n = self.rsi_period
+            delta = close - prev_close
+            gain = ema(np.maximum(delta, 0.0), 1.0 / n, n)
+            loss = ema(np.maximum(-delta, 0.0), 1.0 / n, n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rsi = 100.0 * gain / (gain + loss)
+            values[rsi_name] = np.where((gain + loss == 0.0), 50.0, rsi)  # Flat prices: neither side
+
+        if wanted & {'macd', 'macd_signal', 'macd_hist'}:
+            fast, slow, signal = self.macd
+            macd = ema(close, 2.0 / (fast + 1), fast) - ema(close, 2.0 / (slow + 1), slow)
+            macd_signal = ema(macd, 2.0 / (signal + 1), signal)
+            values.update(macd=macd, macd_signal=macd_signal, macd_hist=macd - macd_signal)
+
+        if wanted & {'bb_upper', 'bb_lower', 'bb_pctb', 'bb_width'}:
+            window, k = self.bollinger
+            mid = rolling_mean(close, window)
+            band = k * rolling_std(close, window)
+            upper, lower = mid + band, mid - band
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pctb = np.where(band > 0, (close - lower) / (upper - lower), 0.5)
+                values.update(bb_upper=upper, bb_lower=lower, bb_pctb=np.where(np.isnan(band), np.nan, pctb),
+                              bb_width=(upper - lower) / mid)
+
+        atr_name = f'atr_{self.atr_period}'
+        if atr_name in wanted:
+            high, low = _panel(high), _panel(low)
+            # True range; the first bar of a symbol has no previous close (fmax skips the NaN)
+            true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+            true_range[np.isnan(close)] = np.nan
+            values[atr_name] = ema(true_range, 1.0 / self.atr_period, self.atr_period)
+
+        vol_name = f'vol_{self.vol_window}'
+        if vol_name in wanted:
+            values[vol_name] = rolling_std(np.log(close / prev_close), self.vol_window, ddof=1)
+
+        for k in self.return_lags:
+            if f'ret_{k}' in wanted:
+                values[f'ret_{k}'] = close / _shift(close, k) - 1.0
+
+        for i, name in enumerate(names):
+            out[i] = values[name]
+        return out
+
+    def frame(self, df, names=None):
+        """Indicators of one symbol's High/Low/Close bars as a DataFrame on ``df``'s index."""
+        import pandas as pd
+
+        names = self.check(names) if names is not None else self.names
+        block = self.compute(df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(), names)
+        return pd.DataFrame(block[:, :, 0].T, index=df.index, columns=names)
+
+
+def bar_panels(frames, columns=('High', 'Low', 'Close')):
+    """Align per-symbol bar frames on one date index: ``(dates, {column: (dates, symbols) array})``.
+
+    ``frames`` maps symbols to frames with a ``Date`` column; missing bars are NaN.
+    """
+    import pandas as pd
+
+    symbols = list(frames)
+    indexed = {symbol: frames[symbol].set_index('Date') for symbol in symbols}
+    dates = pd.DatetimeIndex(sorted(set().union(*(frame.index for frame in indexed.values()))))
+    panels = {}
+    for column in columns:
+        panel = np.full((len(dates), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            panel[dates.get_indexer(indexed[symbol].index), j] = indexed[symbol][column].to_numpy(dtype=np.float64)
+        panels[column] = panel
+    return dates, panels
+
+
+# ---------------- Incremental mode ----------------
+class _SymbolState:
+    """Running state of one symbol's indicators."""
+
+    def __init__(self, engine):
+        self.bars = 0
+        self.closes = [0.0] * engine.history  # Ring of the last closes
+        self.ref = 0.0  # First close: Bollinger sums are centered on it
+        self.sma_sums = {w: 0.0 for w in engine.sma_windows}
+        self.bb_sum = self.bb_squares = 0.0
+        self.emas = {span: 0.0 for span in engine.ema_spans}
+        self.macd_fast = self.macd_slow = self.macd_signal = 0.0
+        self.macd_count = 0
+        self.gain = self.loss = 0.0
+        self.atr = 0.0
+        self.log_returns = [0.0] * engine.vol_window
+        self.vol_ref = 0.0  # First log return, the centre of the volatility sums
+        self.vol_sum = self.vol_squares = 0.0
+        self.values = None
+
+
+def _ema_step(state, value, alpha, count):
+    # ``count`` values seen before this one; the first value starts the average
+    return value if count == 0 else state + alpha * (value - state)
+
+
+class IncrementalFeatures:
+    """Every ``FeatureEngine`` indicator of many series, updated in O(1) per new bar.
+
+    A series is any hashable key, e.g. a symbol or ``(symbol, interval)``.
+    ``update`` folds a completed bar in; ``peek`` gives the values the bar
+    being built would produce if it closed now, without changing the state.
+    Completed bars cannot be revised, so a late trade that amends one is not
+    reflected.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or FeatureEngine()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, high, low, close):
+        """Fold the completed bar into ``key``'s state; returns ``{name: value}`` (NaN while warming up)."""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _SymbolState(self.engine)
+            state.values = self._step(state, float(high), float(low), float(close), commit=True)
+            return dict(state.values)
+
+    def peek(self, key, high, low, close):
+        """Values if a bar with this high/low/close completed now; the state is left as is."""
+        with self._lock:
+            state = self._states.get(key) or _SymbolState(self.engine)
+            return self._step(state, float(high), float(low), float(close), commit=False)
+
+    def latest(self, key):
+        """Values after the last completed bar of ``key``, or None."""
+        with self._lock:
+            state = self._states.get(key)
+            return None if state is None or state.values is None else dict(state.values)
+
+    def bars(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            return 0 if state is None else state.bars
+
+    def keys(self):
+        with self._lock:
+            return list(self._states)
+
+    def on_bar(self, symbol, interval, bar):
+        """``BarAggregator`` listener: fold every completed live bar into ``(symbol, interval)``."""
+        self.update((symbol, interval), bar[HIGH], bar[LOW], bar[CLOSE])
+
+    def _step(self, s, high, low, close, commit):
+        engine = self.engine
+        nan = float('nan')
+        n = s.bars  # Bars seen before this one
+        ring = s.closes
+        size = len(ring)
+
+        def ago(k):
+            # Close ``k`` bars before this one (k <= n)
+            return ring[(n - k) % size]
+
+        prev = ago(1) if n else nan
+        ref = close if n == 0 else s.ref
+        values = {}
+
+        sma_sums = {}
+        for w in engine.sma_windows:
+            total = s.sma_sums[w] + close - (ago(w) if n >= w else 0.0)
+            sma_sums[w] = total
+            values[f'sma_{w}'] = total / w if n + 1 >= w else nan
+
+        emas = {}
+        for span in engine.ema_spans:
+            emas[span] = _ema_step(s.emas[span], close, 2.0 / (span + 1), n)
+            values[f'ema_{span}'] = emas[span] if n + 1 >= span else nan
+
+        # RSI: Wilder smoothing of the gains and losses from the second bar on
+        period = engine.rsi_period
+        gain, loss = s.gain, s.loss
+        if n:
+            delta = close - prev
+            gain = _ema_step(gain, max(delta, 0.0), 1.0 / period, n - 1)
+            loss = _ema_step(loss, max(-delta, 0.0), 1.0 / period, n - 1)
+        if n >= period:
+            values[f'rsi_{period}'] = 100.0 * gain / (gain + loss) if gain + loss != 0.0 else 50.0
+        else:
+            values[f'rsi_{period}'] = nan
+
+        fast, slow, signal = engine.macd
+        macd_fast = _ema_step(s.macd_fast, close, 2.0 / (fast + 1), n)
+        macd_slow = _ema_step(s.macd_slow, close, 2.0 / (slow + 1), n)
+        macd_signal, macd_count = s.macd_signal, s.macd_count
+        macd = nan
+        if n + 1 >= max(fast, slow):
+            macd = macd_fast - macd_slow
+            macd_signal = _ema_step(macd_signal, macd, 2.0 / (signal + 1), macd_count)
+            macd_count += 1
+        values['macd'] = macd
+        values['macd_signal'] = macd_signal if macd_count >= signal else nan
+        values['macd_hist'] = macd - values['macd_signal']
+
+        window, k = engine.bollinger
+        leaving = ago(window) - ref if n >= window else 0.0
+        bb_sum = s.bb_sum + (close - ref) - leaving
+        bb_squares = s.bb_squares + (close - ref) ** 2 - leaving * leaving
+        if n + 1 >= window:
+            mid = ref + bb_sum / window
+            band = k * max((bb_squares - bb_sum * bb_sum / window) / window, 0.0) ** 0.5
+            values['bb_upper'], values['bb_lower'] = mid + band, mid - band
+            values['bb_pctb'] = (close - mid + band) / (2 * band) if band > 0 else 0.5
+            values['bb_width'] = 2 * band / mid if mid != 0.0 else nan
+        else:
+            values['bb_upper'] = values['bb_lower'] = values['bb_pctb'] = values['bb_width'] = nan
+
+        true_range = high - low if n == 0 else max(high - low, abs(high - prev), abs(low - prev))
+        atr = _ema_step(s.atr, true_range, 1.0 / engine.atr_period, n)
+        values[f'atr_{engine.atr_period}'] = atr if n + 1 >= engine.atr_period else nan
+
+        # Volatility of log returns; return i (from 0) is made by bar i + 1
+        window = engine.vol_window
+        vol_sum, vol_squares, vol_ref = s.vol_sum, s.vol_squares, s.vol_ref
+        log_return = None
+        if n:
+            log_return = float(np.log(close / prev))
+            if n == 1:
+                vol_ref = log_return
+            leaving = s.log_returns[(n - 1) % window] - vol_ref if n - 1 >= window else 0.0
+            vol_sum += (log_return - vol_ref) - leaving
+            vol_squares += (log_return - vol_ref) ** 2 - leaving * leaving
+        if n >= window:
+            var = max((vol_squares - vol_sum * vol_sum / window) / (window - 1), 0.0)
+            values[f'vol_{window}'] = var ** 0.5
+        else:
+            values[f'vol_{window}'] = nan
+
+        for lag in engine.return_lags:
+            values[f'ret_{lag}'] = close / ago(lag) - 1.0 if n >= lag else nan
+
+        if commit:
+            s.bars = n + 1
+            ring[n % size] = close
+            s.ref = ref
+            s.sma_sums = sma_sums
+            s.bb_sum, s.bb_squares = bb_sum, bb_squares
+            s.emas = emas
+            s.macd_fast, s.macd_slow, s.macd_signal, s.macd_count = macd_fast, macd_slow, macd_signal, macd_count
+            s.gain, s.loss = gain, loss
+            s.atr = atr
+            if log_return is not None:
+                s.log_returns[(n - 1) % window] = log_return
+            s.vol_sum, s.vol_squares, s.vol_ref = vol_sum, vol_squares, vol_ref
+        return {name: values[name] for name in engine.names}
+
+
+# ---------------- Routes ----------------
+def register_feature_routes(app, bar_cache, live):
+    """GET /features (daily bars, batch engine) and GET /features/live (live bars, incremental state).
+
+    ``/features?symbol=META&start_date=...&end_date=...&names=rsi_14,macd``
+    returns columnar JSON: ``Date`` plus one array per indicator.
+    ``/features/live?symbol=...&interval=1m[&partial=1]`` returns the latest
+    values of the live bars, including the bar still being built with
+    ``partial=1``.
+    """
+    from datetime import date
+
+    from flask import Response, jsonify, request
+
+    engine = live.features.engine
+
+    @app.route("/features", methods=["GET"])
+    def get_features():
+        symbol = request.args.get("symbol", "META")
+        names = request.args.get("names")
+        try:
+            names = engine.check(names.split(",")) if names else engine.names
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # The /predictions default range
+        df = bar_cache.get(symbol, request.args.get("start_date", '2015-01-01'), request.args.get("end_date", str(date.today())))
+        if df is None or df.empty:
+            return jsonify({"error": "Failed to retrieve stock data"}), 500
+        frame = engine.frame(df, names)
+        frame.insert(0, 'Date', df['Date'])
+        return Response(columnar_json(frame), mimetype='application/json')
+
+    @app.route("/features/live", methods=["GET"])
+    def get_live_features():
+        symbol = request.args.get("symbol")
+        interval = request.args.get("interval", "1m")
+        if not symbol:
+            return jsonify({"error": "'symbol' is required"}), 400
+        if interval not in live.bar_aggregator.intervals:
+            return jsonify({"error": f"'interval' must be one of {list(live.bar_aggregator.intervals)}"}), 400
+        key = (symbol, interval)
+        values = live.features.latest(key)
+        partial = live.bar_aggregator.current(symbol, interval) if request.args.get("partial", "0") in ("1", "true") else None
+        if partial is not None:
+            values = live.features.peek(key, partial[HIGH], partial[LOW], partial[CLOSE])
+        if values is None:
+            return jsonify({"error": f"No completed {interval} bars for {symbol} yet"}), 404
+        return jsonify({
+            "symbol": symbol,
+            "interval": interval,
+            "bars": live.features.bars(key) + (partial is not None),
+            "partial": partial is not None,
+            "values": {name: (None if value != value else value) for name, value in values.items()},
+        })
+
+
+def create_feature_engine():
+    """The default indicator parameters, overridable through ``FEATURE_*`` variables."""
+    def ints(name, default):
+        return tuple(int(v) for v in os.environ.get(name, default).split(",") if v)
+
+    return FeatureEngine(
+        sma_windows=ints('FEATURE_SMA_WINDOWS', "10,20,50"),
+        ema_spans=ints('FEATURE_EMA_SPANS', "12,26"),
+        return_lags=ints('FEATURE_RETURN_LAGS', "1,5,10"),
+    )
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+
+class FeedClient:
+    """Finnhub trade feed on asyncio, running in its own background thread.
+
+    Reconnects with jittered exponential backoff and re-subscribes to the
+    current symbol set after every reconnect.  The backoff only starts over
+    after a connection stayed up for ``stable_after`` seconds, so an upstream
+    that accepts and then drops every connection (an auth or rate-limit
+    rejection) is retried less and less often.  Symbols can be added and
+    removed at runtime from any thread.  Messages go through a bounded queue
+    to ``handler`` (called with the parsed message); when the handler falls
+    behind, the reader stops pulling from the socket, so backpressure reaches
+    the upstream connection instead of memory growing.
+
+    ``hello``, if given, is called on every (re)connect for a message sent
+    before the subscriptions (the feed hub's resume point, see feed_hub.py).
+    """
+
+    def __init__(self, url, symbols=(), handler=None, queue_size=10000,
+                 backoff_base=0.5, backoff_max=30.0, connect_timeout=10.0, hello=None, stable_after=10.0):
+        self.url = url
+        self.handler = handler
+        self.hello = hello
+        self.queue_size = queue_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.stable_after = stable_after
+        self._symbols = set(symbols)
+        self._symbols_lock = threading.Lock()
+        self._loop = None
+        self._ws = None
+        self._thread = None
+        self._stopping = False
+        self._stats = {
+            'connected': False,
+            'messages': 0,
+            'messages_per_second': 0.0,
+            'reconnects': 0,
+            'handler_errors': 0,
+            'lag_ms': None,
+            'last_error': None,
+        }
+
+    # ---- lifecycle ----
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._thread_main, name='feed-client', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopping = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._close_socket)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    # ---- subscriptions ----
+    def subscribe(self, symbol):
+        with self._symbols_lock:
+            self._symbols.add(symbol)
+        self._send_threadsafe({"type": "subscribe", "symbol": symbol})
+
+    def unsubscribe(self, symbol):
+        with self._symbols_lock:
+            self._symbols.discard(symbol)
+        self._send_threadsafe({"type": "unsubscribe", "symbol": symbol})
+
+    def symbols(self):
+        with self._symbols_lock:
+            return sorted(self._symbols)
+
+    def _send_threadsafe(self, message):
+        # Not connected: the symbol set is replayed on the next (re)connect anyway
+        if self._loop is not None and self._ws is not None:
+            asyncio.run_coroutine_threadsafe(self._send(message), self._loop)
+
+    async def _send(self, message):
+        ws = self._ws
+        if ws is not None:
+            try:
+                await ws.send(json.dumps(message))
+            except Exception as e:
+                self._stats['last_error'] = f"send: {e}"
+
+    # ---- connection loop ----
+    async def _run(self):
+        import websockets
+
+        attempt = 0
+        meter = asyncio.ensure_future(self._meter())
+        while not self._stopping:
+            connected = None
+            try:
+                async with websockets.connect(self.url, open_timeout=self.connect_timeout) as ws:
+                    self._ws = ws
+                    self._stats['connected'] = True
+                    connected = time.monotonic()
+                    if self.hello is not None:
+                        # Every message of the previous connection has been handled by now (see _pump)
+                        await ws.send(json.dumps(self.hello()))
+                    for symbol in self.symbols():
+                        await ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+                    await self._pump(ws)
+            except Exception as e:
+                self._stats['last_error'] = repr(e)
+            finally:
+                self._ws = None
+                self._stats['connected'] = False
+            if self._stopping:
+                break
+            if connected is not None and time.monotonic() - connected >= self.stable_after:
+                attempt = 0  # A connection that held up: start the backoff over
+            self._stats['reconnects'] += 1
+            attempt += 1
+            # Full jitter keeps many pods from reconnecting in lockstep
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+        meter.cancel()
+
+    async def _pump(self, ws):
+        messages = asyncio.Queue(maxsize=self.queue_size)
+        consumer = asyncio.ensure_future(self._consume(messages))
+        try:
+            async for message in ws:
+                # Blocks while the queue is full, which stops reading from the socket
+                await messages.put(message)
+        finally:
+            if not self._stopping:
+                # Let the handler finish what was already received
+                await messages.join()
+            consumer.cancel()
+
+    async def _consume(self, messages):
+        while True:
+            message = await messages.get()
+            try:
+                parsed_message = json.loads(message)
+                self._stats['messages'] += 1
+                trades = parsed_message.get("data") if isinstance(parsed_message, dict) else None
+                if trades and parsed_message.get("type") == "trade":
+                    self._stats['lag_ms'] = int(time.time() * 1000) - max(trade.get("t", 0) for trade in trades)
+                if self.handler is not None:
+                    self.handler(parsed_message)
+            except Exception as e:
+                self._stats['handler_errors'] += 1
+                self._stats['last_error'] = f"handler: {e!r}"
+            finally:
+                messages.task_done()
+
+    async def _meter(self):
+        last_count, last_time = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+            now = time.monotonic()
+            count = self._stats['messages']
+            self._stats['messages_per_second'] = (count - last_count) / (now - last_time)
+            last_count, last_time = count, now
+
+    def _close_socket(self):
+        if self._ws is not None:
+            asyncio.ensure_future(self._ws.close())
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['symbols'] = self.symbols()
+        stats['url'] = self.url.split('?')[0]  # never echo the API token
+        return stats
+
+
+def register_feed_routes(app, feed):
+    """GET /feed (status and metrics), POST /feed/subscribe and /feed/unsubscribe with {"symbol": ...}."""
+    from flask import jsonify, request
+
+    @app.route("/feed", methods=["GET"])
+    def get_feed_status():
+        return jsonify(feed.stats())
+
+    @app.route("/feed/subscribe", methods=["POST"])
+    def subscribe_feed_symbol():
+        symbol = (request.get_json(silent=True) or {}).get("symbol")
+        if not isinstance(symbol, str) or not symbol:
+            return jsonify({"error": "'symbol' is required"}), 400
+        feed.subscribe(symbol)
+        return jsonify({"symbols": feed.symbols()})
+
+    @app.route("/feed/unsubscribe", methods=["POST"])
+    def unsubscribe_feed_symbol():
+        symbol = (request.get_json(silent=True) or {}).get("symbol")
+        if not isinstance(symbol, str) or not symbol:
+            return jsonify({"error": "'symbol' is required"}), 400
+        feed.unsubscribe(symbol)
+        return jsonify({"symbols": feed.symbols()})
+
+
+def create_feed_client(url, symbols, handler, hello=None):
+    return FeedClient(
+        url,
+        symbols,
+        handler=handler,
+        hello=hello,
+        queue_size=int(os.environ.get('FEED_QUEUE_SIZE', 10000)),
+        backoff_max=float(os.environ.get('FEED_BACKOFF_MAX', 30)),
+        stable_after=float(os.environ.get('FEED_STABLE_AFTER', 10)),
+    )
@@ -0,0 +1,187 @@
+"""One upstream Finnhub connection shared by every worker process of a server.
+
+The hub holds the only WebSocket to Finnhub and relays its messages to the
+workers over a local WebSocket that speaks the same protocol, so a worker
+just points its ``FeedClient`` at ``FEED_HUB_URL`` instead of Finnhub.
+Subscriptions are the union of what the workers ask for, every worker gets
+every trade, and a (re)connecting worker first receives the recent ticks
+it does not have yet, so its tick rings and live bars catch up without
+counting a trade twice: the worker's first message is
+``{"type": "resume", "since": {symbol: last trade time}}`` and only newer
+ticks are replayed.
+
+gunicorn.conf.py starts it next to the workers; it can also run on its own,
+e.g. as a sidecar:
+
+    python feed_hub.py --port 8700
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from feed_client import create_feed_client
+from live_data import FINNHUB_WS_URL, LIVE_SYMBOLS
+from tick_journal import create_tick_journal
+from tick_store import create_tick_store
+
+
+class FeedHub:
+    """Relay the upstream feed to local worker connections (see the module docstring)."""
+
+    def __init__(self, url, symbols=(), replay_ticks=1000, replay_chunk=1000, report_interval=60.0,
+                 resume_timeout=5.0):
+        self.base_symbols = set(symbols)
+        self.replay_ticks = replay_ticks
+        self.replay_chunk = replay_chunk
+        self.resume_timeout = resume_timeout
+        self.report_interval = report_interval
+        self.tick_store = create_tick_store()  # Recent ticks, replayed to workers that connect
+        self.journal = create_tick_journal()  # Every trade on disk, when TICK_JOURNAL_DIR is set
+        self.feed = create_feed_client(url, symbols, self._on_message)
+        self._clients = {}  # worker connection -> symbols it subscribed to
+        self._loop = None
+        self._stats = {'relayed': 0, 'workers_connected': 0, 'replayed_ticks': 0}
+
+    async def serve(self, host='127.0.0.1', port=8700):
+        import websockets
+
+        self._loop = asyncio.get_running_loop()
+        self.feed.start()  # The upstream client runs in its own thread
+        async with websockets.serve(self._handle_worker, host, port):
+            while True:
+                await asyncio.sleep(self.report_interval)
+                if self.journal is not None:
+                    self.journal.flush()
+                print(f"Feed hub: {self.stats()}")
+
+    # ---- upstream -> workers ----
+    def _on_message(self, parsed_message):
+        # Called on the feed thread; store and relay on the hub loop so a
+        # connecting worker's replay and the live stream never overlap
+        self._loop.call_soon_threadsafe(self._relay, parsed_message)
+
+    def _relay(self, parsed_message):
+        import websockets
+
+        self.tick_store.ingest(parsed_message)
+        if self.journal is not None:
+            self.journal.append(parsed_message)
+        if self._clients:
+            websockets.broadcast(self._clients, json.dumps(parsed_message))
+            self._stats['relayed'] += 1
+
+    def _replay_messages(self, since=None):
+        """Recent ticks of every symbol as trade messages, oldest first per symbol.
+
+        ``since`` maps symbols to the time of the last trade the worker
+        already has; only later ticks of those symbols are replayed.
+        """
+        since = since or {}
+        rows = []
+        for symbol in self.tick_store.symbols():
+            ticks = self.tick_store.last(symbol, self.replay_ticks)
+            after = since.get(symbol)
+            rows.extend({"s": symbol, "p": p, "v": v, "t": t} for p, v, t in zip(ticks["p"], ticks["v"], ticks["t"])
+                        if after is None or t > after)
+        self._stats['replayed_ticks'] += len(rows)
+        return [json.dumps({"type": "trade", "data": rows[i:i + self.replay_chunk]})
+                for i in range(0, len(rows), self.replay_chunk)]
+
+    # ---- workers ----
+    async def _handle_worker(self, websocket):
+        import websockets
+
+        # Trades relayed while waiting for the resume point are in the tick
+        # store, so the replay below still covers them
+        try:
+            first = _parse_request(await asyncio.wait_for(websocket.recv(), self.resume_timeout))
+        except asyncio.TimeoutError:
+            first = {}
+        except websockets.ConnectionClosed:
+            return
+        since = first.get("since") if first.get("type") == "resume" else None
+        if not isinstance(since, dict):
+            since = None
+
+        # Replay and registration happen without yielding to the loop, so no
+        # relayed message is missed or delivered twice
+        for message in self._replay_messages(since):
+            websockets.broadcast([websocket], message)
+        self._clients[websocket] = set()
+        self._stats['workers_connected'] += 1
+        try:
+            self._handle_request(websocket, first)
+            async for message in websocket:
+                self._handle_request(websocket, _parse_request(message))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for symbol in list(self._clients.pop(websocket, ())):
+                self._release(symbol)
+
+    def _handle_request(self, websocket, request):
+        symbol = request.get("symbol")
+        if not isinstance(symbol, str) or not symbol:
+            return
+        if request.get("type") == "subscribe":
+            self._subscribe(websocket, symbol)
+        elif request.get("type") == "unsubscribe":
+            self._unsubscribe(websocket, symbol)
+
+    def _subscribe(self, websocket, symbol):
+        if symbol not in self.feed.symbols():
+            self.feed.subscribe(symbol)
+        self._clients[websocket].add(symbol)
+
+    def _unsubscribe(self, websocket, symbol):
+        self._clients[websocket].discard(symbol)
+        self._release(symbol)
+
+    def _release(self, symbol):
+        # Drop the upstream subscription once no worker wants it (the configured symbols stay)
+        if symbol in self.base_symbols or any(symbol in symbols for symbols in self._clients.values()):
+            return
+        self.feed.unsubscribe(symbol)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['workers'] = len(self._clients)
+        stats['upstream'] = self.feed.stats()
+        if self.journal is not None:
+            stats['journal'] = self.journal.stats()
+        return stats
+
+
+def _parse_request(message):
+    try:
+        request = json.loads(message)
+    except ValueError:
+        return {}
+    return request if isinstance(request, dict) else {}
+
+
+def create_feed_hub():
+    return FeedHub(
+        os.environ.get('FINNHUB_WS_URL', FINNHUB_WS_URL),
+        LIVE_SYMBOLS,
+        replay_ticks=int(os.environ.get('FEED_HUB_REPLAY_TICKS', 1000)),
+        report_interval=float(os.environ.get('FEED_HUB_REPORT_INTERVAL', 60)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('FEED_HUB_PORT', 8700)))
+    args = parser.parse_args()
+    hub = create_feed_hub()
+    print(f"Feed hub on ws://{args.host}:{args.port}, upstream {hub.feed.stats()['url']}")
+    try:
+        asyncio.run(hub.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
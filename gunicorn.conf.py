@@ -0,0 +1,68 @@
+"""Production server profile: ``gunicorn -c gunicorn.conf.py``.
+
+Pre-forked worker processes with a thread pool each, serving the shared
+prediction app (``PREDICTION_BACKEND=lstm|svm``).  The Finnhub feed runs
+once, in the feed hub started below, and the workers relay from it; the
+bar cache and the finished-result cache live on disk, shared by every
+worker.
+
+* ``WEB_CONCURRENCY`` worker processes (default: one per core, at most 4)
+* ``GUNICORN_THREADS`` threads per worker (default 8)
+* ``STREAM_MAX_SUBSCRIBERS`` open ``/stream`` clients per worker (default half the threads); each holds a
+  thread for as long as it is open, so more get a 503 and /predictions and /ready keep their threads
+* ``SCORING_WORKERS`` processes in the ``/score`` pool of each worker (default the cores divided by the
+  workers, at least 1), so the pools together do not oversubscribe the cores
+* ``PORT`` (default 5000), ``GUNICORN_TIMEOUT`` seconds (default 120)
+* ``FEED_HUB_URL`` set: use that hub (e.g. a sidecar) instead of starting one
+* ``METRICS_DIR`` (default ``cache/metrics``): worker snapshots summed by ``/metrics``
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+wsgi_app = "prediction_service:create_app()"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(os.cpu_count() or 1, 4)))
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))  # A cold /predictions may wait for the model and a download
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+# create_app() does no heavy work (see prediction_service.py), so the app is
+# imported once in the master and forked; each worker loads its own model
+# on first use, since TensorFlow state must not cross a fork
+preload_app = True
+
+# Shared state of the workers, read by the app factories at import time
+os.environ.setdefault('BAR_CACHE_SHARED', '1')
+os.environ.setdefault('RESULT_CACHE_DIR', os.path.join(base_dir, 'cache', 'results'))
+os.environ.setdefault('METRICS_DIR', os.path.join(base_dir, 'cache', 'metrics'))
+os.environ.setdefault('STREAM_MAX_SUBSCRIBERS', str(max(threads // 2, 1)))
+os.environ.setdefault('SCORING_WORKERS', str(max((os.cpu_count() or 1) // workers, 1)))
+
+# One upstream WebSocket per server: the workers' feed clients connect to the hub
+FEED_HUB_PORT = int(os.environ.get('FEED_HUB_PORT', 8700))
+start_feed_hub = not os.environ.get('FEED_HUB_URL')
+if start_feed_hub:
+    os.environ['FEED_HUB_URL'] = f"ws://127.0.0.1:{FEED_HUB_PORT}"
+
+
+def on_starting(server):
+    # Counters start from zero with every server; snapshots of a previous run would be summed in
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    if start_feed_hub:
+        server.feed_hub = subprocess.Popen(
+            [sys.executable, os.path.join(base_dir, 'feed_hub.py'), '--port', str(FEED_HUB_PORT)], cwd=base_dir)
+        server.log.info("Feed hub started (pid %s) on %s", server.feed_hub.pid, os.environ['FEED_HUB_URL'])
+
+
+def on_exit(server):
+    feed_hub = getattr(server, 'feed_hub', None)
+    if feed_hub is not None:
+        feed_hub.terminate()
+        feed_hub.wait(10)
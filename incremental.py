@@ -0,0 +1,181 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import stage
+from scaling import fit_min_max, min_max_inverse, min_max_transform
+from windowing import WINDOW, lookback_windows
+
+
+class IncrementalForecaster:
+    """LSTM validation-tail forecasts that only score the bars added since the last call.
+
+    For every series key (symbol and start date) it keeps the closes it last
+    saw, their min/max scaling and the predictions from the validation split
+    onward.  When the same history comes back with new bars appended, only the
+    new windows go through ``predict_fn``.  Because the scaling is fitted on
+    the whole range, this is exact as long as the min/max of the closes stays
+    the same; otherwise, or if earlier bars were revised, the series is
+    recomputed in full.
+    """
+
+    def __init__(self, predict_fn, window=WINDOW, train_fraction=0.8, max_series=1000):
+        self.predict_fn = predict_fn
+        self.window = window
+        self.train_fraction = train_fraction
+        self.max_series = max_series
+        self._series = OrderedDict()  # key -> state dict, most recently used last
+        self._lock = threading.Lock()
+        self._stats = {'full': 0, 'incremental': 0, 'reused': 0, 'range_changed': 0, 'history_changed': 0}
+
+    def forecast(self, key, dates, closes):
+        """Return ``(predictions, training_data_len)``; predictions cover rows from the split on."""
+        result = self.forecast_many([(key, dates, closes)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def forecast_many(self, series):
+        """Forecast several ``(key, dates, closes)`` series with a single ``predict_fn`` call.
+
+        Returns one ``(predictions, training_data_len)`` tuple per series, or
+        the exception raised for that series.
+        """
+        jobs = []
+        for key, dates, closes in series:
+            try:
+                jobs.append(self._prepare(key, dates, closes))
+            except Exception as e:
+                jobs.append(e)
+
+        pending = [job for job in jobs if not isinstance(job, Exception) and len(job['x'])]
+        if pending:
+            try:
+                windows = [job['x'] for job in pending]
+                scored = self.predict_fn(np.concatenate(windows) if len(windows) > 1 else windows[0])
+            except Exception as e:
+                scored = e
+            offset = 0
+            for job in pending:
+                job['scored'] = scored if isinstance(scored, Exception) else scored[offset:offset + len(job['x'])]
+                offset += len(job['x'])
+
+        results = []
+        for job in jobs:
+            if isinstance(job, Exception):
+                results.append(job)
+            elif isinstance(job.get('scored'), Exception):
+                results.append(job['scored'])
+            else:
+                results.append(self._finish(job))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['series'] = len(self._series)
+        return stats
+
+    # ---- planning ----
+    def _plan(self, state, dates, closes):
+        if state is None:
+            return 'full'
+        old = len(state['closes'])
+        if len(closes) < old or not np.array_equal(dates[:old], state['dates']):
+            self._record('history_changed')
+            return 'full'
+        # The last stored bar may be today's bar, still moving; earlier bars must not change
+        if not np.array_equal(closes[:old - 1], state['closes'][:old - 1]):
+            self._record('history_changed')
+            return 'full'
+        # Compared with equal_nan: a missing (NaN) last close that is still missing is unchanged too
+        if len(closes) == old and np.array_equal(closes[old - 1:], state['closes'][old - 1:], equal_nan=True):
+            return 'reused'
+        if np.array_equal(closes[old - 1:old], state['closes'][old - 1:], equal_nan=True):
+            appended = closes[old:]
+            low, high = min(state['low'], np.nanmin(appended)), max(state['high'], np.nanmax(appended))
+        else:
+            # A revised last bar can also take the old low/high away, shrinking the range
+            low, high = np.nanmin(closes), np.nanmax(closes)
+        if low != state['low'] or high != state['high']:
+            # A new high/low changes the scaling of every window
+            self._record('range_changed')
+            return 'full'
+        return 'incremental'
+
+    # ---- computation ----
+    def _prepare(self, key, dates, closes):
+        """Work out which windows of a series still need scoring."""
+        dates = np.asarray(dates)
+        closes = np.asarray(closes, dtype=np.float64).ravel()
+        training_data_len = math.ceil(len(closes) * self.train_fraction)
+        with self._lock:
+            state = self._series.get(key)
+            if state is not None:
+                self._series.move_to_end(key)
+
+        job = {'key': key, 'dates': dates, 'closes': closes, 'training_data_len': training_data_len}
+        job['mode'] = mode = self._plan(state, dates, closes)
+        if mode == 'full':
+            if training_data_len < self.window:
+                raise ValueError(f"At least {self.window} bars of history are needed before the validation split")
+            with stage('scale'):
+                params = fit_min_max(closes.reshape(-1, 1))
+                scaled = min_max_transform(closes[training_data_len - self.window:].reshape(-1, 1), params)
+            with stage('windows'):
+                x = lookback_windows(scaled, self.window)
+            job.update(params=params, start=training_data_len, predictions=None, x=x)
+            return job
+
+        old = len(state['closes'])
+        job.update(params=state['params'], start=state['start'], predictions=state['predictions'])
+        if len(closes) == old:
+            # Nothing new to score (at most today's bar moved, and no prediction depends on it yet)
+            job['x'] = np.empty((0, self.window, 1))
+        else:
+            with stage('scale'):
+                scaled_tail = min_max_transform(closes[old - self.window:].reshape(-1, 1), state['params'])
+            with stage('windows'):
+                job['x'] = lookback_windows(scaled_tail, self.window)
+        return job
+
+    def _finish(self, job):
+        predictions = job['predictions']
+        if len(job['x']):
+            with stage('scale'):
+                new_predictions = min_max_inverse(job['scored'], job['params'])
+            predictions = new_predictions if predictions is None else np.concatenate([predictions, new_predictions])
+        self._record(job['mode'])
+
+        key, closes = job['key'], job['closes']
+        # A request for an older, shorter history must not replace a longer series
+        if job['mode'] != 'reused' and len(closes) >= self._stored_length(key):
+            state = self._state(job['dates'], closes, job['params'], job['start'], predictions)
+            with self._lock:
+                self._series[key] = state
+                self._series.move_to_end(key)
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+        return predictions[job['training_data_len'] - job['start']:], job['training_data_len']
+
+    def _state(self, dates, closes, params, start, predictions):
+        return {
+            'dates': dates,
+            'closes': closes,
+            'params': params,
+            'low': np.nanmin(closes),
+            'high': np.nanmax(closes),
+            'start': start,
+            'predictions': predictions,
+        }
+
+    def _stored_length(self, key):
+        with self._lock:
+            state = self._series.get(key)
+        return 0 if state is None else len(state['closes'])
+
+    def _record(self, event):
+        with self._lock:
+            self._stats[event] += 1
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+from bar_aggregator import create_bar_aggregator, register_bar_routes
+from feed_client import create_feed_client, register_feed_routes
+from features import IncrementalFeatures, create_feature_engine
+from tick_broadcast import create_broadcaster, register_stream_routes
+from tick_journal import create_tick_journal, register_journal_routes
+from tick_store import create_tick_store, register_tick_routes
+
+# Upstream feed; point it at tools/fake_finnhub.py for offline runs
+FINNHUB_WS_URL = "wss://ws.finnhub.io?token=cssart9r01qld5m1bar0cssart9r01qld5m1barg"
+
+# Symbols the prediction services and the feed hub subscribe to at start
+LIVE_SYMBOLS = [s for s in os.environ.get('LIVE_SYMBOLS', "BINANCE:BTCUSDT,ETH-USD,LTC-USD").split(",") if s]
+
+# Endpoints that read live data; the first request to one of them connects the feed
+LIVE_ENDPOINTS = {
+    'get_data', 'get_latest_ticks', 'get_ticks', 'get_live_bars', 'stream_ticks',
+    'get_feed_status', 'subscribe_feed_symbol', 'unsubscribe_feed_symbol', 'get_live_features',
+}
+
+
+class LiveData:
+    """The live trade pipeline of one app: the Finnhub feed into ticks, live bars and their indicators, /stream and /data.
+
+    Nothing connects or spawns threads until ``start`` is called, so
+    importing an app, ``flask routes`` or building a test client stays
+    offline.
+    """
+
+    def __init__(self, url, symbols, journal=None, hub=False):
+        self.data_responses = []  # List to store processed WebSocket messages
+        self.tick_store = create_tick_store()  # Every received trade, per symbol ring buffer
+        self.journal = journal  # Every received trade on disk (tick_journal.py), when configured
+        self.bar_aggregator = create_bar_aggregator()  # Live 1s/1m/5m/1h OHLCV bars built from the trades
+        self.features = IncrementalFeatures(create_feature_engine())  # Indicators of the live bars, per bar in O(1)
+        self.bar_aggregator.listeners.append(self.features.on_bar)
+        self.broadcaster = create_broadcaster()  # Pushes trades to /stream subscribers
+        # From a feed hub, a reconnect only replays the trades received since the last one here
+        self.feed = create_feed_client(url, symbols, self.handle_message, hello=self.resume_point if hub else None)
+        self.stop_thread = False  # Flag to stop the background thread when needed
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Connect the feed and start the periodic collector, once."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        self.feed.start()  # asyncio WebSocket client with reconnect, in its own thread
+        threading.Thread(target=self.collect_data_periodically, daemon=True).start()
+
+    def started(self):
+        return self._started
+
+    def stop(self):
+        self.stop_thread = True
+        self.feed.stop()
+
+    def resume_point(self):
+        """The feed hub's resume message: the time of the last trade received per symbol."""
+        return {"type": "resume", "since": self.tick_store.newest_times()}
+
+    def handle_message(self, parsed_message):
+        # Keep every trade in the per-symbol ring buffers and roll it into live bars
+        self.tick_store.ingest(parsed_message)
+        if self.journal is not None:
+            self.journal.append(parsed_message)
+        self.bar_aggregator.ingest(parsed_message)
+        self.broadcaster.publish(parsed_message)
+        if "data" in parsed_message:
+            for item in parsed_message["data"]:
+                item.pop("c", None)  # Remove "c" field if present
+            if parsed_message["data"]:
+                self.data_responses.clear()
+                self.data_responses.append({
+                    "data": [parsed_message["data"][0]],  # Only the first entry
+                    "type": parsed_message["type"]
+                })
+
+    def collect_data_periodically(self):
+        while not self.stop_thread:
+            time.sleep(10)
+            self.bar_aggregator.flush()  # Close live bars whose interval ended without a newer trade
+            if self.journal is not None:
+                self.journal.flush()
+            if self.data_responses:
+                print(f"Data collected: {self.data_responses[0]}")
+            else:
+                print("No data yet collected.")
+
+
+def register_live_routes(app, live):
+    """GET /data plus the tick, bar, stream, feed and tick history routes; the first call to a live one starts the feed."""
+    from flask import jsonify, request
+
+    @app.before_request
+    def start_live_data():
+        if request.endpoint in LIVE_ENDPOINTS and not live.started():
+            live.start()
+
+    @app.route("/data", methods=["GET"])
+    def get_data():
+        # Return the latest data response as JSON
+        return jsonify(live.data_responses[0] if live.data_responses else {})
+
+    register_tick_routes(app, live.tick_store)  # /ticks/latest and /ticks
+    register_bar_routes(app, live.bar_aggregator)  # /bars
+    register_stream_routes(app, live.broadcaster)  # /stream (Server-Sent Events)
+    register_feed_routes(app, live.feed)  # /feed, /feed/subscribe, /feed/unsubscribe
+    if live.journal is not None:
+        register_journal_routes(app, live.journal)  # /ticks/history
+
+
+def create_live_data(symbols):
+    """Live data from Finnhub, or from the server's feed hub when ``FEED_HUB_URL`` is set (see feed_hub.py).
+
+    With ``TICK_JOURNAL_DIR`` set the trades are also journaled, by the hub
+    when there is one (the workers then only read the journal).
+    """
+    hub_url = os.environ.get('FEED_HUB_URL')
+    url = hub_url or os.environ.get('FINNHUB_WS_URL', FINNHUB_WS_URL)
+    return LiveData(url, symbols, journal=create_tick_journal(record=not hub_url), hub=bool(hub_url))
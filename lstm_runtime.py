@@ -0,0 +1,253 @@
+"""NumPy inference for the Keras LSTM, so serving it does not need TensorFlow.
+
+``export_lstm`` (run where Keras is installed: ``training script/export_lstm.py``)
+writes the layers of a Sequential LSTM/Dense stack to ``model.npz`` next to
+the pickled model.  ``NumpyLSTM`` computes ``model.predict`` from that file
+with NumPy alone: the input projection of every time step is one matrix
+product, so only ``h @ recurrent_kernel`` and the gates run step by step.
+
+LSTM kernels are stored as float32, or as int8 with one scale per output unit (a
+quarter of their size).  int8 weights are expanded to float32 when loaded:
+NumPy has no int8 matrix product, so the arithmetic is float32 either way.
+"""
+import json
+import os
+
+import numpy as np
+
+from windowing import WINDOW, lookback_windows
+
+FORMAT_VERSION = 1
+WEIGHT_NAMES = {'LSTM': ('kernel', 'recurrent_kernel', 'bias'), 'Dense': ('kernel', 'bias')}
+QUANTIZED = ('kernel', 'recurrent_kernel')  # Of LSTM layers; biases and the small Dense layers stay float32
+SKIPPED_LAYERS = ('InputLayer', 'Dropout')  # No-ops at inference
+PREDICT_BATCH_ROWS = 256  # Rows per pass; keeps the (steps, 4, rows, units) input projection around 12 MB
+
+
+def _sigmoid(x):
+    # 0.5 * (1 + tanh(x / 2)) is the logistic function without overflow in exp
+    np.multiply(x, 0.5, out=x)
+    np.tanh(x, out=x)
+    x += 1.0
+    x *= 0.5
+    return x
+
+
+def _relu(x):
+    return np.maximum(x, 0.0, out=x)
+
+
+# In-place activations by their Keras names
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'tanh': lambda x: np.tanh(x, out=x),
+    'sigmoid': _sigmoid,
+    'relu': _relu,
+}
+
+
+def npz_path(path):
+    """Where the NumPy export of the pickled model at ``path`` lives (``model.pkl`` -> ``model.npz``)."""
+    return os.path.splitext(path)[0] + '.npz'
+
+
+# ---------------- Export ----------------
+def _layer_spec(layer):
+    kind = type(layer).__name__
+    if kind not in WEIGHT_NAMES:
+        raise ValueError(f"Cannot export {kind} layers, only {sorted(WEIGHT_NAMES)}")
+    config = layer.get_config()
+    spec = {'type': kind, 'units': int(config['units']), 'activation': config.get('activation', 'linear')}
+    if kind == 'LSTM':
+        if config.get('stateful') or config.get('return_state'):
+            raise ValueError("Stateful LSTMs and LSTMs returning their state cannot be exported")
+        spec.update(recurrent_activation=config.get('recurrent_activation', 'sigmoid'),
+                    return_sequences=bool(config.get('return_sequences')),
+                    go_backwards=bool(config.get('go_backwards')))
+    for key in ('activation', 'recurrent_activation'):
+        if key in spec and spec[key] not in ACTIVATIONS:
+            raise ValueError(f"Unsupported {key} {spec[key]!r} in {config.get('name')}, expected one of {list(ACTIVATIONS)}")
+    return spec
+
+
+def quantize_int8(weights):
+    """Symmetric int8 weights with one float32 scale per output unit (column)."""
+    scale = np.abs(weights).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    return np.round(weights / scale).astype(np.int8), scale.astype(np.float32)
+
+
+def export_lstm(model, path, quantize=None, source=None):
+    """Write the LSTM/Dense layers of the Keras ``model`` to ``path`` (.npz).
+
+    ``quantize='int8'`` stores the LSTM kernels as int8; ``source`` (the
+    ``model_identity`` of the pickle) lets the loader tell a stale export
+    from a current one.
+    """
+    layers = []
+    for layer in model.layers:
+        if type(layer).__name__ in SKIPPED_LAYERS:
+            continue
+        spec = _layer_spec(layer)
+        weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+        if len(weights) == len(WEIGHT_NAMES[spec['type']]) - 1:
+            weights.append(np.zeros(weights[0].shape[-1], dtype=np.float32))  # use_bias=False
+        layers.append(dict(spec, **dict(zip(WEIGHT_NAMES[spec['type']], weights))))
+    if not layers:
+        raise ValueError("The model has no LSTM or Dense layers")
+    return save_layers(layers, path, quantize, source)
+
+
+def save_layers(layers, path, quantize=None, source=None):
+    """Write layer dicts (spec plus float32 weights, as ``export_lstm`` collects them) to ``path``."""
+    if quantize not in (None, 'int8'):
+        raise ValueError(f"Unknown quantization {quantize!r}")
+    specs, arrays = [], {}
+    for i, layer in enumerate(layers):
+        names = WEIGHT_NAMES[layer['type']]
+        for name in names:
+            key = f"{i}/{name}"
+            if quantize == 'int8' and layer['type'] == 'LSTM' and name in QUANTIZED:
+                arrays[key], arrays[key + '_scale'] = quantize_int8(layer[name])
+            else:
+                arrays[key] = np.asarray(layer[name], dtype=np.float32)
+        specs.append({key: value for key, value in layer.items() if key not in names})
+    spec = {'format': FORMAT_VERSION, 'quantization': quantize or 'float32', 'source': source, 'layers': specs}
+    with open(path + '.tmp', 'wb') as file:
+        np.savez(file, spec=np.array(json.dumps(spec)), **arrays)
+    os.replace(path + '.tmp', path)
+    return spec
+
+
+# ---------------- Inference ----------------
+# Keras orders the LSTM gates input, forget, cell, output; they are regrouped as input, forget, output, cell so
+# the three recurrent-activation gates are one contiguous block
+GATE_ORDER = [0, 1, 3, 2]
+
+
+def _gate_major(layer):
+    # kernel as (4, in, u), recurrent kernel as (4, u, u), bias as (4, 1, u), gates in the new order
+    units = layer['units']
+    kernel = layer['kernel'].reshape(-1, 4, units)[:, GATE_ORDER].transpose(1, 0, 2)
+    recurrent = layer['recurrent_kernel'].reshape(units, 4, units)[:, GATE_ORDER].transpose(1, 0, 2)
+    bias = layer['bias'].reshape(4, 1, units)[GATE_ORDER]
+    return dict(layer, kernel=np.ascontiguousarray(kernel), recurrent_kernel=np.ascontiguousarray(recurrent),
+                bias=np.ascontiguousarray(bias))
+
+
+def _lstm(x, layer):
+    """One LSTM layer over time-major ``x`` (steps, rows, features), weights as from ``_gate_major``."""
+    steps, n, _ = x.shape
+    units = layer['units']
+    activation = ACTIVATIONS[layer['activation']]
+    recurrent_activation = ACTIVATIONS[layer['recurrent_activation']]
+    if layer['go_backwards']:
+        x = x[::-1]
+    # Input projection of every step at once, laid out (steps, gate, rows, units) so each gate is contiguous
+    if layer['kernel'].shape[1] == 1:
+        projected = x[:, np.newaxis] * layer['kernel']  # One input feature: the product is a broadcast
+    else:
+        projected = np.matmul(x[:, np.newaxis], layer['kernel'])
+    projected += layer['bias']
+    h = np.zeros((n, units), dtype=np.float32)
+    c = np.zeros((n, units), dtype=np.float32)
+    z = np.empty((4, n, units), dtype=np.float32)
+    candidate = np.empty((n, units), dtype=np.float32)
+    sequence = np.empty((steps, n, units), dtype=np.float32) if layer['return_sequences'] else None
+    for t in range(steps):
+        np.matmul(h, layer['recurrent_kernel'], out=z)
+        z += projected[t]
+        recurrent_activation(z[:3])  # input, forget and output gates
+        activation(z[3])  # candidate cell
+        c *= z[1]
+        np.multiply(z[0], z[3], out=candidate)
+        c += candidate
+        np.copyto(h, c)
+        activation(h)
+        h *= z[2]
+        if sequence is not None:
+            sequence[t] = h
+    return sequence if sequence is not None else h
+
+
+def _dense(x, layer):
+    return ACTIVATIONS[layer['activation']](x @ layer['kernel'] + layer['bias'])
+
+
+class NumpyLSTM:
+    """``model.predict`` of an exported LSTM/Dense stack, in float32 NumPy."""
+
+    def __init__(self, layers, quantization='float32', source=None):
+        self.layers = [_gate_major(layer) if layer['type'] == 'LSTM' else layer for layer in layers]
+        self.quantization = quantization
+        self.source = source
+        self.runtime_id = f"numpy-{quantization}"  # Part of the model id, so cached results never mix runtimes
+        self.output_units = layers[-1]['units']
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            if spec.get('format') != FORMAT_VERSION:
+                raise ValueError(f"{path} has export format {spec.get('format')}, expected {FORMAT_VERSION}")
+            layers = []
+            for i, layer in enumerate(spec['layers']):
+                weights = {}
+                for name in WEIGHT_NAMES[layer['type']]:
+                    values = data[f"{i}/{name}"]
+                    if f"{i}/{name}_scale" in data:
+                        values = values.astype(np.float32) * data[f"{i}/{name}_scale"]
+                    weights[name] = np.ascontiguousarray(values, dtype=np.float32)
+                layers.append(dict(layer, **weights))
+        return cls(layers, spec['quantization'], spec.get('source'))
+
+    def predict(self, x, batch_size=PREDICT_BATCH_ROWS, **kwargs):
+        """``(rows, steps, features)`` windows -> ``(rows, output units)`` float32, ``batch_size`` rows at a time.
+
+        Other keyword arguments of ``keras.Model.predict`` (``verbose``, ...) are accepted and ignored.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 2:
+            x = x[:, :, np.newaxis]
+        if not len(x):
+            return np.empty((0, self.output_units), dtype=np.float32)
+        outputs = []
+        for start in range(0, len(x), batch_size):
+            chunk = x[start:start + batch_size].transpose(1, 0, 2)  # Time-major inside the layers
+            for layer in self.layers:
+                chunk = _lstm(chunk, layer) if layer['type'] == 'LSTM' else _dense(chunk, layer)
+            outputs.append(chunk.transpose(1, 0, 2) if chunk.ndim == 3 else chunk)
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+
+def load_lstm(path, runtime='auto'):
+    """The LSTM at ``path`` (a pickled Keras model) for serving.
+
+    ``runtime`` is ``numpy`` (the export next to it must exist and come from
+    this pickle), ``keras`` (always unpickle) or ``auto``: the export when it
+    is current, otherwise the pickle.
+    """
+    from model_registry import load_pickle
+    from result_cache import model_identity  # pandas; the runtime itself only needs NumPy
+
+    if runtime not in ('auto', 'numpy', 'keras'):
+        raise ValueError(f"Unknown LSTM runtime {runtime!r}, expected auto, numpy or keras")
+    if runtime != 'keras':
+        export = npz_path(path)
+        if os.path.exists(export):
+            model = NumpyLSTM.load(export)
+            if model.source == model_identity(path):
+                return model
+            if runtime == 'numpy':
+                raise ValueError(f"{export} was exported from another version of {os.path.basename(path)}")
+            print(f"Ignoring {export}: exported from another version of {os.path.basename(path)}")
+        elif runtime == 'numpy':
+            raise FileNotFoundError(f"No NumPy export at {export}; run training script/export_lstm.py")
+    return load_pickle(path)
+
+
+def sample_windows(rows, window=WINDOW, seed=0):
+    """``rows`` min-max scaled random-walk windows, the kind of input /predictions gives the LSTM."""
+    closes = np.cumsum(np.random.default_rng(seed).normal(0, 1, rows + window))
+    closes = (closes - closes.min()) / (closes.max() - closes.min())
+    return np.ascontiguousarray(lookback_windows(closes.astype(np.float32), window))
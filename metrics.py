@@ -0,0 +1,300 @@
+"""Latency histograms, request counters and component stats in the Prometheus text format.
+
+``STAGE_SECONDS`` times the stages of a prediction wherever they run (bar
+download, scaling, window building, ``model.predict``, serialization)
+through ``stage("name")``.  Each app adds its own HTTP request metrics and
+collectors that turn the ``stats()`` of its caches, batcher and feed into
+metric families when ``/metrics`` is scraped, so the request path only pays
+for a ``perf_counter`` pair and one histogram update per stage.
+
+Under gunicorn every worker keeps its own numbers.  With ``METRICS_DIR``
+set, workers write a snapshot there every few seconds and ``/metrics`` on
+any worker reports the sum of all of them (gauges get a ``worker`` label).
+"""
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+# Seconds; from a cached response (well under a millisecond) to a cold download
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, dict(zip(self.labelnames, labels)), value) for labels, value in values.items()]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> per-bucket counts (last one is +Inf), then the sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        """Context manager observing the seconds its block takes."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        samples = []
+        for labels, values in series.items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                cumulative += count
+                samples.append((self.name + '_bucket', dict(base, le=_format_value(bound)), cumulative))
+            samples.append((self.name + '_sum', base, values[-1]))
+            samples.append((self.name + '_count', base, cumulative))
+        return samples
+
+
+# Process-wide, so code outside a request (batcher thread, bar cache) can time its stages
+STAGE_SECONDS = Histogram('prediction_stage_seconds', "Time spent per stage of serving predictions", ['stage'])
+
+
+def stage(name):
+    """``with stage("predict"): ...`` adds the block's duration to ``prediction_stage_seconds``."""
+    return STAGE_SECONDS.time(name)
+
+
+def stats_families(prefix, stats, counters=(), gauges=(), labels=None, help=''):
+    """Metric families from a component's ``stats()`` dict.
+
+    ``counters`` keys become ``<prefix>_<key>_total``, ``gauges`` keys
+    ``<prefix>_<key>``; booleans count as 0/1 and missing or None values are
+    left out.
+    """
+    labels = labels or {}
+    families = []
+    for keys, kind, suffix in ((counters, 'counter', '_total'), (gauges, 'gauge', '')):
+        for key in keys:
+            value = stats.get(key)
+            if value is None:
+                continue
+            name = f"{prefix}_{key}{suffix}"
+            families.append({'name': name, 'type': kind, 'help': help or f"{prefix} {key.replace('_', ' ')}",
+                             'samples': [(name, dict(labels), float(value))]})
+    return families
+
+
+class MetricsRegistry:
+    """The metrics of one app: counters and histograms plus collectors called at scrape time."""
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = [STAGE_SECONDS]
+        self._collectors = []
+        self._flusher_pid = None
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """``collect()`` returns metric families (see ``stats_families``) when metrics are scraped."""
+        self._collectors.append(collect)
+
+    def snapshot(self):
+        """Every family of this process: ``[{"name", "type", "help", "samples": [(name, labels, value)]}]``."""
+        families = [{'name': m.name, 'type': m.kind, 'help': m.help, 'samples': m.samples()} for m in self._metrics]
+        for collect in self._collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                # One broken component must not take the whole scrape down
+                print(f"Metrics collector failed: {e}")
+        return families
+
+    def render(self):
+        """The Prometheus text exposition of this process, or of every worker with ``directory`` set."""
+        families = self.snapshot()
+        if self.directory:
+            self._write(families)
+            families = self._merge(self._read_all())
+        return render_families(families)
+
+    # ---- multi-process ----
+    def start_flusher(self):
+        """Write this worker's snapshot to ``directory`` every ``flush_interval`` seconds (once per process)."""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()  # Threads do not survive a fork, so every worker starts its own
+
+        def flush():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self._write(self.snapshot())
+                except OSError as e:
+                    print(f"Could not write metrics snapshot: {e}")
+
+        threading.Thread(target=flush, name='metrics-flush', daemon=True).start()
+
+    def _write(self, families):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as file:
+            json.dump(families, file)
+        os.replace(path + '.tmp', path)
+
+    def _read_all(self):
+        snapshots = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as file:
+                    snapshots[int(os.path.basename(path)[:-5])] = json.load(file)
+            except (OSError, ValueError):
+                continue  # Being replaced, or not one of ours
+        return snapshots
+
+    def _merge(self, snapshots):
+        """Sum counters and histograms over the workers; gauges of live workers get a ``worker`` label."""
+        merged = {}
+        for pid, families in sorted(snapshots.items()):
+            alive = _alive(pid)
+            for family in families:
+                target = merged.setdefault(family['name'], {'name': family['name'], 'type': family['type'],
+                                                            'help': family['help'], 'values': {}})
+                for name, labels, value in family['samples']:
+                    if family['type'] == 'gauge':
+                        if not alive:
+                            continue  # A dead worker's counts still add up, its gauges do not
+                        labels = dict(labels, worker=str(pid))
+                    key = (name, tuple(sorted(labels.items())))
+                    target['values'][key] = target['values'].get(key, 0.0) + value
+        return [{'name': f['name'], 'type': f['type'], 'help': f['help'],
+                 'samples': [(name, dict(labels), value) for (name, labels), value in f['values'].items()]}
+                for f in merged.values()]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists but belongs to someone else
+    return True
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value)) if value else '0'
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def render_families(families):
+    """Prometheus text format (version 0.0.4); families sharing a name are written as one."""
+    grouped = {}
+    for family in families:
+        if family['name'] in grouped:
+            grouped[family['name']]['samples'] = grouped[family['name']]['samples'] + list(family['samples'])
+        else:
+            grouped[family['name']] = dict(family)
+    lines = []
+    for family in grouped.values():
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family['samples']:
+            if labels:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def register_metrics_routes(app, metrics):
+    """Request counters and latency per endpoint, plus GET /metrics (Prometheus text format)."""
+    from flask import Response, g, request
+
+    requests_total = metrics.counter('http_requests_total', "HTTP requests by endpoint, method and status",
+                                     ['endpoint', 'method', 'status'])
+    request_seconds = metrics.histogram('http_request_seconds', "Time to produce a response, by endpoint", ['endpoint'])
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        metrics.start_flusher()
+
+    @app.after_request
+    def count_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'  # 404s share one series
+            request_seconds.observe(time.perf_counter() - started, endpoint)
+            requests_total.inc(endpoint, request.method, str(response.status_code))
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def get_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def create_metrics():
+    return MetricsRegistry(
+        directory=os.environ.get('METRICS_DIR') or None,
+        flush_interval=float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+    )
@@ -0,0 +1,260 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from result_cache import model_identity
+
+DEFAULT_VERSION = 'default'
+
+# ``extras`` holds what the app builds around a model (batcher, forecaster, ...)
+LoadedModel = namedtuple('LoadedModel', ['version', 'path', 'model', 'model_id', 'extras'])
+
+
+class UnknownModelError(KeyError):
+    """No artifact exists for the requested version."""
+
+
+class ModelNotReadyError(Exception):
+    """The requested model did not finish loading in time (or failed to load)."""
+
+
+def load_pickle(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+class ModelRegistry:
+    """Versioned model artifacts, loaded on demand or in the background.
+
+    Versions are ``default`` (the file the services always used, e.g.
+    ``model/svm.pkl``) plus every ``<versions_dir>/<version>/model.pkl``, as
+    written by ``training script/train_svm.py``; ``latest`` names the newest.
+    Up to ``max_loaded`` versions stay in memory (least recently used
+    evicted, never the active one).  Each version is loaded once, in its own
+    thread, however many requests ask for it meanwhile; ``setup(model)``
+    builds the per-model helpers stored in ``extras``, and ``teardown(extras)``
+    releases them when the version is evicted or replaced by a reload.
+    """
+
+    def __init__(self, default_path, versions_dir=None, setup=None, max_loaded=3,
+                 active_version=DEFAULT_VERSION, loader=load_pickle, teardown=None):
+        self.default_path = default_path
+        self.versions_dir = versions_dir
+        self.setup = setup
+        self.teardown = teardown
+        self.max_loaded = max_loaded
+        self.loader = loader
+        self.active_version = active_version
+        if active_version == 'latest':
+            # Pin the newest artifact at startup; later ones need an explicit activate
+            self.active_version = self.resolve()[0]
+        self._loaded = OrderedDict()  # version -> LoadedModel, most recently used last
+        self._loading = {}  # version -> Future of the load in progress
+        self._lock = threading.Lock()
+        self._load_seconds = {}
+        self._errors = {}
+        self._stats = {'loads': 0, 'load_errors': 0, 'swaps': 0, 'evictions': 0}
+
+    # ---- versions ----
+    def available(self):
+        """``{version: path}`` of every artifact on disk, rescanned on each call."""
+        versions = {}
+        if os.path.exists(self.default_path):
+            versions[DEFAULT_VERSION] = self.default_path
+        if self.versions_dir and os.path.isdir(self.versions_dir):
+            for name in sorted(os.listdir(self.versions_dir)):
+                path = os.path.join(self.versions_dir, name, 'model.pkl')
+                if os.path.exists(path):
+                    versions[name] = path
+        return versions
+
+    def resolve(self, version=None):
+        """Map ``None``/``latest``/a version name to ``(version, path)``."""
+        version = version or self.active_version
+        versions = self.available()
+        if version == 'latest':
+            named = [name for name in versions if name != DEFAULT_VERSION]
+            version = named[-1] if named else DEFAULT_VERSION
+        if not isinstance(version, str) or version not in versions:
+            raise UnknownModelError(version)
+        return version, versions[version]
+
+    # ---- loading ----
+    def get(self, version=None, timeout=None):
+        """The loaded model for ``version`` (default: the active one), loading it if needed."""
+        version, path = self.resolve(version)
+        with self._lock:
+            loaded = self._loaded.get(version)
+            if loaded is not None:
+                self._loaded.move_to_end(version)
+                return loaded
+        return self._wait(version, self._load_future(version, path), timeout)
+
+    def load_async(self, version=None):
+        """Start loading ``version`` in the background (e.g. at startup); returns a Future."""
+        version, path = self.resolve(version)
+        return self._load_future(version, path)
+
+    def _load_future(self, version, path, reload=False):
+        with self._lock:
+            future = self._loading.get(version)
+            if future is None:
+                future = Future()
+                if version in self._loaded and not reload:
+                    future.set_result(self._loaded[version])
+                else:
+                    self._loading[version] = future
+                    threading.Thread(target=self._load, args=(version, path, future),
+                                     name=f'model-load-{version}', daemon=True).start()
+        return future
+
+    def _wait(self, version, future, timeout):
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            raise ModelNotReadyError(f"Model {version} is still loading")
+        except Exception as e:
+            raise ModelNotReadyError(f"Model {version} failed to load: {e}")
+
+    def _load(self, version, path, future):
+        started = time.perf_counter()
+        try:
+            model = self.loader(path)
+            extras = self.setup(model) if self.setup is not None else {}
+            model_id = model_identity(path)
+            if getattr(model, 'runtime_id', None):
+                model_id = f"{model_id}+{model.runtime_id}"  # e.g. the NumPy export of a Keras model
+            loaded = LoadedModel(version, path, model, model_id, extras)
+        except Exception as e:
+            with self._lock:
+                self._loading.pop(version, None)
+                self._stats['load_errors'] += 1
+                self._errors[version] = repr(e)
+            future.set_exception(e)
+            return
+        with self._lock:
+            replaced = self._loaded.get(version)  # A reload replaces the version in memory
+            self._loaded[version] = loaded
+            self._loaded.move_to_end(version)
+            self._loading.pop(version, None)
+            self._errors.pop(version, None)
+            self._load_seconds[version] = time.perf_counter() - started
+            self._stats['loads'] += 1
+            dropped = self._evict_over_limit() + ([replaced] if replaced is not None else [])
+        future.set_result(loaded)
+        self._release(dropped)
+
+    def _evict_over_limit(self):
+        """Drop the least recently used versions over ``max_loaded``; returns them for ``_release``."""
+        evicted = []
+        for version in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            if version != self.active_version:
+                evicted.append(self._loaded.pop(version))
+                self._stats['evictions'] += 1
+        return evicted
+
+    def _release(self, dropped):
+        # Outside the lock: teardown may wait for a batch still being scored
+        if self.teardown is None:
+            return
+        for loaded in dropped:
+            try:
+                self.teardown(loaded.extras)
+            except Exception as e:
+                print(f"Teardown of model {loaded.version} failed: {e}")
+
+    # ---- hot swap ----
+    def activate(self, version, reload=False, timeout=None):
+        """Make ``version`` the default for requests once it is loaded; the old one keeps serving until then.
+
+        ``reload`` re-reads the artifact even if that version is in memory,
+        e.g. after ``model/svm.pkl`` was overwritten in place.
+        """
+        version, path = self.resolve(version)
+        loaded = self._wait(version, self._load_future(version, path, reload), timeout)
+        with self._lock:
+            if self.active_version != version or reload:
+                self._stats['swaps'] += 1
+            self.active_version = version
+            evicted = self._evict_over_limit()
+        self._release(evicted)
+        return loaded
+
+    def loaded(self):
+        """``{version: LoadedModel}`` of the versions in memory; never loads anything."""
+        with self._lock:
+            return dict(self._loaded)
+
+    def ready(self):
+        """True once the active version is in memory."""
+        with self._lock:
+            return self.active_version in self._loaded
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                active=self.active_version,
+                ready=self.active_version in self._loaded,
+                loaded={v: {'model_id': m.model_id, 'load_seconds': round(self._load_seconds.get(v, 0.0), 3)}
+                        for v, m in self._loaded.items()},
+                loading=sorted(self._loading),
+                errors=dict(self._errors),
+            )
+        stats['available'] = sorted(self.available())
+        return stats
+
+
+def register_model_routes(app, registry):
+    """GET /ready (503 until the active model is loaded), GET /models, POST /models/activate."""
+    from flask import jsonify, request
+
+    @app.errorhandler(UnknownModelError)
+    def unknown_model(e):
+        return jsonify({"error": f"Unknown model version {e.args[0]!r}"}), 404
+
+    @app.errorhandler(ModelNotReadyError)
+    def model_not_ready(e):
+        return jsonify({"error": str(e)}), 503
+
+    @app.route("/ready", methods=["GET"])
+    def get_ready():
+        ready = registry.ready()
+        if not ready:
+            registry.load_async()  # The first probe starts the load; later ones just wait for it
+        body = {"ready": ready, "model": registry.active_version}
+        error = registry.stats()['errors'].get(registry.active_version)
+        if error:
+            body["error"] = error
+        return jsonify(body), 200 if ready else 503
+
+    @app.route("/models", methods=["GET"])
+    def get_models():
+        return jsonify(registry.stats())
+
+    @app.route("/models/activate", methods=["POST"])
+    def activate_model():
+        request_data = request.get_json(silent=True) or {}
+        version = request_data.get("version")
+        if not isinstance(version, str) or not version:
+            return jsonify({"error": "'version' is required"}), 400
+        loaded = registry.activate(version, reload=bool(request_data.get("reload")))
+        return jsonify({"active": loaded.version, "model_id": loaded.model_id})
+
+
+def create_model_registry(base_dir, kind, default_file, setup=None, loader=None, teardown=None):
+    """Registry over ``model/<default_file>`` and ``model/<kind>/<version>/``, configured through the environment."""
+    return ModelRegistry(
+        os.path.join(base_dir, 'model', default_file),
+        versions_dir=os.path.join(base_dir, 'model', kind),
+        setup=setup,
+        max_loaded=int(os.environ.get('MODEL_CACHE_SIZE', 3)),
+        active_version=os.environ.get('MODEL_VERSION', DEFAULT_VERSION),
+        loader=loader or load_pickle,
+        teardown=teardown,
+    )
@@ -0,0 +1,273 @@
+from flask import Flask, jsonify, request, render_template_string, Response, stream_with_context
+from flask_cors import CORS  # Import CORS
+from datetime import date
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from backends import MAX_BATCH_SYMBOLS, MODEL_LOAD_TIMEOUT, create_backend
+from bar_cache import bars_version, create_bar_cache
+from charts import create_chart_cache, create_chart_renderer, register_chart_routes
+from features import register_feature_routes
+from result_cache import create_result_cache, prediction_key
+from model_registry import create_model_registry, register_model_routes
+from response_formats import create_compressor, dataframe_response, json_options, json_response, negotiate_format, \
+    records_json, register_compression
+from live_data import LIVE_SYMBOLS, create_live_data, register_live_routes
+from metrics import create_metrics, register_metrics_routes, stage, stats_families
+from profiler import create_profiler, register_profiler_routes
+from scoring import create_scorer, register_scoring_routes
+from singleflight import CoalescedTimeout, SingleFlight
+
+# ---------------- Stock Prediction App Variables ----------------
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+def batch_line(stock_symbol, predictions=None, error=None):
+    """One NDJSON line of a /predictions/batch response; ``predictions`` is a serialized JSON array."""
+    if error is not None:
+        return (json.dumps({"symbol": stock_symbol, "error": error}) + "\n").encode()
+    return b'{"symbol": ' + json.dumps(stock_symbol).encode() + b', "predictions": ' + predictions.strip() + b'}\n'
+
+def collect_app_metrics(models, bar_cache, result_cache, chart_cache, live, compressor=None, flights=(), scorer=None):
+    """Families for /metrics from the ``stats()`` of the app's components, read at scrape time."""
+    families = []
+    for name, cache in (('bar', bar_cache), ('result', result_cache), ('chart', chart_cache)):
+        stats = cache.stats()
+        for key in ('hits', 'disk_hits', 'misses', 'memory_hits', 'disk_loads', 'evictions', 'expired',
+                    'downloads', 'download_errors'):
+            if key in stats:
+                families += stats_families('cache', {'events': stats[key]}, counters=['events'],
+                                           labels={'cache': name, 'event': key}, help="Cache lookups and evictions by outcome")
+        families += stats_families('cache', stats, gauges=['hit_ratio', 'entries'], labels={'cache': name})
+
+    stats = models.stats()
+    families += stats_families('model', stats, counters=['loads', 'load_errors', 'swaps', 'evictions'], gauges=['ready'])
+    for version, loaded in models.loaded().items():
+        labels = {'version': version}
+        extras = loaded.extras
+        if 'batcher' in extras:
+            families += stats_families('predict_batcher', extras['batcher'].stats(), labels=labels,
+                                       counters=['requests', 'batches', 'errors', 'rows'], gauges=['queue_depth', 'max_batch_rows'])
+        if 'forecaster' in extras:
+            for mode, count in extras['forecaster'].stats().items():
+                if mode != 'series':
+                    families += stats_families('forecast', {'series': count}, counters=['series'],
+                                               labels=dict(labels, mode=mode), help="Forecasts by recompute mode")
+
+    # Live feed, trade fan-out and live bars
+    families += stats_families('feed', live.feed.stats(), counters=['messages', 'reconnects', 'handler_errors'],
+                               gauges=['connected', 'messages_per_second', 'lag_ms'])
+    families += stats_families('stream', live.broadcaster.stats(), counters=['published', 'delivered', 'dropped', 'disconnected', 'rejected'],
+                               gauges=['subscribers'])
+    families += stats_families('live_bars', live.bar_aggregator.stats(),
+                               counters=['ticks', 'bars_completed', 'late_amended', 'late_dropped'])
+    if live.journal is not None:
+        families += stats_families('tick_journal', live.journal.stats(), counters=['messages', 'ticks', 'skipped', 'segments_opened', 'pruned'],
+                                   gauges=['writer', 'open_segments'])
+    for flight in flights:
+        families += stats_families('singleflight', flight.stats(), counters=['calls', 'executions', 'coalesced', 'errors', 'timeouts'],
+                                   gauges=['in_flight'], labels={'flight': flight.name},
+                                   help="Calls sharing one in-flight fetch or inference")
+    if scorer is not None:
+        families += stats_families('scoring', scorer.stats(), counters=['jobs', 'symbols', 'errors', 'pool_starts', 'pool_failures', 'seconds'],
+                                   gauges=['workers', 'running', 'draining'])
+    if compressor is not None:
+        families += stats_families('compression', compressor.stats(),
+                                   counters=['responses', 'cache_hits', 'bytes_in', 'bytes_out'], gauges=['ratio'])
+    return families
+
+def create_app(backend=None):
+    """Build the prediction service around the ``lstm`` or ``svm`` backend (default: ``PREDICTION_BACKEND``).
+
+    Nothing heavy happens here: the model loads on first use (or the first
+    /ready probe) and the live feed connects on the first live-data request,
+    so the app can be imported once by a pre-forking server.
+    """
+    backend = create_backend(backend)
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "http://localhost:4200"}})  # Enable CORS for specific origin
+
+    # model/<default_file> plus versioned artifacts in model/<backend>/<version>/
+    models = create_model_registry(base_dir, backend.name, backend.default_file, setup=backend.setup,
+                                   loader=backend.loader, teardown=backend.teardown)
+    symbol = "META"  # Default stock symbol
+    bar_cache = create_bar_cache(base_dir)  # Per-symbol bar store in front of Yahoo Finance
+    result_cache = create_result_cache()  # Finished /predictions responses
+    # Concurrent identical /predictions share one inference (the bar cache coalesces fetches the same way)
+    predictions = SingleFlight('predictions', timeout=float(os.environ.get('COALESCE_TIMEOUT', 30)))
+    fetch_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('BATCH_FETCH_WORKERS', 8)))  # Bounded multi-symbol fetches
+    live = create_live_data(LIVE_SYMBOLS)  # Finnhub trades (or the server's feed hub): /data, /ticks, /bars, /stream, /feed
+    chart_cache = create_chart_cache()  # Rendered /plot_stock_data charts
+    compressor = create_compressor()  # gzip/brotli for large JSON, NDJSON, Arrow and SVG bodies
+    scorer = create_scorer(backend.name)  # /score: symbol universes on a process pool, started on first use
+    metrics = create_metrics()  # /metrics: stage and request latency, cache, batcher and feed counters
+    metrics.add_collector(lambda: collect_app_metrics(models, bar_cache, result_cache, chart_cache, live, compressor,
+                                                      [bar_cache.flights, predictions], scorer))
+    app.extensions.update(backend=backend, models=models, bar_cache=bar_cache, result_cache=result_cache, live=live,
+                          metrics=metrics)
+    register_metrics_routes(app, metrics)  # First, so request timing covers the other hooks
+    profiler = create_profiler()  # Opt-in: PROFILER_ENABLED=1, then an X-Profile header per request
+    if profiler is not None:
+        register_profiler_routes(app, profiler, os.environ.get('PROFILER_TOKEN') or None)
+    if compressor is not None:
+        register_compression(app, compressor)  # Registered last, so its after_request hook runs first
+
+    def fetch_stock_data(symbol, start, end):
+        """Fetch stock data through the local bar cache (only the missing tail is downloaded)."""
+        with stage('bars'):
+            stock_data = bar_cache.get(symbol, start, end)
+        if stock_data is None or stock_data.empty:
+            return None
+        return stock_data
+
+    def fetch_many(symbols, start, end):
+        """Yield ``(symbol, bars, error)`` for every distinct symbol as soon as its bars are fetched."""
+        futures = {fetch_pool.submit(fetch_stock_data, s, start, end): s for s in dict.fromkeys(symbols)}
+        for future in as_completed(futures):
+            stock_symbol = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                yield stock_symbol, None, str(e)
+                continue
+            if df is None:
+                yield stock_symbol, None, "Failed to retrieve stock data"
+            else:
+                yield stock_symbol, df, None
+
+    def predict_response(loaded, stock_symbol, start_date, df, cache_key, options):
+        """Serialized predictions for one symbol, stored in the result cache."""
+        data = backend.predict_many(loaded, [(stock_symbol, start_date, df)])[0]
+        if isinstance(data, Exception):
+            raise data
+        with stage('serialize'):
+            body = records_json(data[['Date', 'Close', 'Predictions']], **options)
+        result_cache.put(cache_key, body)
+        return body
+
+    # ---------------- Flask Routes ----------------
+    @app.errorhandler(CoalescedTimeout)
+    def coalesced_timeout(e):
+        return jsonify({"error": str(e)}), 504
+
+    @app.route("/", methods=["GET", "POST"])
+    def hello_world():
+        nonlocal symbol
+        if request.method == "POST":
+            symbol = request.form.get("symbol", "No symbol provided")
+        return render_template_string(
+            """
+            <form method="post">
+                <h1>Stocks</h1>
+                <input type="text" name="symbol" value="{{ symbol }}" />
+                <button type="submit">Submit</button>
+            </form>
+            """, symbol=symbol
+        )
+
+    @app.route("/get_stock_data", methods=["POST"])
+    def get_stock_data():
+        nonlocal symbol
+        request_data = request.get_json()
+        stock_symbol = request_data.get("symbol", symbol)
+        response_format = negotiate_format(request)  # ?format= or Accept header
+        if response_format is None:
+            return jsonify({"error": "Unsupported format"}), 400
+        try:
+            options = json_options(request)  # ?precision=, ?date_format=
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        start_date = '2015-01-01'
+        end_date = date.today()
+        stock_data = fetch_stock_data(stock_symbol, start_date, end_date)
+        if stock_data is not None:
+            stock_data.columns = [str(col) for col in stock_data.columns]
+            if response_format != 'json':
+                return dataframe_response(stock_data, response_format, **options)
+            with stage('serialize'):
+                return json_response(stock_data, **options)
+        else:
+            return jsonify({"error": "Failed to retrieve stock data"}), 500
+
+    @app.route("/predictions", methods=["POST"])
+    def get_predictions_data():
+        request_data = request.get_json()
+        stock_symbol = request_data.get("symbol", "META")
+        start_date = request_data.get("start_date", '2015-01-01')
+        end_date = request_data.get("end_date", str(date.today()))
+        try:
+            options = json_options(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        loaded = models.get(request_data.get("model"), timeout=MODEL_LOAD_TIMEOUT)  # Active model unless one is named
+        df = fetch_stock_data(stock_symbol, start_date, end_date)
+        if df is None:
+            return jsonify({"error": "Failed to retrieve stock data"}), 500
+        # Keyed on the bars this request got: a refresh in between must not file them under newer bars
+        cache_key = prediction_key(loaded.model_id, stock_symbol, start_date, end_date, bars_version(stock_symbol, df),
+                                   options)
+        cached_response = result_cache.get(cache_key)
+        if cached_response is not None:
+            return Response(cached_response, mimetype='application/json')
+        body = predictions.do(cache_key, predict_response, loaded, stock_symbol, start_date, df, cache_key, options)
+        return Response(body, mimetype='application/json')
+
+    @app.route("/predictions/batch", methods=["POST"])
+    def get_batch_predictions_data():
+        request_data = request.get_json()
+        symbols = request_data.get("symbols")
+        start_date = request_data.get("start_date", '2015-01-01')
+        end_date = request_data.get("end_date", str(date.today()))
+        if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) for s in symbols):
+            return jsonify({"error": "'symbols' must be a non-empty list of ticker symbols"}), 400
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per batch"}), 400
+        try:
+            options = json_options(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        loaded = models.get(request_data.get("model"), timeout=MODEL_LOAD_TIMEOUT)
+
+        def generate():
+            # Failures and cached results are streamed as soon as they are known
+            pending = []
+            for stock_symbol, df, error in fetch_many(symbols, start_date, end_date):
+                if error is not None:
+                    yield batch_line(stock_symbol, error=error)
+                    continue
+                cache_key = prediction_key(loaded.model_id, stock_symbol, start_date, end_date,
+                                           bars_version(stock_symbol, df), options)
+                cached_response = result_cache.get(cache_key)
+                if cached_response is not None:
+                    yield batch_line(stock_symbol, cached_response)
+                    continue
+                pending.append((stock_symbol, cache_key, df))
+            if not pending:
+                return
+
+            # One stacked inference pass over every remaining symbol
+            results = backend.predict_many(loaded, [(stock_symbol, start_date, df) for stock_symbol, _, df in pending])
+            for (stock_symbol, cache_key, _), data in zip(pending, results):
+                if isinstance(data, Exception):
+                    yield batch_line(stock_symbol, error=str(data))
+                    continue
+                with stage('serialize'):
+                    body = records_json(data[['Date', 'Close', 'Predictions']], **options)
+                result_cache.put(cache_key, body)
+                yield batch_line(stock_symbol, body)
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @app.route("/cache_stats", methods=["GET"])
+    def get_cache_stats():
+        return jsonify(result_cache.stats())
+
+    register_chart_routes(app, bar_cache, chart_cache, create_chart_renderer())  # /plot_stock_data
+    register_scoring_routes(app, scorer, models, fetch_many)  # /score
+    backend.register_routes(app, models, fetch_many, live)  # Backend specific routes
+    register_live_routes(app, live)  # /data, /ticks, /bars, /stream, /feed
+    register_feature_routes(app, bar_cache, live)  # /features, /features/live
+    register_model_routes(app, models)  # /ready, /models, /models/activate
+    return app
+
+if __name__ == "__main__":
+    create_app().run(host='0.0.0.0', port=8080, debug=False)
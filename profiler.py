@@ -0,0 +1,168 @@
+"""Opt-in sampling profiler for single requests.
+
+With ``PROFILER_ENABLED=1`` a request sent with an ``X-Profile: 1`` header
+(or the value of ``PROFILER_TOKEN`` when one is set) is profiled: a
+background thread samples the stack of the thread serving it every
+``PROFILER_INTERVAL_MS`` until the response is closed, so streamed bodies
+are included.  The response carries an ``X-Profile-Id`` header; the
+samples are kept for the last ``PROFILER_MAX_PROFILES`` requests.
+
+* ``GET /debug/profiles``: the kept profiles
+* ``GET /debug/profiles/<id>``: collapsed stacks (``frame;frame;frame count``
+  per line, the input of flamegraph.pl and speedscope)
+* ``GET /debug/profiles/<id>?format=top``: functions by own and total samples
+
+Samples are taken when the sampler thread gets the GIL, so pure-Python
+code is seen about every switch interval (5 ms) at most.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class Profile:
+    """Stack samples of one thread between ``start`` and ``stop``."""
+
+    def __init__(self, profile_id, thread_id, label, interval, max_depth):
+        self.id = profile_id
+        self.thread_id = thread_id
+        self.label = label
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()  # (root frame, ..., leaf frame) -> samples
+        self.started = time.time()
+        self.seconds = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name=f'profiler-{self.id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.seconds is None:
+            self._stop.set()
+            self._thread.join()
+            self.seconds = time.time() - self.started
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def samples(self):
+        return sum(dict(self.stacks).values())
+
+    def collapsed(self):
+        """One ``frame;frame;frame count`` line per distinct stack, most frequent first."""
+        stacks = Counter(dict(self.stacks))  # The sampler may still be adding to it
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+    def top(self, n=30):
+        """Functions (file:line stripped) by the samples they were on top of the stack and on it at all."""
+        own, total = Counter(), Counter()
+        for stack, count in dict(self.stacks).items():
+            functions = [frame.rsplit(':', 1)[0] + ')' for frame in stack]
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+        return [{'function': function, 'own': own[function], 'total': count}
+                for function, count in total.most_common(n)]
+
+    def summary(self):
+        return {'id': self.id, 'label': self.label, 'started': self.started,
+                'seconds': self.seconds, 'samples': self.samples()}
+
+
+class SamplingProfiler:
+    """Starts per-request profiles and keeps the last ``max_profiles`` of them."""
+
+    def __init__(self, interval_ms=2.0, max_profiles=20, max_depth=64):
+        self.interval = interval_ms / 1000.0
+        self.max_profiles = max_profiles
+        self.max_depth = max_depth
+        self._profiles = OrderedDict()  # id -> Profile, oldest first
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, label='', thread_id=None):
+        """Profile ``thread_id`` (default: the calling thread) until ``stop`` is called on the result."""
+        with self._lock:
+            profile_id = f"{os.getpid()}-{next(self._ids)}"
+            profile = Profile(profile_id, thread_id or threading.get_ident(), label, self.interval, self.max_depth)
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile.start()
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def profiles(self):
+        with self._lock:
+            return [profile.summary() for profile in self._profiles.values()]
+
+
+def register_profiler_routes(app, profiler, token=None):
+    """Profile requests that ask for it (see the module docstring); GET /debug/profiles[/<id>]."""
+    from flask import Response, g, jsonify, request
+
+    @app.before_request
+    def start_profile():
+        value = request.headers.get(PROFILE_HEADER)
+        if value and value == (token or '1'):
+            g.profile = profiler.start(f"{request.method} {request.path}")
+
+    @app.after_request
+    def attach_profile(response):
+        profile = g.get('profile')
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+            # Stop once the body has been sent, so streamed responses are covered too
+            response.call_on_close(profile.stop)
+            g.profile_attached = True
+        return response
+
+    @app.teardown_request
+    def stop_unattached_profile(exc):
+        # No response came back through after_request (e.g. an unhandled error)
+        profile = g.get('profile')
+        if profile is not None and not g.get('profile_attached'):
+            profile.stop()
+
+    @app.route("/debug/profiles", methods=["GET"])
+    def get_profiles():
+        return jsonify(profiler.profiles())
+
+    @app.route("/debug/profiles/<profile_id>", methods=["GET"])
+    def get_profile(profile_id):
+        profile = profiler.get(profile_id)
+        if profile is None:
+            return jsonify({"error": f"No profile {profile_id!r} (profiles live in the worker that served the request)"}), 404
+        if request.args.get("format") == "top":
+            return jsonify(dict(profile.summary(), top=profile.top(request.args.get("n", default=30, type=int))))
+        return Response(profile.collapsed(), mimetype='text/plain')
+
+
+def create_profiler():
+    """A profiler when ``PROFILER_ENABLED`` is set, otherwise None (no profiling hooks at all)."""
+    if os.environ.get('PROFILER_ENABLED', '0') not in ('1', 'true'):
+        return None
+    return SamplingProfiler(
+        interval_ms=float(os.environ.get('PROFILER_INTERVAL_MS', 2)),
+        max_profiles=int(os.environ.get('PROFILER_MAX_PROFILES', 20)),
+    )
@@ -0,0 +1,326 @@
+"""DataFrame responses: JSON encoded column by column, NDJSON, Arrow and Parquet, plus response compression.
+
+JSON is built from the NumPy arrays of a frame instead of
+``to_dict(orient="records")``: every column is encoded once (by orjson
+when it is installed), then the rows are stitched together from the
+encoded values.  NaN and infinity become ``null``.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+from metrics import stage
+from result_cache import ResultCache
+
+try:
+    import orjson
+except ImportError:  # The standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Formats /get_stock_data can answer with besides the default list of JSON records
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'columns': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+ACCEPT_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+}
+NDJSON_CHUNK_ROWS = 2000
+
+# How dates are written: "Thu, 01 Jan 2015 00:00:00 GMT" (what jsonify writes), "2015-01-01T00:00:00"
+# or milliseconds since the epoch
+DATE_FORMATS = ('http', 'iso', 'epoch_ms')
+MAX_PRECISION = 15
+_WEEKDAYS = ('Thu', 'Fri', 'Sat', 'Sun', 'Mon', 'Tue', 'Wed')  # 1970-01-01 was a Thursday
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def negotiate_format(request):
+    """Pick the response format from ``?format=`` or, failing that, the Accept header."""
+    fmt = request.args.get('format')
+    if fmt:
+        fmt = fmt.lower()
+        return fmt if fmt in MIMETYPES or fmt == 'json' else None
+    best = request.accept_mimetypes.best_match(['application/json'] + list(ACCEPT_FORMATS))
+    return ACCEPT_FORMATS.get(best, 'json')
+
+
+def json_options(request):
+    """``precision`` (decimals of floats) and ``date_format`` from the query string or the JSON body.
+
+    Either is None when not given; raises ValueError for a bad value.
+    """
+    body = request.get_json(silent=True)
+    params = body if isinstance(body, dict) else {}
+    precision = request.args.get('precision', params.get('precision'))
+    date_format = request.args.get('date_format', params.get('date_format'))
+    if precision is not None:
+        try:
+            precision = int(precision)
+        except (TypeError, ValueError):
+            raise ValueError("'precision' must be an integer") from None
+        if not 0 <= precision <= MAX_PRECISION:
+            raise ValueError(f"'precision' must be between 0 and {MAX_PRECISION}")
+    if date_format is not None and date_format not in DATE_FORMATS:
+        raise ValueError(f"'date_format' must be one of {list(DATE_FORMATS)}")
+    return {'precision': precision, 'date_format': date_format}
+
+
+# ---------------- JSON encoding ----------------
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, separators=(',', ':'), default=str).encode()
+
+
+def _numeric_array(values, precision):
+    # One JSON array for a bool/int/float column
+    if values.dtype.kind == 'f':
+        if precision is not None:
+            values = np.round(values, precision)
+        if orjson is None:
+            return _dumps(np.where(np.isfinite(values), values, None).tolist())
+    elif orjson is None:
+        return _dumps(values.tolist())
+    return _dumps(np.ascontiguousarray(values))
+
+
+def _date_tokens(series, date_format):
+    if series.dt.tz is not None:
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    values = series.to_numpy()
+    missing = np.isnat(values)
+    if date_format == 'epoch_ms':
+        tokens = [str(ms).encode() for ms in values.astype('datetime64[ms]').astype(np.int64).tolist()]
+    else:
+        # Minute bars repeat a few hundred days and times of day, so each distinct one is formatted once
+        seconds = values.astype('datetime64[s]').astype(np.int64)
+        days, day_index = np.unique(seconds // 86400, return_inverse=True)
+        times, time_index = np.unique(seconds % 86400, return_inverse=True)
+        if date_format == 'http':
+            prefixes = []
+            for day in days.tolist():
+                d = datetime.fromtimestamp(day * 86400, timezone.utc) if -719162 <= day <= 2932896 else None
+                prefixes.append(b'' if d is None else
+                                f'"{_WEEKDAYS[day % 7]}, {d.day:02d} {_MONTHS[d.month - 1]} {d.year:04d} '.encode())
+            suffixes = [f'{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d} GMT"'.encode() for t in times.tolist()]
+        else:
+            prefixes = [f'"{d}T'.encode() for d in days.astype('datetime64[D]').astype(str).tolist()]
+            suffixes = [f'{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d}"'.encode() for t in times.tolist()]
+        tokens = [prefixes[d] + suffixes[t] for d, t in zip(day_index.tolist(), time_index.tolist())]
+    if missing.any():
+        for i in np.flatnonzero(missing).tolist():
+            tokens[i] = b'null'
+    return tokens
+
+
+def _column_tokens(series, precision=None, date_format='iso'):
+    """The encoded JSON value of every row of ``series``."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return _date_tokens(series, date_format)
+    values = series.to_numpy()
+    if values.dtype.kind in 'biuf':
+        if not len(values):
+            return []
+        return _numeric_array(values, precision)[1:-1].split(b',')  # Numbers never contain a comma
+    return [b'null' if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value)
+            else _dumps(value) for value in values.tolist()]
+
+
+def _column_array(series, precision=None, date_format='iso'):
+    values = series.to_numpy()
+    if values.dtype.kind in 'biuf':
+        return _numeric_array(values, precision)
+    return b'[' + b','.join(_column_tokens(series, precision, date_format)) + b']'
+
+
+def _row_template(names, separator=b','):
+    # b'{"Close":%s,"Date":%s}' with '%' in column names escaped
+    fields = separator.join(_dumps(name).replace(b'%', b'%%') + b':%s' for name in names)
+    return b'{' + fields + b'}'
+
+
+def records_json(df, precision=None, date_format=None, sort_keys=True):
+    """``[{"column": value, ...}, ...]`` as bytes: what ``jsonify(df.to_dict(orient="records"))`` returns.
+
+    Keys are sorted and dates written as HTTP dates unless told otherwise.
+    """
+    names = [str(col) for col in df.columns]
+    order = sorted(range(len(names)), key=names.__getitem__) if sort_keys else range(len(names))
+    template = _row_template([names[i] for i in order])
+    tokens = [_column_tokens(df.iloc[:, i], precision, date_format or 'http') for i in order]
+    return b'[' + b','.join(template % row for row in zip(*tokens)) + b']\n'
+
+
+def ndjson_rows(df, chunk_rows=NDJSON_CHUNK_ROWS, precision=None, date_format=None):
+    """Yield ``df`` as newline-delimited JSON (bytes), one chunk of rows at a time."""
+    template = _row_template([str(col) for col in df.columns]) + b'\n'
+    for offset in range(0, len(df), chunk_rows):
+        chunk = df.iloc[offset:offset + chunk_rows]
+        tokens = [_column_tokens(chunk.iloc[:, i], precision, date_format or 'iso') for i in range(chunk.shape[1])]
+        yield b''.join(template % row for row in zip(*tokens))
+
+
+def columnar_json(df, precision=None, date_format=None):
+    """``{"column": [values...]}`` JSON (bytes), one array per column."""
+    columns = [_dumps(str(col)) + b':' + _column_array(df.iloc[:, i], precision, date_format or 'iso')
+               for i, col in enumerate(df.columns)]
+    return b'{' + b','.join(columns) + b'}'
+
+
+def json_response(df, status=200, **options):
+    """Response with ``records_json(df, **options)``."""
+    return Response(records_json(df, **options), status=status, mimetype='application/json')
+
+
+def arrow_bytes(df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def parquet_bytes(df):
+    sink = io.BytesIO()
+    df.to_parquet(sink, index=False)
+    return sink.getvalue()
+
+
+def dataframe_response(df, fmt, precision=None, date_format=None):
+    """Response for one of the non-default formats in MIMETYPES."""
+    mimetype = MIMETYPES[fmt]
+    if fmt == 'ndjson':
+        return Response(ndjson_rows(df, precision=precision, date_format=date_format), mimetype=mimetype)
+    if fmt == 'columns':
+        return Response(columnar_json(df, precision, date_format), mimetype=mimetype)
+    try:
+        body = arrow_bytes(df) if fmt == 'arrow' else parquet_bytes(df)
+    except ImportError:
+        return Response(json.dumps({"error": f"{fmt} output needs pyarrow installed"}),
+                        status=406, mimetype='application/json')
+    return Response(body, mimetype=mimetype)
+
+
+# ---------------- Compression ----------------
+# Parquet is compressed already, PNG too
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'application/vnd.apache.arrow.stream',
+                'image/svg+xml', 'text/')
+# Server-Sent Events must reach the client event by event; proxies and clients buffer compressed streams
+UNCOMPRESSED = ('text/event-stream',)
+
+
+class ResponseCompressor:
+    """gzip (or brotli, when installed) for responses of at least ``min_bytes``.
+
+    Compressed bodies are kept in a small cache keyed by the hash of the
+    body, so a cached prediction or chart is compressed once, not per request.
+    """
+
+    def __init__(self, min_bytes=1024, gzip_level=1, brotli_quality=4, cache=None):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+        self._stats = {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cache_hits': 0}
+        self._lock = threading.Lock()
+
+    def encoding_for(self, accept_encodings):
+        """The encoding to answer a request's ``Accept-Encoding`` with, or None."""
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, body, encoding):
+        key = None
+        if self.cache is not None:
+            key = f"{encoding}:{hashlib.sha1(body).hexdigest()}"
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                self._count(body, compressed, cached=True)
+                return compressed
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if key is not None:
+            self.cache.put(key, compressed)
+        self._count(body, compressed)
+        return compressed
+
+    def _count(self, body, compressed, cached=False):
+        with self._lock:
+            self._stats['responses'] += 1
+            self._stats['cache_hits'] += cached
+            self._stats['bytes_in'] += len(body)
+            self._stats['bytes_out'] += len(compressed)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['ratio'] = stats['bytes_out'] / stats['bytes_in'] if stats['bytes_in'] else None
+        return stats
+
+
+def register_compression(app, compressor):
+    """Compress JSON, NDJSON, Arrow, SVG and text responses for clients that accept it; streams are sent as is."""
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        mimetype = response.mimetype or ''
+        # Streamed bodies (/stream events, NDJSON rows) go out as they are produced, uncompressed
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or request.method == 'HEAD' or 'Content-Encoding' in response.headers
+                or mimetype.startswith(UNCOMPRESSED) or not mimetype.startswith(COMPRESSIBLE)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = compressor.encoding_for(request.accept_encodings)
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < compressor.min_bytes:
+            return response
+        with stage('compress'):
+            response.set_data(compressor.compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)  # Same content, different bytes
+        return response
+
+
+def create_compressor():
+    """Response compression configured through the environment; None with ``COMPRESS_RESPONSES=0``."""
+    if os.environ.get('COMPRESS_RESPONSES', '1') not in ('1', 'true'):
+        return None
+    cache_entries = int(os.environ.get('COMPRESS_CACHE_ENTRIES', 64))
+    return ResponseCompressor(
+        min_bytes=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)),
+        gzip_level=int(os.environ.get('COMPRESS_GZIP_LEVEL', 1)),
+        brotli_quality=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4)),
+        cache=ResultCache(max_entries=cache_entries, ttl=3600) if cache_entries else None,
+    )
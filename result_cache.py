@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def model_identity(model_path):
+    """Short content hash of a model artifact, so a retrained model never serves stale results."""
+    digest = hashlib.sha1()
+    with open(model_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return f"{os.path.basename(model_path)}:{digest.hexdigest()[:12]}"
+
+
+def prediction_key(model_id, symbol, start, end, data_version, options=None):
+    """Cache key of a finished /predictions response; ``options`` are its JSON encoding options."""
+    start = pd.Timestamp(start).strftime('%Y-%m-%d')
+    end = pd.Timestamp(end).strftime('%Y-%m-%d')
+    raw = f"{model_id}|{symbol}|{start}|{end}|{data_version}"
+    if options and any(value is not None for value in options.values()):
+        raw += '|' + ','.join(f"{name}={options[name]}" for name in sorted(options))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ResultCache:
+    """Bounded TTL + LRU cache of serialized responses (bytes).
+
+    With ``disk_dir`` set, entries are also written there so several pods
+    mounting the same volume can reuse each other's results; a file's
+    modification time plus ``ttl`` is its expiry.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (expires_at, value), most recently used last
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._stats['expired'] += 1
+
+        value, expires_at = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._insert(key, value, expires_at)
+        return value
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires_at)
+        self._write_disk(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _insert(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    # ---- shared disk backend ----
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + '.bin')
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None, None
+        path = self._path(key)
+        try:
+            expires_at = os.path.getmtime(path) + self.ttl
+            if expires_at <= now:
+                os.remove(path)
+                return None, None
+            with open(path, 'rb') as file:
+                return file.read(), expires_at
+        except OSError:
+            return None, None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write result cache entry: {e}")
+
+
+def create_result_cache():
+    """Result cache for the services, configured through the environment."""
+    return ResultCache(
+        max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 512)),
+        ttl=float(os.environ.get('RESULT_CACHE_TTL', 3600)),
+        disk_dir=os.environ.get('RESULT_CACHE_DIR') or None,
+    )
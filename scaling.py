@@ -0,0 +1,32 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Fitted min/max parameters; immutable so each request owns its own copy
+MinMax = namedtuple('MinMax', ['scale', 'offset'])
+
+
+def fit_min_max(values, feature_range=(0, 1)):
+    """Fit per-column min/max scaling of ``values`` (same maths as sklearn's MinMaxScaler)."""
+    values = np.asarray(values, dtype=np.float64)
+    low, high = feature_range
+    data_min = np.nanmin(values, axis=0)
+    data_range = np.nanmax(values, axis=0) - data_min
+    # A constant column maps to the lower bound instead of dividing by zero
+    data_range = np.where(data_range == 0, 1.0, data_range)
+    scale = (high - low) / data_range
+    return MinMax(scale=scale, offset=low - data_min * scale)
+
+
+def min_max_transform(values, params):
+    return np.asarray(values, dtype=np.float64) * params.scale + params.offset
+
+
+def min_max_inverse(values, params):
+    return (np.asarray(values, dtype=np.float64) - params.offset) / params.scale
+
+
+def fit_transform_min_max(values, feature_range=(0, 1)):
+    """Fit and apply in one step; returns ``(scaled, params)``."""
+    params = fit_min_max(values, feature_range)
+    return min_max_transform(values, params), params
@@ -0,0 +1,372 @@
+"""Score a whole universe of symbols (e.g. the S&P 500) on a process pool, over bars in shared memory.
+
+The parent packs the bars of every symbol into one shared-memory block
+(``SharedBars``); the workers attach to it and read their symbols' rows as
+read-only NumPy views, so the bars are neither pickled nor copied.  Every
+worker loads its own instance of the model once, when it starts, and scores
+chunks of symbols with the backend's ``score_many`` (one stacked predict
+per chunk); the parent gathers the results in request order.
+
+As an endpoint: ``POST /score`` (see ``register_scoring_routes``).  From the
+command line, on the bars already in the bar cache:
+
+    python scoring.py --backend svm --symbols-file sp500.txt --workers 8 --output scores.json
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+try:
+    from threadpoolctl import threadpool_limits  # Comes with scikit-learn
+except ImportError:
+    threadpool_limits = None
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+CHUNKS_PER_WORKER = 4  # Smaller chunks than workers x 1 even out symbols of different lengths
+MAX_SCORE_SYMBOLS = 2000
+
+
+# ---------------- Shared bars ----------------
+class SharedBars:
+    """The bars of many symbols in one shared-memory block: a Date column (ns) and ``BAR_COLUMNS`` as float64.
+
+    ``create`` (in the parent) copies the frames in once; ``attach`` (in a
+    worker) maps the same block from its picklable ``layout``.
+    """
+
+    def __init__(self, shm, layout, owner=False):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        rows = layout['rows']
+        self.dates = np.ndarray(rows, dtype=np.int64, buffer=shm.buf)
+        self.values = np.ndarray((len(BAR_COLUMNS), rows), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+        self.offsets = layout['offsets']
+        if not owner:
+            self.dates.flags.writeable = False
+            self.values.flags.writeable = False
+
+    @classmethod
+    def create(cls, frames):
+        """Pack ``{symbol: bars}`` (frames with Date and ``BAR_COLUMNS``) into a new block."""
+        symbols = list(frames)
+        lengths = [len(frames[symbol]) for symbol in symbols]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(int).tolist()
+        rows = offsets[-1]
+        shm = SharedMemory(create=True, size=max(rows * 8 * (1 + len(BAR_COLUMNS)), 1))
+        bars = cls(shm, {'name': shm.name, 'rows': rows, 'symbols': symbols, 'offsets': offsets}, owner=True)
+        for i, symbol in enumerate(symbols):
+            df, start, stop = frames[symbol], offsets[i], offsets[i + 1]
+            bars.dates[start:stop] = pd.to_datetime(df['Date']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+            for j, column in enumerate(BAR_COLUMNS):
+                bars.values[j, start:stop] = df[column].to_numpy(dtype=np.float64) if column in df else np.nan
+        return bars
+
+    @classmethod
+    def attach(cls, layout):
+        # Spawned workers share the parent's resource tracker, so attaching does not make them owners
+        return cls(SharedMemory(name=layout['name']), layout)
+
+    def frame(self, i):
+        """Bars of the ``i``-th symbol as a DataFrame over the shared rows (the price columns are not copied)."""
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        df = pd.DataFrame(self.values[:, start:stop].T, columns=BAR_COLUMNS, copy=False)
+        df.insert(0, 'Date', self.dates[start:stop].view('datetime64[ns]'))
+        return df
+
+    def close(self):
+        self.dates = self.values = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A frame still holds a view; the mapping goes away with it
+        if self.owner:
+            self.shm.unlink()
+
+
+def chunks(offsets, count):
+    """Split the symbols into at most ``count`` contiguous runs of about the same number of rows."""
+    symbols = len(offsets) - 1
+    count = max(1, min(count, symbols))
+    bounds = np.searchsorted(offsets, np.linspace(0, offsets[-1], count + 1)[1:-1])
+    bounds = sorted(set([0] + bounds.tolist() + [symbols]))
+    return [list(range(lo, hi)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+# ---------------- Workers ----------------
+# Per-process backend and model, set once by the pool initializer
+_backend = None
+_model = None
+
+
+def _init_worker(backend_name, path):
+    from backends import create_backend
+    from model_registry import load_pickle
+
+    global _backend, _model
+    if threadpool_limits is not None:
+        threadpool_limits(1)  # One core per worker: n workers use n cores, without BLAS threads on top
+    _backend = create_backend(backend_name)
+    _model = (_backend.loader or load_pickle)(path)
+
+
+def _ready(pause):
+    time.sleep(pause)  # Holds this worker, so the next call reaches another one
+    return os.getpid()
+
+
+def _score_chunk(layout, indices):
+    """``[(symbol, result or None, error or None)]`` for the symbols at ``indices`` of the shared bars."""
+    bars = SharedBars.attach(layout)
+    try:
+        results = _backend.score_many(_model, [bars.frame(i) for i in indices])
+    finally:
+        bars.close()
+    symbols = [layout['symbols'][i] for i in indices]
+    return [(symbol, None, repr(result)) if isinstance(result, Exception) else (symbol, result, None)
+            for symbol, result in zip(symbols, results)]
+
+
+class UniverseScorer:
+    """A pool of ``workers`` scoring processes per model file, started on first use.
+
+    Workers are spawned, not forked, so scoring from a threaded server is
+    safe and each worker owns a fresh model instance.  Scoring with another
+    model file, or after the file changed, starts a new pool; the old one
+    finishes the jobs already running on it and is shut down after the last.
+    """
+
+    def __init__(self, backend_name, workers=None, chunks_per_worker=CHUNKS_PER_WORKER):
+        self.backend_name = backend_name
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self._pool = None
+        self._model_key = None
+        self._jobs = {}  # pool -> jobs using it; a replaced pool is shut down when this drops to 0
+        self._lock = threading.Lock()
+        self._stats = {'jobs': 0, 'symbols': 0, 'errors': 0, 'pool_starts': 0, 'pool_failures': 0, 'seconds': 0.0}
+
+    def _acquire(self, path):
+        """The pool for the model at ``path``, held for one job until ``_release``."""
+        from result_cache import model_identity
+
+        model_key = (path, model_identity(path))
+        with self._lock:
+            if self._pool is None or self._model_key != model_key:
+                if self._pool is not None:
+                    self._retire(self._pool)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(self.backend_name, path))
+                self._model_key = model_key
+                self._stats['pool_starts'] += 1
+            self._jobs[self._pool] = self._jobs.get(self._pool, 0) + 1
+            return self._pool
+
+    def _release(self, pool):
+        with self._lock:
+            if pool not in self._jobs:
+                return  # Already shut down by close()
+            self._jobs[pool] -= 1
+            if not self._jobs[pool]:
+                del self._jobs[pool]
+                if pool is not self._pool:
+                    pool.shutdown(wait=False)  # The last job on a replaced pool is done
+
+    def _retire(self, pool):
+        # Called with the lock held; jobs still running on the pool shut it down in _release
+        if pool is self._pool:
+            self._pool = None
+        if pool not in self._jobs:
+            pool.shutdown(wait=False)
+
+    def start(self, path, timeout=300.0):
+        """Spawn every worker and load its model now rather than on the first job; returns the worker pids."""
+        pool = self._acquire(path)
+        pids = set()
+        deadline = time.monotonic() + timeout
+        try:
+            while len(pids) < self.workers and time.monotonic() < deadline:
+                pids.update(future.result() for future in [pool.submit(_ready, 0.2) for _ in range(self.workers)])
+        finally:
+            self._release(pool)
+        return sorted(pids)
+
+    def score(self, path, frames):
+        """Score ``{symbol: bars}`` with the model at ``path``; returns ``(results, errors)`` keyed by symbol."""
+        started = time.perf_counter()
+        results, errors = {}, {}
+        if not frames:
+            return results, errors
+        pool = self._acquire(path)
+        bars = SharedBars.create(frames)
+        try:
+            futures = [pool.submit(_score_chunk, bars.layout, indices)
+                       for indices in chunks(bars.offsets, self.workers * self.chunks_per_worker)]
+            for future in futures:
+                for symbol, result, error in future.result():
+                    if error is not None:
+                        errors[symbol] = error
+                    else:
+                        results[symbol] = result
+        except BrokenProcessPool:
+            with self._lock:  # A worker died (e.g. out of memory); start a fresh pool next time
+                self._stats['pool_failures'] += 1
+                if pool is self._pool:
+                    self._retire(pool)
+            raise
+        finally:
+            bars.close()
+            self._release(pool)
+        with self._lock:
+            self._stats['jobs'] += 1
+            self._stats['symbols'] += len(frames)
+            self._stats['errors'] += len(errors)
+            self._stats['seconds'] += time.perf_counter() - started
+        # Request order, as the frames came in
+        return {symbol: results[symbol] for symbol in frames if symbol in results}, errors
+
+    def close(self):
+        with self._lock:
+            pools = set(self._jobs)
+            if self._pool is not None:
+                pools.add(self._pool)
+            self._pool = None
+            self._jobs.clear()
+        for pool in pools:
+            pool.shutdown()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = self.workers
+            stats['running'] = self._pool is not None
+            stats['draining'] = sum(pool is not self._pool for pool in self._jobs)
+        return stats
+
+
+def register_scoring_routes(app, scorer, models, fetch_many):
+    """POST /score with {"symbols": [...], "start_date", "end_date", "model"}: every symbol scored on the pool."""
+    from datetime import date
+
+    from flask import jsonify, request
+
+    @app.route("/score", methods=["POST"])
+    def score_universe():
+        request_data = request.get_json(silent=True) or {}
+        symbols = request_data.get("symbols")
+        start_date = request_data.get("start_date", '2015-01-01')
+        end_date = request_data.get("end_date", str(date.today()))
+        if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) for s in symbols):
+            return jsonify({"error": "'symbols' must be a non-empty list of ticker symbols"}), 400
+        if len(symbols) > MAX_SCORE_SYMBOLS:
+            return jsonify({"error": f"At most {MAX_SCORE_SYMBOLS} symbols per scoring job"}), 400
+        version, path = models.resolve(request_data.get("model"))
+
+        # Bars through the bar cache, concurrently, then in request order
+        frames, errors = {}, {}
+        for stock_symbol, df, error in fetch_many(symbols, start_date, end_date):
+            if error is not None:
+                errors[stock_symbol] = error
+            else:
+                frames[stock_symbol] = df
+        frames = {s: frames[s] for s in dict.fromkeys(symbols) if s in frames}
+        started = time.perf_counter()
+        try:
+            results, score_errors = scorer.score(path, frames)
+        except (BrokenProcessPool, CancelledError) as e:
+            # A worker died or the pool went away under the job; the next request gets a fresh pool
+            response = jsonify({"error": f"Scoring pool failed ({type(e).__name__}), retry later"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+        errors.update(score_errors)
+        return jsonify({
+            "model": version,
+            "results": results,
+            "errors": errors,
+            "workers": scorer.workers,
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+
+
+def create_scorer(backend_name):
+    """Scorer for the services: ``SCORING_WORKERS`` processes, by default the cores split over the server's workers."""
+    workers = int(os.environ.get('SCORING_WORKERS', 0))
+    if not workers:
+        # Every app worker (WEB_CONCURRENCY under gunicorn) owns a pool; together they should not exceed the cores
+        workers = max((os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)), 1)
+    return UniverseScorer(backend_name, workers=workers)
+
+
+def main():
+    from backends import BACKENDS
+    from bar_cache import create_bar_cache
+    from model_registry import create_model_registry
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=os.environ.get('PREDICTION_BACKEND', 'lstm'), choices=sorted(BACKENDS))
+    parser.add_argument("--model", default=None, help="model version (default: MODEL_VERSION or the default file)")
+    parser.add_argument("--symbols", nargs="*", default=[])
+    parser.add_argument("--symbols-file", help="one symbol per line")
+    parser.add_argument("--start", default="2015-01-01")
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--online", action="store_true", help="download missing bars through the bar cache")
+    parser.add_argument("--output", help="write the results as JSON (default: print a summary)")
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as file:
+            symbols += [line.strip() for line in file if line.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        parser.error("no symbols given")
+    end = args.end or time.strftime('%Y-%m-%d')
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    backend = BACKENDS[args.backend]()
+    version, path = create_model_registry(base_dir, backend.name, backend.default_file).resolve(args.model)
+    bar_cache = create_bar_cache(base_dir)
+    frames, errors = {}, {}
+    for symbol in symbols:
+        bars = bar_cache.get(symbol, args.start, end) if args.online else bar_cache.cached(symbol, args.start, end)
+        if bars is None or bars.empty:
+            errors[symbol] = "Failed to retrieve stock data" if args.online else \
+                "no cached bars (run with --online or warm the bar cache)"
+        else:
+            frames[symbol] = bars
+    scorer = UniverseScorer(backend.name, workers=args.workers)
+    started = time.perf_counter()
+    scorer.start(path)
+    ready = time.perf_counter()
+    results, score_errors = scorer.score(path, frames)
+    errors.update(score_errors)
+    done = time.perf_counter()
+    scorer.close()
+    rows = sum(len(df) for df in frames.values())
+    print(f"{args.backend} model {version}: {len(results)} symbols ({rows} bars) scored in {done - ready:.2f}s on "
+          f"{scorer.workers} workers (pool start {ready - started:.2f}s), {len(errors)} errors")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"model": version, "results": results, "errors": errors}, file, indent=2)
+    else:
+        key = 'forecast_return' if args.backend == 'lstm' else 'score'
+        ranked = sorted(results.items(), key=lambda item: -math.inf if item[1][key] is None else item[1][key], reverse=True)
+        for symbol, result in ranked[:20]:
+            print(f"  {symbol:10s} {json.dumps(result)}")
+        for symbol, error in errors.items():
+            print(f"  {symbol:10s} error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Request coalescing: concurrent calls with the same key share one execution.
+
+When a popular symbol is asked for by many clients at once, only the first
+caller (the leader) runs the download or the inference; the others wait for
+its result, or its exception, for at most ``timeout`` seconds.  Nothing is
+kept once the call finishes: remembering results is the job of the caches
+around it.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import STAGE_SECONDS
+
+
+class CoalescedTimeout(TimeoutError):
+    """A caller gave up waiting for the in-flight call it joined."""
+
+
+class SingleFlight:
+    """Runs ``fn`` once per key at a time; callers arriving meanwhile share its outcome."""
+
+    def __init__(self, name, timeout=30.0):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}  # key -> Future of the call in flight
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'executions': 0, 'coalesced': 0, 'errors': 0, 'timeouts': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """``fn(*args, **kwargs)``, or the outcome of the identical call already running."""
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self._stats['executions'] += 1
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+        if not leader:
+            return self._wait(key, future)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, errors=1)
+            future.set_exception(e)  # Every waiter gets the same error instead of retrying the call itself
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key, errors=0):
+        # Later callers start a new call rather than join one that is already done
+        with self._lock:
+            self._calls.pop(key, None)
+            self._stats['errors'] += errors
+
+    def _wait(self, key, future):
+        started = time.perf_counter()
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.done():
+                raise  # The call itself timed out; that is its shared result
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise CoalescedTimeout(f"Gave up after {self.timeout:g}s waiting for the in-flight {self.name} call {key!r}")
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, f'{self.name}_wait')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
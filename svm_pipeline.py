@@ -0,0 +1,241 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FeatureEngine
+
+# Bump when svm_features/svm_dataset change so cached feature matrices are rebuilt
+FEATURE_VERSION = 'svm-v2'
+FEATURE_COLUMNS = ['Open-Close', 'High-Low']
+# ``--features indicators`` of train_svm.py: the original columns plus scale-free indicators
+INDICATOR_COLUMNS = FEATURE_COLUMNS + ['rsi_14', 'macd_hist', 'bb_pctb', 'bb_width', 'vol_20', 'ret_1', 'ret_5', 'ret_10']
+# Fixed indicator parameters, so a column name means the same thing at training and prediction time
+ENGINE = FeatureEngine()
+
+DEFAULT_GRID = {'C': [0.1, 1.0, 10.0], 'gamma': ['scale', 0.01, 0.1], 'kernel': ['rbf']}
+
+
+def svm_features(df, columns=FEATURE_COLUMNS):
+    """Add the SVM predictor variables ``columns`` to ``df`` and return them as X.
+
+    Besides the two price differences any indicator of ``ENGINE`` can be
+    used; rows still warming up (e.g. the first 13 for ``rsi_14``) are NaN.
+    """
+    # Create predictor variables
+    df['Open-Close'] = df.Open - df.Close
+    df['High-Low'] = df.High - df.Low
+    indicators = [column for column in columns if column not in FEATURE_COLUMNS]
+    if indicators:
+        values = ENGINE.frame(df, indicators)
+        for column in indicators:
+            df[column] = values[column]
+
+    # Store all predictor variables in a variable X
+    return df[list(columns)]
+
+
+def model_feature_columns(model):
+    """Feature columns a fitted SVM expects: recorded by ``fit_final``, else sklearn's names, else the originals."""
+    columns = getattr(model, 'feature_columns_', None)
+    if columns is None:
+        columns = getattr(model, 'feature_names_in_', FEATURE_COLUMNS)
+    return list(columns)
+
+
+def svm_dataset(df, columns=FEATURE_COLUMNS):
+    """Feature matrix, next-day direction target and next-day return of one symbol's bars.
+
+    The last bar has no next day and is dropped, as are the first bars
+    whose indicators are still warming up.
+    """
+    df = df.copy()
+    X = svm_features(df, columns).to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    # Target variables, as in training script/svm.py
+    y = (close[1:] > close[:-1]).astype(np.int8)
+    forward_return = close[1:] / close[:-1] - 1.0
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')[:-1]
+    keep = ~np.isnan(X[:-1]).any(axis=1)
+    return {'dates': dates[keep], 'X': X[:-1][keep], 'y': y[keep], 'forward_return': forward_return[keep],
+            'columns': np.array(columns)}
+
+
+# ---------------- Feature cache ----------------
+class FeatureStore:
+    """Feature matrices on disk, keyed by symbol, bar content, feature columns and FEATURE_VERSION."""
+
+    def __init__(self, directory, columns=FEATURE_COLUMNS):
+        self.directory = directory
+        self.columns = list(columns)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol, bars):
+        last = bars['Date'].iloc[-1].strftime('%Y-%m-%d') if len(bars) else 'empty'
+        first = bars['Date'].iloc[0].strftime('%Y-%m-%d') if len(bars) else 'empty'
+        key = f"{FEATURE_VERSION}|{','.join(self.columns)}|{symbol}|{first}|{last}|{len(bars)}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        safe = symbol.replace('/', '_').replace(':', '_')
+        return os.path.join(self.directory, f"{safe}-{digest}.npz")
+
+    def load_or_build(self, symbol, bars):
+        """Return ``(path, built)``; the matrices are only computed when not cached yet."""
+        path = self.path(symbol, bars)
+        if os.path.exists(path):
+            return path, False
+        dataset = svm_dataset(bars, self.columns)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **dataset)
+        os.replace(tmp_path, path)
+        return path, True
+
+
+def load_panel(paths):
+    """Stack cached per-symbol datasets into one sample set, sorted by date."""
+    parts = [np.load(path) for path in paths]
+    columns = [str(column) for column in parts[0]['columns']]
+    if any([str(column) for column in part['columns']] != columns for part in parts[1:]):
+        raise ValueError("Feature matrices were built with different columns")
+    dates = np.concatenate([part['dates'] for part in parts])
+    order = np.argsort(dates, kind='stable')
+    return {
+        'columns': columns,
+        'dates': dates[order],
+        'X': np.concatenate([part['X'] for part in parts])[order],
+        'y': np.concatenate([part['y'] for part in parts])[order],
+        'forward_return': np.concatenate([part['forward_return'] for part in parts])[order],
+    }
+
+
+# ---------------- Walk-forward CV ----------------
+def walk_forward_splits(dates, folds=4, min_train_fraction=0.4, gap=1):
+    """Expanding-window splits of date-sorted samples: train on everything before each test block.
+
+    Returns ``(train_stop, test_start, test_stop)`` row positions, so a split
+    is ``train = rows[:train_stop]`` and ``test = rows[test_start:test_stop]``.
+    All symbols share the cut dates, so no fold trains on a day it is tested
+    on.  The last ``gap`` days before a test block are left out of training
+    because their targets are the test block's first closes.
+    """
+    unique = np.unique(dates)
+    first_test = max(int(len(unique) * min_train_fraction), gap + 1)
+    edges = np.linspace(first_test, len(unique), folds + 1).astype(int)
+    splits = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        train_stop = np.searchsorted(dates, unique[lo - gap])
+        test_start = np.searchsorted(dates, unique[lo])
+        test_stop = np.searchsorted(dates, unique[hi]) if hi < len(unique) else len(dates)
+        splits.append((int(train_stop), int(test_start), int(test_stop)))
+    return splits
+
+
+def parse_grid(items):
+    """``["C=0.1,1", "gamma=scale,0.1"]`` to ``{"C": [0.1, 1.0], "gamma": ["scale", 0.1]}``."""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(float(value))
+            except ValueError:
+                parsed.append(value)
+        grid[name.strip()] = parsed
+    return grid
+
+
+def grid_params(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def fold_metrics(y_true, y_pred, dates, forward_return, periods_per_year=252):
+    """Accuracy plus the equal-weighted daily strategy return (long when the model says up)."""
+    strategy = y_pred * forward_return
+    unique, inverse = np.unique(dates, return_inverse=True)
+    daily = np.bincount(inverse, weights=strategy) / np.bincount(inverse)
+    std = daily.std(ddof=1) if len(daily) > 1 else 0.0
+    return {
+        'accuracy': float((y_true == y_pred).mean()),
+        'sharpe': float(daily.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        'total_return': float(daily.sum()),
+        'hit_rate': float((strategy[y_pred == 1] > 0).mean()) if (y_pred == 1).any() else 0.0,
+    }
+
+
+def _recent(train_stop, max_samples):
+    # Samples are date-sorted, so the tail is the most recent history
+    return slice(max(0, train_stop - max_samples) if max_samples else 0, train_stop)
+
+
+# Per-process panel, loaded once by the pool initializer instead of pickled with every task
+_panel = None
+
+
+def _init_worker(paths):
+    global _panel
+    _panel = load_panel(paths)
+
+
+def _evaluate(task):
+    from sklearn.svm import SVC
+
+    params, fold, (train_stop, test_start, test_stop), max_samples = task
+    train = _recent(train_stop, max_samples)
+    test = slice(test_start, test_stop)
+    started = time.perf_counter()
+    model = SVC(**params).fit(_panel['X'][train], _panel['y'][train])
+    y_pred = model.predict(_panel['X'][test])
+    metrics = fold_metrics(_panel['y'][test], y_pred, _panel['dates'][test], _panel['forward_return'][test])
+    metrics['fit_seconds'] = time.perf_counter() - started
+    return params, fold, metrics
+
+
+def grid_search(paths, grid, folds=4, max_samples=20000, workers=None, metric='sharpe'):
+    """Walk-forward CV of every grid point across a process pool; returns results sorted best first."""
+    panel = load_panel(paths)
+    splits = walk_forward_splits(panel['dates'], folds)
+    if not splits:
+        raise ValueError("Not enough history for walk-forward cross-validation")
+    tasks = [(params, fold, split, max_samples) for params in grid_params(grid) for fold, split in enumerate(splits)]
+    by_params = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(paths,)) as pool:
+        for params, fold, metrics in pool.map(_evaluate, tasks):
+            by_params.setdefault(json.dumps(params, sort_keys=True), []).append(metrics)
+    results = []
+    for key, fold_results in by_params.items():
+        mean = {name: float(np.mean([m[name] for m in fold_results])) for name in fold_results[0]}
+        results.append({'params': json.loads(key), 'mean': mean, 'folds': fold_results})
+    results.sort(key=lambda result: result['mean'][metric], reverse=True)
+    return results
+
+
+def fit_final(paths, params, max_samples=20000):
+    from sklearn.svm import SVC
+
+    panel = load_panel(paths)
+    train = _recent(len(panel['y']), max_samples)
+    model = SVC(**params).fit(panel['X'][train], panel['y'][train])
+    model.feature_columns_ = panel['columns']  # What svm_features must build for this model
+    return model
+
+
+# ---------------- Artifacts ----------------
+def write_artifact(model_dir, model, metadata):
+    """Write ``<model_dir>/svm/<version>/model.pkl`` and ``metrics.json``; returns the version directory."""
+    version = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+    directory = os.path.join(model_dir, 'svm', version)
+    os.makedirs(directory, exist_ok=False)
+    with open(os.path.join(directory, 'model.pkl'), 'wb') as file:
+        pickle.dump(model, file)
+    with open(os.path.join(directory, 'metrics.json'), 'w') as file:
+        json.dump(dict(metadata, version=version), file, indent=2, default=str)
+    return directory
@@ -0,0 +1,70 @@
+"""Shared fixtures: synthetic daily bars served by the fixture provider and a stub LSTM.
+
+The modules live at the repository root, so it is put on ``sys.path`` as
+the benchmarks do.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_bars(days=400, seed=0, level=100.0, start='2020-01-01'):
+    """Random-walk daily OHLCV bars in the provider's column layout."""
+    rng = np.random.default_rng(seed)
+    close = level * np.cumprod(1 + rng.normal(0, 0.015, days))
+    spread = np.abs(rng.normal(0, 0.01, days)) * close
+    return pd.DataFrame({
+        'Date': pd.bdate_range(start, periods=days),
+        'Open': close * (1 + rng.normal(0, 0.005, days)),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, days).astype(np.float64),
+    })
+
+
+def write_bars(directory, symbol, bars):
+    bars.to_csv(os.path.join(directory, f"{symbol}.csv"), index=False)
+
+
+class StubLSTM:
+    """Stands in for the Keras LSTM: each row's forecast is its last scaled close, nudged up."""
+
+    def predict(self, x, **kwargs):
+        return np.asarray(x)[:, -1, :] * 1.001
+
+
+@pytest.fixture
+def bar_dir(tmp_path, monkeypatch):
+    """Directory of '<SYMBOL>.csv' bars behind ``BAR_FIXTURE_DIR``; the bar cache gets its own directory."""
+    directory = tmp_path / 'fixtures'
+    directory.mkdir()
+    monkeypatch.setenv('BAR_FIXTURE_DIR', str(directory))
+    monkeypatch.setenv('BAR_CACHE_DIR', str(tmp_path / 'bars'))
+    for name in ('RESULT_CACHE_DIR', 'METRICS_DIR', 'CHART_CACHE_DIR', 'TICK_JOURNAL_DIR', 'FEED_HUB_URL',
+                 'BAR_CACHE_SHARED', 'PROFILER_ENABLED'):
+        monkeypatch.delenv(name, raising=False)
+    return directory
+
+
+@pytest.fixture
+def stub_lstm(monkeypatch):
+    """Load ``StubLSTM`` wherever the LSTM backend would unpickle Keras."""
+    import backends
+
+    monkeypatch.setattr(backends.LSTMBackend, 'loader', lambda self, path: StubLSTM())
+
+
+@pytest.fixture
+def client(bar_dir, stub_lstm):
+    """Test client of the LSTM prediction app, with META bars and the stub model."""
+    from prediction_service import create_app
+
+    write_bars(bar_dir, 'META', synthetic_bars(days=400))
+    return create_app('lstm').test_client()
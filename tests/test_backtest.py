@@ -0,0 +1,95 @@
+"""Backtest engine: parity with the per-symbol pandas code it replaced, and the threshold sweep."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import METRICS, run_backtest, threshold_sweep
+
+COST_BPS = 5
+
+
+def panel(dates=300, symbols=4, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, (dates, symbols)), axis=0)
+    scores = rng.normal(0, 1, (dates, symbols))
+    return close, scores
+
+
+def pandas_backtest(close, signal, cost_bps=0.0, compound=False):
+    """The per-symbol strategy columns previously inlined in service2.py, plus costs, compounding and metrics."""
+    frames = []
+    for j in range(close.shape[1]):
+        df = pd.DataFrame({'Close': close[:, j], 'Predicted_Signal': signal[:, j]})
+        df['Position'] = df.Predicted_Signal.shift(1).fillna(0.0)
+        df['Return'] = df.Close.pct_change()
+        df['Strategy_Return'] = df.Return * df.Position - df.Position.diff().abs().fillna(0.0) * cost_bps / 1e4
+        if compound:
+            df['Cum_Ret'] = (1 + df.Return).cumprod() - 1
+            df['Cum_Strategy'] = (1 + df.Strategy_Return.fillna(0.0)).cumprod() - 1
+            df['Drawdown'] = (1 + df.Cum_Strategy) / (1 + df.Cum_Strategy.cummax()) - 1
+        else:
+            df['Cum_Ret'] = df['Return'].cumsum()
+            df['Cum_Strategy'] = df['Strategy_Return'].cumsum()
+            df['Drawdown'] = df.Cum_Strategy - df.Cum_Strategy.cummax().clip(lower=0)
+        frames.append(df)
+    return frames
+
+
+@pytest.mark.parametrize('compound', [False, True])
+@pytest.mark.parametrize('cost_bps', [0.0, COST_BPS])
+def test_series_match_pandas(cost_bps, compound):
+    close, scores = panel()
+    signal = (scores > 0).astype(float)
+    result = run_backtest(close, signal, cost_bps=cost_bps, compound=compound)
+    for j, df in enumerate(pandas_backtest(close, signal, cost_bps, compound)):
+        np.testing.assert_array_equal(result['positions'][:, j], df.Position)
+        np.testing.assert_allclose(result['returns'][:, j], df.Return)  # NaN on the first day in both
+        # The first day has no return: pandas keeps NaN, the engine 0
+        np.testing.assert_allclose(result['strategy_returns'][1:, j], df.Strategy_Return[1:])
+        np.testing.assert_allclose(result['cum_returns'][1:, j], df.Cum_Ret[1:])
+        np.testing.assert_allclose(result['cum_strategy'][1:, j], df.Cum_Strategy[1:])
+        np.testing.assert_allclose(result['drawdown'][1:, j], df.Drawdown[1:], atol=1e-12)
+
+
+def test_metrics_match_pandas():
+    close, scores = panel()
+    signal = (scores > 0.3).astype(float)
+    metrics = run_backtest(close, signal, cost_bps=COST_BPS)['metrics']
+    for j, df in enumerate(pandas_backtest(close, signal, COST_BPS)):
+        strategy = df.Strategy_Return[1:]
+        changes = df.Position.diff().abs().fillna(0.0)[1:]
+        assert metrics['total_return'][j] == pytest.approx(df.Cum_Strategy.iloc[-1])
+        assert metrics['max_drawdown'][j] == pytest.approx(df.Drawdown.min())
+        assert metrics['sharpe'][j] == pytest.approx(strategy.mean() / strategy.std() * np.sqrt(252))
+        assert metrics['hit_rate'][j] == pytest.approx((strategy > 0).sum() / (df.Position[1:] != 0).sum())
+        assert metrics['turnover'][j] == pytest.approx(changes.mean())
+        assert metrics['trades'][j] == (changes > 0).sum()
+
+
+def test_sweep_follows_the_threshold_order():
+    close, scores = panel()
+    thresholds = [0.5, 10.0, -1.0, 0.0, -10.0]  # Unsorted: results must come back in this order
+    sweep = threshold_sweep(close, scores, thresholds, max_elements=2 * scores.size, dtype=np.float64,
+                            cost_bps=COST_BPS)  # Chunks of two thresholds
+    for i, threshold in enumerate(thresholds):
+        expected = run_backtest(close, scores > threshold, cost_bps=COST_BPS, keep_series=False)['metrics']
+        for name in METRICS:
+            np.testing.assert_allclose(sweep[name][i], expected[name], err_msg=f"{name} at {threshold}")
+    assert sweep['trades'].shape == (len(thresholds), close.shape[1])
+
+    # Above every score: never invested; below every score: one entry, then always long
+    np.testing.assert_array_equal(sweep['trades'][1], 0)
+    np.testing.assert_array_equal(sweep['total_return'][1], 0)
+    np.testing.assert_array_equal(sweep['trades'][4], 1)
+    buy_and_hold = np.nansum(close[1:] / close[:-1] - 1, axis=0) - COST_BPS / 1e4
+    np.testing.assert_allclose(sweep['total_return'][4], buy_and_hold)
+
+
+def test_float32_sweep_close_to_float64():
+    close, scores = panel()
+    thresholds = np.linspace(-1, 1, 7)
+    single = threshold_sweep(close, scores, thresholds)
+    double = threshold_sweep(close, scores, thresholds, dtype=np.float64)
+    for name in ('total_return', 'sharpe', 'max_drawdown'):
+        np.testing.assert_allclose(single[name], double[name], rtol=1e-4, atol=1e-5)
+    np.testing.assert_array_equal(single['trades'], double['trades'])
@@ -0,0 +1,101 @@
+"""BarCache versions: a bar revised in place must change the version the result and chart caches key on."""
+import pandas as pd
+
+from bar_cache import BarCache, FixtureProvider
+from conftest import synthetic_bars, write_bars
+
+
+def test_revised_bar_changes_version(tmp_path):
+    today = pd.Timestamp.today().normalize()
+    bars = synthetic_bars(days=30)
+    bars['Date'] = pd.date_range(end=today, periods=len(bars))
+    write_bars(tmp_path, 'AAPL', bars)
+    cache = BarCache(str(tmp_path / 'cache'), provider=FixtureProvider(str(tmp_path)), refresh_interval=0)
+    end = today + pd.Timedelta(days=1)
+
+    first = cache.get('AAPL', bars['Date'].iloc[0], end)
+    version = cache.version('AAPL')
+
+    # Today's bar revised after the close: same date, same row count, new prices and volume
+    bars.loc[len(bars) - 1, ['Close', 'Volume']] = [bars['Close'].iloc[-1] * 1.01, bars['Volume'].iloc[-1] + 1000]
+    write_bars(tmp_path, 'AAPL', bars)
+    revised = cache.get('AAPL', bars['Date'].iloc[0], end)
+
+    assert len(revised) == len(first)
+    assert revised['Close'].iloc[-1] != first['Close'].iloc[-1]
+    assert cache.version('AAPL') != version
+
+
+def test_unchanged_bars_keep_version(tmp_path):
+    bars = synthetic_bars(days=30)
+    write_bars(tmp_path, 'AAPL', bars)
+    end = bars['Date'].iloc[-1] + pd.Timedelta(days=1)
+    first = BarCache(str(tmp_path / 'a'), provider=FixtureProvider(str(tmp_path)))
+    second = BarCache(str(tmp_path / 'b'), provider=FixtureProvider(str(tmp_path)))
+    first.get('AAPL', bars['Date'].iloc[0], end)
+    second.get('AAPL', bars['Date'].iloc[0], end)
+    assert first.version('AAPL') == second.version('AAPL')
+
+
+class EmptyProvider:
+    """Answers every download with an empty frame, as yfinance does when it fails."""
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, symbol, start, end):
+        self.calls.append((start, end))
+        return pd.DataFrame(columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+
+
+def covered(cache, symbol):
+    entry = cache._load(symbol)
+    return entry['covered_start'], entry['covered_end']
+
+
+def test_empty_download_is_not_cached(tmp_path):
+    cache = BarCache(str(tmp_path / 'cache'), provider=EmptyProvider())
+    assert cache.get('AAPL', '2020-01-01', '2021-01-01') is None
+    assert cache.cached('AAPL') is None
+    assert cache.stats()['download_errors'] == 1
+
+    # The next request asks the provider again instead of serving an empty history
+    assert cache.get('AAPL', '2020-01-01', '2021-01-01') is None
+    assert len(cache.provider.calls) == 2
+
+
+def test_empty_head_or_tail_serves_the_cached_bars(tmp_path):
+    bars = synthetic_bars(days=200, start='2020-01-01')
+    write_bars(tmp_path, 'AAPL', bars)
+    cache = BarCache(str(tmp_path / 'cache'), provider=FixtureProvider(str(tmp_path)))
+    start, end = bars['Date'].iloc[50], bars['Date'].iloc[150]
+    stored = cache.get('AAPL', start, end)
+    before = covered(cache, 'AAPL')
+
+    cache.provider = EmptyProvider()
+    # Head: older history than the cache holds
+    head = cache.get('AAPL', bars['Date'].iloc[0], end)
+    pd.testing.assert_frame_equal(head, stored)
+    # Tail: a past end date, so the tail would normally be downloaded on every request
+    tail = cache.get('AAPL', start, bars['Date'].iloc[-1])
+    pd.testing.assert_frame_equal(tail, stored)
+    assert covered(cache, 'AAPL') == before
+
+    # A failed tail waits refresh_interval before it is asked for again
+    calls = len(cache.provider.calls)
+    cache.get('AAPL', start, bars['Date'].iloc[-1])
+    assert len(cache.provider.calls) == calls
+
+
+def test_prediction_key_follows_the_served_bars(client):
+    # A refresh between reading the bars and keying the result must not matter:
+    # the key comes from the frame the predictions were computed from
+    app = client.application
+    refreshes = iter(range(100))
+    app.extensions['bar_cache'].version = lambda symbol: f"refreshed-{next(refreshes)}"
+    request = {"symbol": "META", "start_date": "2020-01-01", "end_date": "2022-01-01"}
+    first = client.post("/predictions", json=request)
+    second = client.post("/predictions", json=request)
+    assert first.status_code == second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert app.extensions['result_cache'].stats()['hits'] == 1
@@ -0,0 +1,76 @@
+"""PredictBatcher: batch size limit, oversize requests and stats of failed batches."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from batching import PredictBatcher
+
+
+class RecordingModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batch_rows = []
+
+    def predict(self, x):
+        self.batch_rows.append(len(x))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return x * 2
+
+
+def test_batches_never_exceed_max_batch_size():
+    model = RecordingModel()
+    batcher = PredictBatcher(model.predict, max_batch_size=10, max_wait_ms=50)
+    inputs = [np.arange(i * 100, i * 100 + 7, dtype=float) for i in range(6)]
+    results = [None] * len(inputs)
+
+    def call(i):
+        results[i] = batcher.predict(inputs[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(model.batch_rows) <= 10
+    for x, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, x * 2)
+
+
+def test_oversize_request_is_split():
+    model = RecordingModel()
+    batcher = PredictBatcher(model.predict, max_batch_size=4, max_wait_ms=1)
+    x = np.arange(11, dtype=float)
+    np.testing.assert_array_equal(batcher.predict(x), x * 2)
+    assert max(model.batch_rows) <= 4
+    assert sum(model.batch_rows) == 11
+
+
+def test_failed_batches_are_counted():
+    batcher = PredictBatcher(RecordingModel(fail=True).predict, max_batch_size=8, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.predict(np.ones(3))
+    stats = batcher.stats()
+    assert stats['batches'] == 1
+    assert stats['errors'] == 1
+    assert stats['rows'] == 3
+
+
+def test_close_scores_the_queue_and_stops_the_worker():
+    model = RecordingModel()
+    batcher = PredictBatcher(model.predict, max_batch_size=10, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher.predict, np.full(3, i, dtype=float)) for i in range(4)]
+        while batcher._worker is None:
+            time.sleep(0.001)
+        worker = batcher._worker
+        batcher.close(timeout=5)  # Requests queued before it are still scored, later ones directly
+        for i, future in enumerate(futures):
+            np.testing.assert_array_equal(future.result(5), np.full(3, 2 * i))
+    assert not worker.is_alive()
+    # A late caller is scored directly
+    np.testing.assert_array_equal(batcher.predict(np.ones(2)), np.full(2, 2.0))
@@ -0,0 +1,90 @@
+"""Charts: LTTB and min/max downsampling, and ETag revalidation of /plot_stock_data."""
+import numpy as np
+import pytest
+from flask import Flask
+
+from bar_cache import create_bar_cache
+from charts import ChartRenderer, downsample, lttb_indices, minmax_indices, register_chart_routes
+from conftest import ROOT, synthetic_bars, write_bars
+from result_cache import ResultCache
+
+
+def series(n=5000, seed=1):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), np.cumsum(rng.normal(0, 1, n))
+
+
+@pytest.mark.parametrize('threshold', [3, 10, 500, 1000])
+def test_lttb_keeps_the_endpoints_and_threshold_points(threshold):
+    x, y = series()
+    indices = lttb_indices(x, y, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x, y = series()
+    y[2345] = y.max() + 100
+    assert 2345 in lttb_indices(x, y, 100)
+
+
+def test_lttb_short_series_unchanged():
+    x, y = series(n=50)
+    np.testing.assert_array_equal(lttb_indices(x, y, 100), np.arange(50))
+
+
+def test_minmax_keeps_every_bucket_extremes():
+    _, y = series()
+    buckets = 100
+    indices = minmax_indices(y, buckets)
+    kept = set(indices.tolist())
+    assert {0, len(y) - 1} <= kept
+    assert np.all(np.diff(indices) > 0)
+    bucket = np.arange(len(y)) * buckets // len(y)
+    for b in range(buckets):
+        members = np.flatnonzero(bucket == b)
+        assert members[y[members].argmin()] in kept
+        assert members[y[members].argmax()] in kept
+    assert len(indices) <= 2 * buckets + 2
+
+
+def test_downsample_to_the_width():
+    bars = synthetic_bars(days=3000)[['Date', 'Close']]
+    assert len(downsample(bars, 800, 'lttb')) == 800
+    assert len(downsample(bars, 800, 'minmax')) <= 802
+    assert len(downsample(bars, 800, 'none')) == 3000
+
+
+class CountingRenderer(ChartRenderer):
+    def __init__(self):
+        super().__init__()
+        self.renders = 0
+
+    def render(self, *args, **kwargs):
+        self.renders += 1
+        return super().render(*args, **kwargs)
+
+
+@pytest.mark.parametrize('fmt', ['png', 'json'])
+def test_matching_etag_gets_304(bar_dir, fmt):
+    write_bars(bar_dir, 'META', synthetic_bars(days=600))
+    renderer = CountingRenderer()
+    app = Flask(__name__)
+    register_chart_routes(app, create_bar_cache(ROOT), ResultCache(), renderer)
+    client = app.test_client()
+    url = f"/plot_stock_data?symbol=META&start_date=2020-01-01&end_date=2023-01-01&format={fmt}&width=300"
+
+    first = client.get(url)
+    assert first.status_code == 200 and first.data
+    etag = first.headers['ETag']
+    second = client.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+
+    # Another size is another chart
+    other = client.get(url.replace('width=300', 'width=400'), headers={'If-None-Match': etag})
+    assert other.status_code == 200 and other.headers['ETag'] != etag
+    if fmt == 'png':
+        assert renderer.renders == 2
@@ -0,0 +1,43 @@
+"""Concurrent /predictions for many symbols: per-request scaling must not leak between requests."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import synthetic_bars, write_bars
+
+SYMBOLS = [f"SYM{i}" for i in range(12)]
+REQUESTS_PER_SYMBOL = 3
+
+
+def predictions(app, symbol):
+    response = app.test_client().post("/predictions", json={"symbol": symbol, "start_date": "2020-01-01",
+                                                            "end_date": "2022-01-01"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return json.loads(response.get_data())
+
+
+@pytest.fixture
+def universe(bar_dir):
+    # Price levels far apart, so a min/max fitted on another symbol would show in every value
+    for i, symbol in enumerate(SYMBOLS):
+        write_bars(bar_dir, symbol, synthetic_bars(days=500, seed=i, level=10.0 * 3 ** i))
+    return bar_dir
+
+
+def test_concurrent_predictions_match_serial(universe, stub_lstm, tmp_path, monkeypatch):
+    from prediction_service import create_app
+
+    serial_app = create_app('lstm')
+    expected = {symbol: predictions(serial_app, symbol) for symbol in SYMBOLS}
+
+    monkeypatch.setenv('BAR_CACHE_DIR', str(tmp_path / 'concurrent-bars'))
+    app = create_app('lstm')
+    jobs = [symbol for symbol in SYMBOLS for _ in range(REQUESTS_PER_SYMBOL)]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(lambda symbol: (symbol, predictions(app, symbol)), jobs))
+
+    for symbol, result in results:
+        assert result == expected[symbol]
+    fetched = [call[0] for call in app.extensions['bar_cache'].provider.calls]
+    assert sorted(fetched) == sorted(SYMBOLS)  # One download per symbol, however many requests wanted it
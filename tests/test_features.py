@@ -0,0 +1,68 @@
+"""Indicators: the incremental state matches a full recompute, and /features uses the /predictions range."""
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+from flask import Flask
+
+from conftest import synthetic_bars
+from features import FeatureEngine, IncrementalFeatures, register_feature_routes
+
+
+def test_incremental_matches_full_recompute_after_appends():
+    engine = FeatureEngine()
+    incremental = IncrementalFeatures(engine)
+    bars = synthetic_bars(days=300, seed=3)
+
+    # History first, then bars appended one at a time, as live bars complete
+    for stop in (120, 121, 180, 300):
+        for i in range(incremental.bars('META'), stop):
+            values = incremental.update('META', bars['High'][i], bars['Low'][i], bars['Close'][i])
+        expected = engine.frame(bars.iloc[:stop]).iloc[-1]
+        np.testing.assert_allclose([values[name] for name in engine.names], expected.to_numpy(), rtol=1e-8,
+                                   err_msg=f"after {stop} bars")
+
+
+def test_every_step_matches_its_row():
+    engine = FeatureEngine(sma_windows=(5, 10), return_lags=(1, 3))
+    incremental = IncrementalFeatures(engine)
+    bars = synthetic_bars(days=80, seed=4)
+    expected = engine.frame(bars).to_numpy()
+    steps = [incremental.update('META', h, l, c) for h, l, c in zip(bars['High'], bars['Low'], bars['Close'])]
+    np.testing.assert_allclose([[step[name] for name in engine.names] for step in steps], expected, rtol=1e-8)
+
+
+def test_peek_does_not_change_the_state():
+    engine = FeatureEngine()
+    incremental = IncrementalFeatures(engine)
+    bars = synthetic_bars(days=100, seed=5)
+    for h, l, c in zip(bars['High'][:99], bars['Low'][:99], bars['Close'][:99]):
+        incremental.update('META', h, l, c)
+    before = incremental.latest('META')
+    peeked = incremental.peek('META', bars['High'][99], bars['Low'][99], bars['Close'][99])
+    assert incremental.latest('META') == before
+    np.testing.assert_allclose([peeked[name] for name in engine.names],
+                               engine.frame(bars).iloc[-1].to_numpy(), rtol=1e-8)
+
+
+class RecordingBarCache:
+    def __init__(self, bars):
+        self.bars = bars
+        self.ranges = []
+
+    def get(self, symbol, start, end):
+        self.ranges.append((start, end))
+        return self.bars
+
+
+def test_features_default_to_the_predictions_range():
+    bar_cache = RecordingBarCache(synthetic_bars(days=60))
+    live = SimpleNamespace(features=IncrementalFeatures(), bar_aggregator=SimpleNamespace(intervals={}))
+    app = Flask(__name__)
+    register_feature_routes(app, bar_cache, live)
+
+    response = app.test_client().get("/features?symbol=META&names=rsi_14")
+    assert response.status_code == 200
+    assert list(json.loads(response.get_data())) == ['Date', 'rsi_14']
+    assert bar_cache.ranges == [('2015-01-01', str(date.today()))]
@@ -0,0 +1,68 @@
+"""FeedClient backoff: an upstream that drops every connection right away is retried less and less often."""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import websockets
+
+import feed_client
+from feed_client import FeedClient
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def rejecting_upstream():
+    """A WebSocket server that accepts and immediately closes, like an auth or rate-limit rejection."""
+    port = free_port()
+    stop = threading.Event()
+
+    async def reject(websocket):
+        await websocket.close(1008, "rejected")
+
+    async def run():
+        async with websockets.serve(reject, "127.0.0.1", port):
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    yield f"ws://127.0.0.1:{port}"
+    stop.set()
+    thread.join(5)
+
+
+def backoff_bounds(monkeypatch, url, stable_after, reconnects=6):
+    bounds = []
+    # Record the upper bound of every jittered wait and do not actually wait
+    monkeypatch.setattr(feed_client.random, 'uniform', lambda low, high: bounds.append(high) or 0.0)
+    client = FeedClient(url, ['AAPL'], backoff_base=0.01, backoff_max=60.0, stable_after=stable_after).start()
+    try:
+        wait_for(lambda: len(bounds) >= reconnects)
+    finally:
+        client.stop(timeout=5)
+    return bounds[:reconnects]
+
+
+def test_dropped_connections_back_off(monkeypatch, rejecting_upstream):
+    bounds = backoff_bounds(monkeypatch, rejecting_upstream, stable_after=10.0)
+    assert bounds == [0.01 * 2 ** attempt for attempt in range(1, 7)]
+
+
+def test_stable_connection_starts_the_backoff_over(monkeypatch, rejecting_upstream):
+    bounds = backoff_bounds(monkeypatch, rejecting_upstream, stable_after=0.0)
+    assert bounds == [0.02] * 6
@@ -0,0 +1,109 @@
+"""Feed hub replay: a worker that reconnects must not receive (and count) the trades it already has."""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from feed_hub import FeedHub
+from live_data import LiveData
+
+SYMBOL = "BINANCE:BTCUSDT"
+BASE_MS = 1_700_000_040_000  # Start of a minute
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def trade(i, volume=1.0):
+    # One trade every 10 s: six per one-minute bar
+    return {"type": "trade", "data": [{"s": SYMBOL, "p": 100.0 + i, "v": volume, "t": BASE_MS + i * 10_000}]}
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    monkeypatch.delenv('TICK_JOURNAL_DIR', raising=False)
+    # Nothing listens upstream: the test injects the "Finnhub" trades itself
+    hub = FeedHub("ws://127.0.0.1:9", [SYMBOL], report_interval=3600)
+    port = free_port()
+    stop = threading.Event()
+
+    async def run():
+        serving = asyncio.ensure_future(hub.serve("127.0.0.1", port))
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    wait_for(lambda: hub._loop is not None)
+    hub.url = f"ws://127.0.0.1:{port}"
+    yield hub
+    hub.feed.stop(timeout=1)
+    stop.set()
+    thread.join(5)
+
+
+def worker(hub):
+    live = LiveData(hub.url, [SYMBOL], hub=True)
+    live.feed.start()
+    return live
+
+
+def publish(hub, messages):
+    for message in messages:
+        hub._on_message(message)
+
+
+def volumes(live):
+    bars = live.bar_aggregator.bars(SYMBOL, '1m', include_partial=True)
+    return bars['Volume'].tolist(), bars['Trades'].tolist()
+
+
+def test_reconnected_worker_does_not_double_count(hub):
+    live = worker(hub)
+    wait_for(lambda: hub.stats()['workers'] == 1)
+    publish(hub, [trade(i) for i in range(20)])
+    wait_for(lambda: live.bar_aggregator.stats()['ticks'] == 20)
+    before = volumes(live)
+    assert sum(before[1]) == 20
+
+    # Drop the worker's connection, as a network blip would; it reconnects to the hub by itself
+    for websocket in list(hub._clients):
+        asyncio.run_coroutine_threadsafe(websocket.close(), hub._loop).result(5)
+    wait_for(lambda: live.feed.stats()['reconnects'] >= 1 and hub.stats()['workers'] == 1
+             and hub.stats()['workers_connected'] == 2)
+    # Trades that arrived while it was away are replayed once; nothing it already had comes back
+    publish(hub, [trade(20, volume=2.0)])
+    wait_for(lambda: live.bar_aggregator.stats()['ticks'] >= 21)
+    time.sleep(0.2)
+
+    after = volumes(live)
+    assert live.bar_aggregator.stats()['ticks'] == 21
+    assert live.tick_store.stats()[SYMBOL]['received'] == 21
+    assert after[0][:len(before[0]) - 1] == before[0][:-1]  # Completed bars are unchanged
+    assert sum(after[0]) == sum(before[0]) + 2.0
+    live.feed.stop(timeout=1)
+
+
+def test_new_worker_gets_full_replay(hub):
+    publish(hub, [trade(i) for i in range(10)])
+    wait_for(lambda: hub.tick_store.stats().get(SYMBOL, {}).get('received') == 10)
+    live = worker(hub)
+    wait_for(lambda: live.bar_aggregator.stats()['ticks'] == 10)
+    time.sleep(0.2)
+    assert live.tick_store.stats()[SYMBOL]['received'] == 10
+    live.feed.stop(timeout=1)
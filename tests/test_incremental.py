@@ -0,0 +1,62 @@
+"""IncrementalForecaster: incremental forecasts must equal a full recompute, also when the last bar is revised."""
+import numpy as np
+import pytest
+
+from conftest import StubLSTM, synthetic_bars
+from incremental import IncrementalForecaster
+
+
+def predict(x):
+    return StubLSTM().predict(x)
+
+
+def full_forecast(dates, closes):
+    return IncrementalForecaster(predict).forecast('key', dates, closes)
+
+
+@pytest.fixture
+def series():
+    bars = synthetic_bars(days=300, seed=3)
+    return bars['Date'].to_numpy(), bars['Close'].to_numpy()
+
+
+def test_appended_bars_match_full(series):
+    dates, closes = series
+    forecaster = IncrementalForecaster(predict)
+    forecaster.forecast('key', dates[:-5], closes[:-5])
+    predictions, training_data_len = forecaster.forecast('key', dates, closes)
+    expected, expected_len = full_forecast(dates, closes)
+    assert training_data_len == expected_len
+    np.testing.assert_allclose(predictions, expected)
+
+
+@pytest.mark.parametrize('extreme', [np.argmax, np.argmin])
+@pytest.mark.parametrize('appended', [0, 3])
+def test_last_bar_revised_inward_matches_full(series, extreme, appended):
+    dates, closes = series
+    closes = closes.copy()
+    last = len(closes) - appended - 1
+    # Make the last served close the unique high (or low) of the series
+    closes[last], closes[extreme(closes[:last + 1])] = closes[extreme(closes[:last + 1])], closes[last]
+    middle = (np.max(closes[:last + 1]) + np.min(closes[:last + 1])) / 2
+    forecaster = IncrementalForecaster(predict)
+    forecaster.forecast('key', dates[:last + 1], closes[:last + 1])
+
+    # The provider revises that bar back into the range; the true min/max shrinks
+    revised = closes.copy()
+    revised[last] = middle
+    predictions, _ = forecaster.forecast('key', dates, revised)
+    expected, _ = full_forecast(dates, revised)
+    np.testing.assert_allclose(predictions, expected)
+    assert forecaster.stats()['range_changed'] == 1
+
+
+def test_repeated_request_with_missing_last_close(series):
+    dates, closes = series
+    closes = closes.copy()
+    closes[-1] = np.nan  # e.g. today's bar before its first trade
+    forecaster = IncrementalForecaster(predict)
+    first, _ = forecaster.forecast('key', dates, closes)
+    again, _ = forecaster.forecast('key', dates, closes.copy())
+    np.testing.assert_array_equal(again, first)
+    assert forecaster.stats()['reused'] == 1
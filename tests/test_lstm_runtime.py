@@ -0,0 +1,121 @@
+"""NumpyLSTM parity: against a plain NumPy reference LSTM (always) and the pickled Keras model (with TensorFlow)."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from lstm_runtime import NumpyLSTM, export_lstm, load_lstm, npz_path, quantize_int8, sample_windows, save_layers
+from result_cache import model_identity
+
+sys.path.insert(0, os.path.join(ROOT, 'training script'))
+from export_lstm import TOLERANCE  # noqa: E402  The limits the export step itself enforces
+
+
+def layers(seed=0, go_backwards=False, activation='linear'):
+    """An LSTM(50, sequences) -> LSTM(50) -> Dense(25) -> Dense(1) stack of random weights, the notebook's shape."""
+    rng = np.random.default_rng(seed)
+    stack = []
+    for inputs, units, sequences in ((1, 50, True), (50, 50, False)):
+        stack.append({'type': 'LSTM', 'units': units, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+                      'return_sequences': sequences, 'go_backwards': go_backwards,
+                      'kernel': rng.normal(0, 0.3, (inputs, 4 * units)),
+                      'recurrent_kernel': rng.normal(0, 0.15, (units, 4 * units)),
+                      'bias': rng.normal(0, 0.1, 4 * units)})
+    for inputs, units, act in ((50, 25, activation), (25, 1, 'linear')):
+        stack.append({'type': 'Dense', 'units': units, 'activation': act,
+                      'kernel': rng.normal(0, 0.3, (inputs, units)), 'bias': rng.normal(0, 0.1, units)})
+    return stack
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def reference_predict(stack, x):
+    """Keras' LSTM equations step by step in float64, gates in Keras order (input, forget, cell, output)."""
+    out = np.asarray(x, dtype=np.float64)
+    for layer in stack:
+        if layer['type'] == 'Dense':
+            out = out @ layer['kernel'] + layer['bias']
+            out = np.maximum(out, 0.0) if layer['activation'] == 'relu' else out
+            continue
+        units = layer['units']
+        steps = out[:, ::-1] if layer['go_backwards'] else out
+        h = np.zeros((len(out), units))
+        c = np.zeros((len(out), units))
+        sequence = []
+        for t in range(steps.shape[1]):
+            z = steps[:, t] @ layer['kernel'] + h @ layer['recurrent_kernel'] + layer['bias']
+            i, f = sigmoid(z[:, :units]), sigmoid(z[:, units:2 * units])
+            g, o = np.tanh(z[:, 2 * units:3 * units]), sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            sequence.append(h)
+        out = np.stack(sequence, axis=1) if layer['return_sequences'] else h
+    return out
+
+
+@pytest.mark.parametrize('go_backwards,activation', [(False, 'linear'), (True, 'relu')])
+def test_matches_reference(tmp_path, go_backwards, activation):
+    stack = layers(go_backwards=go_backwards, activation=activation)
+    path = str(tmp_path / 'model.npz')
+    save_layers(stack, path)
+    model = NumpyLSTM.load(path)
+    x = sample_windows(300)
+    # Several internal batches, the last one partial
+    predicted = model.predict(x, batch_size=128)
+    assert predicted.shape == (300, 1) and predicted.dtype == np.float32
+    assert np.abs(predicted - reference_predict(stack, x)).max() <= TOLERANCE['float32']
+
+
+def test_int8_matches_reference_on_dequantized_weights(tmp_path):
+    stack = layers(seed=1)
+    path = str(tmp_path / 'model.npz')
+    save_layers(stack, path, quantize='int8')
+    # What the int8 export stores: the LSTM kernels rounded to one scale per output unit
+    dequantized = []
+    for layer in stack:
+        if layer['type'] == 'LSTM':
+            layer = dict(layer, **{name: np.multiply(*quantize_int8(layer[name]), dtype=np.float64)
+                                   for name in ('kernel', 'recurrent_kernel')})
+        dequantized.append(layer)
+    x = sample_windows(200)
+    predicted = NumpyLSTM.load(path).predict(x)
+    assert np.abs(predicted - reference_predict(dequantized, x)).max() <= TOLERANCE['float32']
+    assert np.abs(predicted - reference_predict(stack, x)).max() <= 5 * TOLERANCE['int8']  # Random weights, untrained
+
+
+def test_stale_export_is_not_served(tmp_path):
+    import pickle
+
+    path = str(tmp_path / 'model.pkl')
+    with open(path, 'wb') as file:
+        pickle.dump({'keras': 'stand-in'}, file)
+    save_layers(layers(), npz_path(path), source=model_identity(path))
+    assert isinstance(load_lstm(path, 'auto'), NumpyLSTM)
+
+    with open(path, 'wb') as file:
+        pickle.dump({'keras': 'retrained'}, file)
+    assert load_lstm(path, 'auto') == {'keras': 'retrained'}
+    with pytest.raises(ValueError):
+        load_lstm(path, 'numpy')
+
+
+@pytest.fixture
+def keras_model():
+    pytest.importorskip('tensorflow')
+    from model_registry import load_pickle
+
+    return load_pickle(os.path.join(ROOT, 'model', 'model.pkl'))
+
+
+@pytest.mark.parametrize('quantize', [None, 'int8'])
+def test_matches_pickled_keras_model(tmp_path, keras_model, quantize):
+    path = str(tmp_path / 'model.npz')
+    export_lstm(keras_model, path, quantize=quantize)
+    x = sample_windows(500)
+    expected = np.asarray(keras_model.predict(x, verbose=0), dtype=np.float64)
+    predicted = NumpyLSTM.load(path).predict(x).astype(np.float64)
+    assert np.abs(predicted - expected).max() <= TOLERANCE[quantize or 'float32']
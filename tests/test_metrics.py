@@ -0,0 +1,153 @@
+"""Metrics: the text exposition, the merge of worker snapshots, stage timers, /metrics and the profiler."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from flask import Flask
+
+from metrics import STAGE_SECONDS, Counter, Histogram, MetricsRegistry, render_families, stage, stats_families
+from profiler import SamplingProfiler, register_profiler_routes
+
+
+def sample(samples, name, **labels):
+    return next(value for sample_name, sample_labels, value in samples
+                if sample_name == name and all(sample_labels.get(k) == v for k, v in labels.items()))
+
+
+def test_render():
+    requests = Counter('requests_total', "Requests", ['endpoint'])
+    requests.inc('predict', amount=2)
+    requests.inc('say "hi"\n')
+    latency = Histogram('latency_seconds', "Latency", ['endpoint'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, 'predict')
+    families = [{'name': m.name, 'type': m.kind, 'help': m.help, 'samples': m.samples()} for m in (requests, latency)]
+    families += stats_families('cache', {'hits': 3, 'ready': True, 'size': None}, counters=['hits'], gauges=['ready', 'size'])
+
+    assert render_families(families).splitlines() == [
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{endpoint="predict"} 2',
+        'requests_total{endpoint="say \\"hi\\"\\n"} 1',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{endpoint="predict",le="0.1"} 1',
+        'latency_seconds_bucket{endpoint="predict",le="1"} 3',
+        'latency_seconds_bucket{endpoint="predict",le="+Inf"} 4',
+        'latency_seconds_sum{endpoint="predict"} 4.05',
+        'latency_seconds_count{endpoint="predict"} 4',
+        '# HELP cache_hits_total cache hits',
+        '# TYPE cache_hits_total counter',
+        'cache_hits_total 3',
+        '# HELP cache_ready cache ready',
+        '# TYPE cache_ready gauge',
+        'cache_ready 1',
+    ]
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_workers_are_merged(tmp_path):
+    def snapshot(requests, latencies, queue):
+        histogram = Histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+        for value in latencies:
+            histogram.observe(value)
+        return [
+            {'name': 'requests_total', 'type': 'counter', 'help': "Requests",
+             'samples': [('requests_total', {'endpoint': 'predict'}, requests)]},
+            {'name': 'latency_seconds', 'type': 'histogram', 'help': "Latency", 'samples': histogram.samples()},
+            {'name': 'queue_depth', 'type': 'gauge', 'help': "Queue", 'samples': [('queue_depth', {}, queue)]},
+        ]
+
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry._write = lambda families: None  # Only the snapshots below
+    snapshots = {os.getpid(): snapshot(2, [0.05, 0.5], 3), dead_pid(): snapshot(5, [2.0], 7)}
+    merged = {family['name']: family['samples'] for family in registry._merge(snapshots)}
+
+    assert sample(merged['requests_total'], 'requests_total', endpoint='predict') == 7
+    assert sample(merged['latency_seconds'], 'latency_seconds_bucket', le='0.1') == 1
+    assert sample(merged['latency_seconds'], 'latency_seconds_bucket', le='1') == 2
+    assert sample(merged['latency_seconds'], 'latency_seconds_bucket', le='+Inf') == 3
+    assert sample(merged['latency_seconds'], 'latency_seconds_count') == 3
+    assert sample(merged['latency_seconds'], 'latency_seconds_sum') == pytest.approx(2.55)
+    # Gauges: only live workers, labelled with their pid
+    assert merged['queue_depth'] == [('queue_depth', {'worker': str(os.getpid())}, 3)]
+
+
+def test_render_sums_the_snapshot_files(tmp_path):
+    # A worker that has exited left its snapshot; this process writes its own when rendering
+    exited = MetricsRegistry(directory=str(tmp_path))
+    exited.counter('jobs_total', "Jobs").inc(amount=4)
+    with open(tmp_path / f"{dead_pid()}.json", 'w') as file:
+        json.dump(exited.snapshot(), file)
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.counter('jobs_total', "Jobs").inc()
+    assert 'jobs_total 5' in registry.render().splitlines()
+
+
+def test_stage_timer():
+    before = sample(STAGE_SECONDS.samples(), 'prediction_stage_seconds_count', stage='unit_test') \
+        if any(labels.get('stage') == 'unit_test' for _, labels, _ in STAGE_SECONDS.samples()) else 0
+    with stage('unit_test'):
+        time.sleep(0.02)
+    with pytest.raises(ValueError):
+        with stage('unit_test'):
+            raise ValueError("a failed stage is timed too")
+    samples = STAGE_SECONDS.samples()
+    assert sample(samples, 'prediction_stage_seconds_count', stage='unit_test') == before + 2
+    assert sample(samples, 'prediction_stage_seconds_sum', stage='unit_test') >= 0.02
+
+
+def test_metrics_endpoint(client):
+    body = {"symbol": "META", "start_date": "2020-01-01", "end_date": "2022-01-01"}
+    assert client.post("/predictions", json=body).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'http_requests_total{endpoint="get_predictions_data",method="POST",status="200"} 1' in lines
+    assert any(line.startswith('prediction_stage_seconds_count{stage="predict"}') for line in lines)
+    assert any(line.startswith('predict_batcher_batches_total') for line in lines)
+    assert '# TYPE http_request_seconds histogram' in lines
+
+
+def busy(profiler, samples=5, timeout=5.0):
+    # Spin until the sampler has caught this frame a few times (it needs the GIL to take a sample)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and not any(p['samples'] >= samples for p in profiler.profiles()):
+        pass
+
+
+def test_profiled_request():
+    app = Flask(__name__)
+    profiler = SamplingProfiler(interval_ms=1)
+    register_profiler_routes(app, profiler, token='secret')
+
+    @app.route("/slow")
+    def slow():
+        busy(profiler)
+        return "done"
+
+    @app.route("/fast")
+    def fast():
+        return "done"
+
+    client = app.test_client()
+    assert 'X-Profile-Id' not in client.get("/fast", headers={'X-Profile': '1'}).headers  # Wrong token
+    response = client.get("/slow", headers={'X-Profile': 'secret'})
+    profile_id = response.headers['X-Profile-Id']
+    response.close()  # The server closes the response once the body is sent; that stops the profile
+
+    collapsed = client.get(f"/debug/profiles/{profile_id}").get_data(as_text=True)
+    assert any('busy (test_metrics.py' in line for line in collapsed.splitlines())
+    top = client.get(f"/debug/profiles/{profile_id}?format=top&n=200").get_json()  # Every frame of the stack ties on total
+    assert top['samples'] >= 5 and top['seconds'] > 0
+    assert any(entry['function'].startswith('busy (test_metrics.py') for entry in top['top'])
+    assert [profile['id'] for profile in client.get("/debug/profiles").get_json()] == [profile_id]
@@ -0,0 +1,52 @@
+"""ModelRegistry: evicted and reloaded versions release their per-model helpers."""
+import os
+
+import numpy as np
+
+from backends import LSTMBackend
+from conftest import StubLSTM
+from model_registry import ModelRegistry
+
+
+def artifacts(directory, versions):
+    default = directory / 'model.pkl'
+    default.write_bytes(b'')
+    for version in versions:
+        os.makedirs(directory / 'lstm' / version)
+        (directory / 'lstm' / version / 'model.pkl').write_bytes(b'')
+    return str(default), str(directory / 'lstm')
+
+
+def registry(tmp_path, versions, max_loaded):
+    backend = LSTMBackend()
+    default, versions_dir = artifacts(tmp_path, versions)
+    return ModelRegistry(default, versions_dir=versions_dir, setup=backend.setup, teardown=backend.teardown,
+                         max_loaded=max_loaded, loader=lambda path: StubLSTM())
+
+
+def batcher_thread(loaded):
+    batcher = loaded.extras['batcher']
+    batcher.predict(np.ones((1, 60, 1)))  # Starts the worker thread
+    return batcher._worker
+
+
+def test_evicted_version_stops_its_batcher(tmp_path):
+    models = registry(tmp_path, ['v1', 'v2'], max_loaded=2)
+    active = batcher_thread(models.get(timeout=5))
+    evicted = batcher_thread(models.get('v1', timeout=5))
+    models.get('v2', timeout=5)  # Over the limit: v1, the least recently used, goes
+
+    assert 'v1' not in models.loaded()
+    evicted.join(5)
+    assert not evicted.is_alive()
+    assert active.is_alive()
+
+
+def test_reload_stops_the_replaced_batcher(tmp_path):
+    models = registry(tmp_path, [], max_loaded=2)
+    replaced = batcher_thread(models.get(timeout=5))
+    loaded = models.activate('default', reload=True, timeout=5)
+
+    replaced.join(5)
+    assert not replaced.is_alive()
+    assert batcher_thread(loaded).is_alive()
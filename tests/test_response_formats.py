@@ -0,0 +1,129 @@
+"""Column-wise JSON encoding and response compression: the bytes must decode to what the old encoders produced."""
+import gzip
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, Response, jsonify
+
+import response_formats
+from conftest import synthetic_bars
+from response_formats import (ResponseCompressor, columnar_json, ndjson_rows, records_json, register_compression)
+from tick_broadcast import TickBroadcaster, register_stream_routes
+
+
+def frame():
+    df = synthetic_bars(days=50, seed=1)
+    df.loc[3, 'Close'] = np.nan
+    df.loc[4, 'Volume'] = np.inf
+    df['Symbol'] = 'META'
+    df.loc[5, 'Symbol'] = None
+    df['Up'] = df['Close'].diff() > 0
+    return df
+
+
+def nan_to_none(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, list):
+        return [nan_to_none(v) for v in value]
+    if isinstance(value, dict):
+        return {k: nan_to_none(v) for k, v in value.items()}
+    return value
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def encoder(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(response_formats, 'orjson', None)
+    elif response_formats.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_records_match_jsonify(encoder):
+    df = frame()
+    app = Flask(__name__)
+    with app.app_context():
+        expected = json.loads(jsonify(df.to_dict(orient="records")).get_data())
+    assert json.loads(records_json(df)) == nan_to_none(expected)
+
+
+def test_columns_round_trip(encoder):
+    df = frame()
+    decoded = json.loads(columnar_json(df))
+    assert list(decoded) == list(df.columns)
+    assert pd.to_datetime(decoded['Date']).equals(pd.DatetimeIndex(df['Date']))
+    np.testing.assert_allclose(np.array(decoded['Open'], dtype=float), df['Open'])
+    assert decoded['Close'][3] is None and decoded['Volume'][4] is None
+    assert decoded['Symbol'][5] is None and decoded['Up'] == df['Up'].tolist()
+
+
+def test_ndjson_round_trip_across_chunks(encoder):
+    df = frame()
+    body = b''.join(ndjson_rows(df, chunk_rows=7, precision=3, date_format='epoch_ms'))
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert len(rows) == len(df)
+    assert rows[10]['Date'] == int(df['Date'].iloc[10].timestamp() * 1000)
+    assert rows[10]['Open'] == round(df['Open'].iloc[10], 3)
+
+
+def compressed_app(min_bytes=1024):
+    app = Flask(__name__)
+    register_compression(app, ResponseCompressor(min_bytes=min_bytes))
+    df = frame()
+
+    @app.route("/json")
+    def large_json():
+        response = Response(records_json(df), mimetype='application/json')
+        response.set_etag('abc')
+        return response
+
+    @app.route("/small")
+    def small_json():
+        return Response(b'{"ok": true}', mimetype='application/json')
+
+    @app.route("/ndjson")
+    def streamed():
+        return Response(ndjson_rows(df, chunk_rows=5), mimetype='application/x-ndjson')
+
+    return app, df
+
+
+def test_gzip_round_trip():
+    app, df = compressed_app()
+    client = app.test_client()
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == records_json(df)
+    assert response.headers['ETag'].startswith('W/')
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    plain = client.get("/json")
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_data() == records_json(df)
+    assert 'Content-Encoding' not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streamed_responses_are_not_compressed():
+    app, df = compressed_app()
+    response = app.test_client().get("/ndjson", headers={"Accept-Encoding": "gzip"})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b''.join(ndjson_rows(df, chunk_rows=5))
+
+
+def test_event_stream_is_not_compressed():
+    app = Flask(__name__)
+    broadcaster = TickBroadcaster()
+    register_stream_routes(app, broadcaster)
+    register_compression(app, ResponseCompressor(min_bytes=0))
+    response = app.test_client().get("/stream", headers={"Accept-Encoding": "gzip"}, buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert 'Content-Encoding' not in response.headers
+    finally:
+        response.close()
+    assert broadcaster.stats()['subscribers'] == 0
@@ -0,0 +1,86 @@
+"""UniverseScorer: the process pool scores like the backend in-process, and survives model changes."""
+import os
+import shutil
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from flask import Flask
+
+from conftest import ROOT, synthetic_bars
+from scoring import UniverseScorer, create_scorer, register_scoring_routes
+
+SVM_PATH = os.path.join(ROOT, 'model', 'svm.pkl')
+
+
+@pytest.fixture
+def universe():
+    return {f"SYM{i:02d}": synthetic_bars(days=300 + 40 * i, seed=i) for i in range(12)}
+
+
+def test_pool_matches_in_process_scoring(universe):
+    from backends import create_backend
+    from model_registry import load_pickle
+
+    backend = create_backend('svm')
+    expected = backend.score_many((backend.loader or load_pickle)(SVM_PATH), list(universe.values()))
+
+    scorer = UniverseScorer('svm', workers=2)
+    try:
+        results, errors = scorer.score(SVM_PATH, universe)
+    finally:
+        scorer.close()
+    assert not errors
+    assert list(results) == list(universe)
+    assert list(results.values()) == expected
+
+
+def test_replaced_pool_finishes_its_running_jobs(universe, tmp_path):
+    old_path, new_path = str(tmp_path / 'old.pkl'), str(tmp_path / 'new.pkl')
+    shutil.copy(SVM_PATH, old_path)
+    shutil.copy(SVM_PATH, new_path)
+    scorer = UniverseScorer('svm', workers=1)
+    try:
+        old_pool = scorer._acquire(old_path)  # A job still running on the old model
+        results, _ = scorer.score(new_path, universe)
+        assert len(results) == 12
+        assert scorer.stats()['draining'] == 1
+        # The old pool still takes work for its job, then shuts down with it
+        assert old_pool.submit(os.getpid).result(60) > 0
+        scorer._release(old_pool)
+        assert scorer.stats()['draining'] == 0
+        with pytest.raises(RuntimeError):
+            old_pool.submit(os.getpid)
+    finally:
+        scorer.close()
+
+
+class FailingScorer:
+    workers = 1
+
+    def score(self, path, frames):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+
+class Models:
+    def resolve(self, version):
+        return 'v1', SVM_PATH
+
+
+def test_failed_pool_answers_503(universe):
+    app = Flask(__name__)
+    fetch_many = lambda symbols, start, end: [(s, universe[s], None) for s in symbols]
+    register_scoring_routes(app, FailingScorer(), Models(), fetch_many)
+    response = app.test_client().post("/score", json={"symbols": ["SYM00", "SYM01"]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_default_pool_size_splits_the_cores(monkeypatch):
+    monkeypatch.delenv('SCORING_WORKERS', raising=False)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    assert create_scorer('svm').workers == 2
+    monkeypatch.setenv('WEB_CONCURRENCY', '16')
+    assert create_scorer('svm').workers == 1
+    monkeypatch.setenv('SCORING_WORKERS', '3')
+    assert create_scorer('svm').workers == 3
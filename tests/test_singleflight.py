@@ -0,0 +1,122 @@
+"""SingleFlight: concurrent identical calls share one execution, its result or its error."""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import StubLSTM, synthetic_bars, write_bars
+from singleflight import CoalescedTimeout, SingleFlight
+
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn):
+    """Start CALLERS calls of ``key`` and return their futures once all of them have joined the flight."""
+    pool = ThreadPoolExecutor(max_workers=CALLERS)
+    futures = [pool.submit(flight.do, key, fn) for _ in range(CALLERS)]
+    wait_for(lambda: flight.stats()['calls'] == CALLERS)
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_callers_share_one_execution():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return object()
+
+    futures = run_concurrently(flight, 'META', fetch)
+    release.set()
+    results = [future.result(5) for future in futures]
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats['executions'], stats['coalesced'], stats['in_flight']) == (1, CALLERS - 1, 0)
+
+    # Nothing is remembered once the call is done
+    assert flight.do('META', lambda: 'again') == 'again'
+
+
+def test_callers_share_the_error():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    runs = []
+
+    def fail():
+        runs.append(1)
+        release.wait(5)
+        raise ValueError("download failed")
+
+    futures = run_concurrently(flight, 'META', fail)
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError, match="download failed"):
+            future.result(5)
+    assert len(runs) == 1
+    assert flight.stats()['errors'] == 1
+
+
+def test_distinct_keys_run_separately():
+    flight = SingleFlight('test')
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda key: flight.do(key, lambda: key.lower()), ['A', 'B', 'C', 'D']))
+    assert results == ['a', 'b', 'c', 'd']
+    assert flight.stats()['coalesced'] == 0
+
+
+def test_waiter_gives_up_but_the_call_finishes():
+    flight = SingleFlight('test', timeout=0.05)
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'META', lambda: release.wait(5) and 'bars')
+        wait_for(lambda: flight.stats()['in_flight'] == 1)
+        with pytest.raises(CoalescedTimeout):
+            flight.do('META', lambda: 'not run')
+        release.set()
+        assert leader.result(5) == 'bars'
+    assert flight.stats()['timeouts'] == 1
+
+
+class SlowStubLSTM(StubLSTM):
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, x, **kwargs):
+        self.calls += 1
+        time.sleep(0.2)  # Long enough for every concurrent request to arrive meanwhile
+        return super().predict(x, **kwargs)
+
+
+def test_identical_predictions_run_the_model_once(bar_dir, monkeypatch):
+    import backends
+    from prediction_service import create_app
+
+    model = SlowStubLSTM()
+    monkeypatch.setattr(backends.LSTMBackend, 'loader', lambda self, path: model)
+    write_bars(bar_dir, 'META', synthetic_bars(days=400))
+    app = create_app('lstm')
+    body = {"symbol": "META", "start_date": "2020-01-01", "end_date": "2022-01-01"}
+
+    def request(_):
+        response = app.test_client().post("/predictions", json=body)
+        assert response.status_code == 200
+        return json.loads(response.get_data())
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        results = list(pool.map(request, range(CALLERS)))
+    assert all(result == results[0] for result in results)
+    assert model.calls == 1
+    assert len(app.extensions['bar_cache'].provider.calls) == 1
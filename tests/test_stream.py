@@ -0,0 +1,35 @@
+"""/stream: open streams per worker are capped, and every closed stream frees its slot."""
+from flask import Flask
+
+from tick_broadcast import TickBroadcaster, register_stream_routes
+
+
+def stream_app(max_subscribers):
+    app = Flask(__name__)
+    broadcaster = TickBroadcaster(max_subscribers=max_subscribers)
+    register_stream_routes(app, broadcaster)
+    return app, broadcaster
+
+
+def test_streams_over_the_cap_get_503():
+    app, broadcaster = stream_app(max_subscribers=2)
+    client = app.test_client()
+    streams = [client.get("/stream", buffered=False) for _ in range(2)]
+    assert [stream.status_code for stream in streams] == [200, 200]
+
+    rejected = client.get("/stream")
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"]
+    assert broadcaster.stats()['rejected'] == 1
+
+    # A client that leaves, even before its first event, makes room for the next one
+    streams[0].close()
+    assert broadcaster.stats()['subscribers'] == 1
+    assert client.get("/stream", buffered=False).status_code == 200
+
+
+def test_no_cap_by_default():
+    broadcaster = TickBroadcaster()
+    subscribers = [broadcaster.subscribe() for _ in range(100)]
+    assert all(subscriber is not None for subscriber in subscribers)
+    assert broadcaster.stats()['subscribers'] == 100
@@ -0,0 +1,64 @@
+"""Walk-forward CV of the SVM: no fold may train on what it is tested on, nor on features from the future."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_bars
+from svm_pipeline import FeatureStore, INDICATOR_COLUMNS, grid_search, load_panel, svm_dataset, walk_forward_splits
+
+
+@pytest.fixture
+def panel(tmp_path):
+    # Symbols with different listing dates, so the stacked panel has uneven rows per day
+    store = FeatureStore(str(tmp_path), INDICATOR_COLUMNS)
+    paths = [store.load_or_build(f"SYM{i}", synthetic_bars(days=300 - 40 * i, seed=i, start=start))[0]
+             for i, start in enumerate(['2020-01-01', '2020-03-02', '2020-06-01'])]
+    return paths, load_panel(paths)
+
+
+@pytest.mark.parametrize('gap', [1, 3])
+def test_splits_do_not_leak(panel, gap):
+    _, data = panel
+    dates = data['dates']
+    assert np.all(np.diff(dates) >= np.timedelta64(0))
+    unique = np.unique(dates)
+    splits = walk_forward_splits(dates, folds=4, gap=gap)
+    assert len(splits) == 4
+    previous_stop = None
+    for train_stop, test_start, test_stop in splits:
+        train, test = dates[:train_stop], dates[test_start:test_stop]
+        assert len(train) and len(test)
+        # Every day of the test block, for every symbol, is after every training day ...
+        assert train.max() < test.min()
+        assert not np.isin(train, test).any()
+        # ... with the last ``gap`` days before the block left out, since their targets are the block's closes
+        first_test_day = np.searchsorted(unique, test.min())
+        assert np.searchsorted(unique, train.max()) <= first_test_day - gap - 1
+        # Test blocks follow each other without overlapping
+        if previous_stop is not None:
+            assert test_start == previous_stop
+        previous_stop = test_stop
+    assert previous_stop == len(dates)
+
+
+def test_features_only_use_past_bars():
+    bars = synthetic_bars(days=200, seed=7)
+    full = svm_dataset(bars, INDICATOR_COLUMNS)
+    cut = svm_dataset(bars.iloc[:150].copy(), INDICATOR_COLUMNS)
+    # Rows computed before the later bars existed must not change once they arrive
+    rows = len(cut['dates'])
+    np.testing.assert_array_equal(full['dates'][:rows], cut['dates'])
+    np.testing.assert_allclose(full['X'][:rows], cut['X'])
+    np.testing.assert_array_equal(full['y'][:rows], cut['y'])
+    # The target of a row is the next close
+    closes = bars.set_index('Date')['Close']
+    next_up = [closes.iloc[closes.index.get_loc(pd.Timestamp(d)) + 1] > closes[pd.Timestamp(d)] for d in full['dates']]
+    np.testing.assert_array_equal(full['y'], np.array(next_up, dtype=np.int8))
+
+
+def test_grid_search_runs_every_fold(panel):
+    paths, _ = panel
+    results = grid_search(paths, {'C': [1.0], 'gamma': ['scale']}, folds=3, max_samples=500, workers=1)
+    assert len(results) == 1
+    assert len(results[0]['folds']) == 3
+    assert 0.0 <= results[0]['mean']['accuracy'] <= 1.0
@@ -0,0 +1,123 @@
+"""Tick journal: segments round-trip, survive a torn append, and replay into the live tick store."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from tick_journal import DAY_MS, Segment, TickJournal, replay
+from tick_store import TickStore
+
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+from replay_ticks import replay_in_process  # noqa: E402
+
+START = 1731542400000  # 2024-11-14 00:00 UTC
+
+
+def trade_messages(count=40, seed=0):
+    """Trade messages over two days for two symbols, 1 to 3 trades each, some arriving late."""
+    rng = np.random.default_rng(seed)
+    messages, t = [], START + DAY_MS - 10 * 60_000
+    for _ in range(count):
+        t += int(rng.integers(1, 60_000))
+        trades = [{"p": float(rng.uniform(90, 110)), "s": str(rng.choice(['AAPL', 'BINANCE:BTCUSDT'])),
+                   "t": t - int(rng.integers(0, 2_000)), "v": float(rng.integers(1, 100))}
+                  for _ in range(int(rng.integers(1, 4)))]
+        messages.append({"type": "trade", "data": trades})
+    return messages
+
+
+def by_symbol(messages):
+    # A replayed message lists its trades symbol by symbol, each symbol's in arrival order
+    return [{"type": m["type"], "data": sorted(m["data"], key=lambda trade: trade["s"])} for m in messages]
+
+
+def record(root, messages, **kwargs):
+    journal = TickJournal(str(root), **kwargs)
+    for message in messages:
+        journal.append(message)
+    journal.flush()
+    return journal
+
+
+def test_append_flush_read_round_trip(tmp_path):
+    messages = trade_messages()
+    writer = record(tmp_path, messages, segment_rows=16)  # Small segments: several parts per day
+    reader = TickJournal(str(tmp_path), record=False)
+
+    assert sorted(reader.symbols()) == ['AAPL', 'BINANCE:BTCUSDT']
+    assert reader.days('AAPL') == ['20241114', '20241115']
+    for symbol in reader.symbols():
+        trades = [trade for message in messages for trade in message["data"] if trade["s"] == symbol]
+        rows = reader.read(symbol)
+        assert rows['t'].tolist() == [trade["t"] for trade in trades]
+        assert rows['p'].tolist() == [trade["p"] for trade in trades]
+        assert rows['v'].tolist() == [trade["v"] for trade in trades]
+        # A time-range read keeps the trades in [start, end), still in arrival order
+        low, high = START + DAY_MS - 5 * 60_000, START + DAY_MS + 5 * 60_000
+        ticks = reader.between(symbol, low, high)
+        assert ticks["t"] == [trade["t"] for trade in trades if low <= trade["t"] < high]
+
+    # Messages come back as they were received
+    assert [message for _, message in reader.messages()] == by_symbol(messages)
+    assert writer.stats()['ticks'] == sum(len(message["data"]) for message in messages)
+    writer.close()
+
+
+def test_reopened_segment_ignores_a_torn_append(tmp_path):
+    path = str(tmp_path / 'segment.ticks')
+    segment = Segment(path, 'r+', 'AAPL', capacity=32, block_rows=4)
+    for i, t in enumerate([100, 105, 110, 120, 130, 140]):  # Ends mid-block
+        segment.append(t, 1.0 + i, 10.0, i)
+    segment.rows[6] = (999, 9.0, 9.0, 6)  # Written, but the process died before the count moved
+    segment.close()
+
+    segment = Segment(path, 'r+')
+    assert segment.count == 6
+    assert segment.read()['t'].tolist() == [100, 105, 110, 120, 130, 140]
+    # Appending overwrites the torn row and keeps the running min/max of the open block
+    segment.append(125, 7.0, 10.0, 6)
+    segment.append(150, 8.0, 10.0, 7)
+    assert segment.read()['t'].tolist() == [100, 105, 110, 120, 130, 140, 125, 150]
+    assert segment.read(121, 126)['t'].tolist() == [125]
+    assert segment.read(126, 135)['t'].tolist() == [130]
+    segment.close()
+
+
+def test_journal_continues_after_reopen(tmp_path):
+    messages = trade_messages()
+    record(tmp_path, messages[:20]).close()
+    record(tmp_path, messages[20:]).close()
+    reader = TickJournal(str(tmp_path), record=False)
+    assert [message for _, message in reader.messages()] == by_symbol(messages)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    messages = trade_messages()
+    record(tmp_path, messages).close()
+    return TickJournal(str(tmp_path), record=False), messages
+
+
+def test_replay_fills_a_tick_store(journal):
+    journal, messages = journal
+    live, recorded = TickStore(), TickStore()
+    for message in messages:
+        live.ingest(message)
+    stats = replay(journal.messages(), recorded.ingest, speed=0)
+
+    assert stats['messages'] == len(messages)
+    assert stats['ticks'] == sum(len(message["data"]) for message in messages)
+    for symbol in live.symbols():
+        assert recorded.between(symbol) == live.between(symbol)
+
+
+def test_replay_ticks_tool_matches_live_ingest(journal):
+    journal, messages = journal
+    live = TickStore()
+    for message in messages:
+        live.ingest(message)
+    report = replay_in_process(journal.messages(), speed=0)
+    assert report['messages'] == len(messages)
+    assert report['symbols'] == live.stats()
@@ -0,0 +1,156 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+class Subscriber:
+    """One push client: a bounded queue of serialized events and an optional symbol filter."""
+
+    def __init__(self, symbols=None, maxsize=1000):
+        self.symbols = frozenset(symbols) if symbols else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, event):
+        """Queue ``event``; when full, drop the oldest queued event (slow consumer)."""
+        try:
+            self.queue.put_nowait(event)
+            return
+        except queue.Full:
+            pass
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.dropped += 1
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TickBroadcaster:
+    """Fan out trades from the single upstream WebSocket to many push subscribers.
+
+    Each message is serialized once per symbol, not once per subscriber.  A
+    subscriber that falls ``max_dropped`` events behind is disconnected.
+    With ``max_subscribers`` set, ``subscribe`` returns None once that many
+    are connected: under a threaded server every open stream holds a request
+    thread, and the other routes need some left.
+    """
+
+    def __init__(self, queue_size=1000, max_dropped=10000, max_subscribers=None):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped': 0, 'disconnected': 0, 'rejected': 0}
+
+    def subscribe(self, symbols=None):
+        """A new subscriber, or None when ``max_subscribers`` are already connected."""
+        subscriber = Subscriber(symbols, self.queue_size)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, parsed_message):
+        trades = parsed_message.get("data")
+        if parsed_message.get("type") != "trade" or not trades:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+
+        by_symbol = {}
+        for trade in trades:
+            by_symbol.setdefault(trade["s"], []).append(
+                {"s": trade["s"], "p": trade["p"], "t": trade["t"], "v": trade.get("v")})
+        events = {symbol: json.dumps({"type": "trade", "data": rows}) for symbol, rows in by_symbol.items()}
+        everything = None
+
+        delivered = dropped = 0
+        slow = []
+        for subscriber in subscribers:
+            before = subscriber.dropped
+            if subscriber.symbols is None:
+                if everything is None:
+                    everything = json.dumps({"type": "trade", "data": [row for rows in by_symbol.values() for row in rows]})
+                subscriber.offer(everything)
+                delivered += 1
+            else:
+                for symbol in subscriber.symbols.intersection(events):
+                    subscriber.offer(events[symbol])
+                    delivered += 1
+            dropped += subscriber.dropped - before
+            if subscriber.dropped > self.max_dropped:
+                slow.append(subscriber)
+
+        for subscriber in slow:
+            self.unsubscribe(subscriber)
+        with self._lock:
+            self._stats['published'] += 1
+            self._stats['delivered'] += delivered
+            self._stats['dropped'] += dropped
+            self._stats['disconnected'] += len(slow)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+        return stats
+
+
+def sse_events(broadcaster, subscriber, heartbeat=15.0):
+    """Server-Sent Events stream for one subscriber; ends when it is disconnected."""
+    try:
+        yield "retry: 3000\n\n"
+        while not subscriber.closed:
+            try:
+                event = subscriber.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield f": keep-alive {int(time.time())}\n\n"
+                continue
+            yield f"event: trade\ndata: {event}\n\n"
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+def register_stream_routes(app, broadcaster):
+    """GET /stream[?symbols=A,B]: live trades pushed as Server-Sent Events (503 when the worker is full)."""
+    from flask import Response, jsonify, request
+
+    @app.route("/stream", methods=["GET"])
+    def stream_ticks():
+        symbols = [s for s in request.args.get("symbols", "").split(",") if s]
+        subscriber = broadcaster.subscribe(symbols or None)
+        if subscriber is None:
+            response = jsonify({"error": "Too many open streams on this worker, retry later"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        response = Response(sse_events(broadcaster, subscriber), mimetype="text/event-stream", headers=headers)
+        # Also frees the slot of a client that goes away before the first event (the generator never ran)
+        response.call_on_close(lambda: broadcaster.unsubscribe(subscriber))
+        return response
+
+
+def create_broadcaster():
+    return TickBroadcaster(
+        queue_size=int(os.environ.get('STREAM_QUEUE_SIZE', 1000)),
+        max_dropped=int(os.environ.get('STREAM_MAX_DROPPED', 10000)),
+        max_subscribers=int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 0)) or None,  # gunicorn.conf.py sets it per worker
+    )
@@ -0,0 +1,369 @@
+"""Append-only tick journal: every trade the feed receives, kept on disk for backtests and replays.
+
+One directory per symbol and one segment file per UTC day of the trade time,
+``<root>/<symbol>/<YYYYMMDD>-<part>.ticks`` (a new part starts when a segment
+is full).  A segment is memory-mapped and preallocated (sparse until written):
+
+* a header, with the number of committed rows
+* a block index: the min and max trade time of every ``BLOCK_ROWS`` rows
+* fixed-size records: trade time (ms), price, volume and receive time (us)
+
+A time-range read picks segments by their day and blocks by the index, and
+only touches those pages.  Trades of one WebSocket message share a receive
+time (strictly increasing per writer), so ``messages`` rebuilds the messages
+in arrival order and ``replay`` feeds them to a handler at their recorded
+pace or faster (see tools/replay_ticks.py).
+
+Any process can read a journal while it is written; one process writes it:
+the first to append holds an flock on ``.writer.lock``, the others skip
+recording and retry now and then, in case the writer went away.
+"""
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no writer lock, run one recording process
+    fcntl = None
+
+MAGIC = b'TICKJRNL'
+FORMAT_VERSION = 1
+DAY_MS = 24 * 60 * 60 * 1000
+BLOCK_ROWS = 1024  # Rows per block index entry
+SEGMENT_ROWS = 1 << 20  # Rows per segment file (32 MB of records, allocated as they are written)
+HEADER = np.dtype([('magic', 'S8'), ('version', '<i4'), ('block_rows', '<i4'), ('capacity', '<i8'),
+                   ('count', '<i8'), ('symbol', 'S64'), ('reserved', 'V32')])
+BLOCK = np.dtype([('min', '<i8'), ('max', '<i8')])
+TICK = np.dtype([('t', '<i8'), ('p', '<f8'), ('v', '<f8'), ('r', '<i8')])  # trade ms, price, volume, receive us
+
+
+def _day(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp // DAY_MS * 86400, tz=datetime.timezone.utc).strftime('%Y%m%d')
+
+
+def _day_start(day):
+    return int(datetime.datetime.strptime(day, '%Y%m%d').replace(tzinfo=datetime.timezone.utc).timestamp()) * 1000
+
+
+class Segment:
+    """One memory-mapped segment file; ``mode='r+'`` appends, ``'r'`` reads what is committed."""
+
+    def __init__(self, path, mode='r', symbol=None, capacity=SEGMENT_ROWS, block_rows=BLOCK_ROWS):
+        if not os.path.exists(path):
+            if mode == 'r':
+                raise FileNotFoundError(path)
+            blocks = -(-capacity // block_rows)
+            with open(path, 'wb') as file:
+                file.truncate(HEADER.itemsize + blocks * BLOCK.itemsize + capacity * TICK.itemsize)
+                header = np.zeros(1, dtype=HEADER)
+                header[0] = (MAGIC, FORMAT_VERSION, block_rows, capacity, 0, symbol.encode(), b'')
+                file.write(header.tobytes())
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode=mode)
+        self.header = self._map[:HEADER.itemsize].view(HEADER)
+        if self.header['magic'][0] != MAGIC or self.header['version'][0] != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} tick journal segment")
+        self.symbol = self.header['symbol'][0].decode()
+        self.capacity = int(self.header['capacity'][0])
+        self.block_rows = int(self.header['block_rows'][0])
+        offset = HEADER.itemsize + -(-self.capacity // self.block_rows) * BLOCK.itemsize
+        self.blocks = self._map[HEADER.itemsize:offset].view(BLOCK)
+        self.rows = self._map[offset:offset + self.capacity * TICK.itemsize].view(TICK)
+        self.count = int(self.header['count'][0])
+        # Field views, so an append is a few scalar stores rather than record assignments
+        self._count = self.header['count']
+        self._block_min, self._block_max = self.blocks['min'], self.blocks['max']
+        if self.count % self.block_rows:  # Reopened mid-block: continue its running min and max
+            block = self.count // self.block_rows
+            self._low, self._high = int(self._block_min[block]), int(self._block_max[block])
+
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, timestamp, price, volume, received):
+        """Write one row; it is visible to readers once the header count moves past it."""
+        i = self.count
+        self.rows[i] = (timestamp, price, volume, received)
+        block = i // self.block_rows
+        if i % self.block_rows == 0:
+            self._low = self._high = self._block_min[block] = self._block_max[block] = timestamp
+        elif timestamp < self._low:
+            self._low = self._block_min[block] = timestamp
+        elif timestamp > self._high:
+            self._high = self._block_max[block] = timestamp
+        self.count = i + 1
+        self._count[0] = self.count
+
+    def read(self, start=None, end=None):
+        """Committed rows with ``start <= t < end`` (ms), in append order, as a copy."""
+        count = int(self.header['count'][0])
+        blocks = self.blocks[:-(-count // self.block_rows)]
+        keep = np.ones(len(blocks), dtype=bool)
+        if start is not None:
+            keep &= blocks['max'] >= start
+        if end is not None:
+            keep &= blocks['min'] < end
+        if keep.all():
+            rows = np.array(self.rows[:count])
+        else:
+            # Copy only the runs of blocks that can hold rows in range
+            kept = np.flatnonzero(keep)
+            runs = np.split(kept, np.flatnonzero(np.diff(kept) != 1) + 1) if len(kept) else []
+            rows = np.concatenate([self.rows[run[0] * self.block_rows:min((run[-1] + 1) * self.block_rows, count)]
+                                   for run in runs] or [np.empty(0, dtype=TICK)])
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= rows['t'] >= start
+        if end is not None:
+            mask &= rows['t'] < end
+        return rows if mask.all() else rows[mask]
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        if self._map.mode != 'r':
+            self._map.flush()
+        self.header = self.blocks = self.rows = self._map = self._count = self._block_min = self._block_max = None
+
+
+class TickJournal:
+    """The journal under ``root`` (see the module docstring); ``record=False`` opens it for reading only."""
+
+    def __init__(self, root, record=True, segment_rows=SEGMENT_ROWS, retention_days=0, lock_retry=10.0):
+        self.root = root
+        self.record = record
+        self.segment_rows = segment_rows
+        self.retention_days = retention_days  # 0 keeps every day
+        self.lock_retry = lock_retry
+        self._writers = {}  # (symbol, day number since the epoch) -> Segment being appended to
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._lock_tried = None
+        self._last_received = 0
+        self._stats = {'messages': 0, 'ticks': 0, 'segments_opened': 0, 'pruned': 0, 'skipped': 0}
+
+    # ---- writing ----
+    def append(self, parsed_message):
+        """Record every trade of a parsed Finnhub message; returns the number of ticks written."""
+        trades = parsed_message.get("data")
+        if parsed_message.get("type") != "trade" or not trades or not self.record:
+            return 0
+        with self._lock:
+            if not self._writer():
+                self._stats['skipped'] += len(trades)
+                return 0
+            received = max(time.time_ns() // 1000, self._last_received + 1)
+            self._last_received = received
+            for trade in trades:
+                timestamp = trade["t"]
+                self._segment(trade["s"], timestamp).append(timestamp, trade["p"], trade.get("v", 0.0), received)
+            self._stats['messages'] += 1
+            self._stats['ticks'] += len(trades)
+        return len(trades)
+
+    def _writer(self):
+        # Whether this process holds the writer lock; retried every lock_retry seconds while another one does
+        if self._lock_file is not None:
+            return True
+        now = time.monotonic()
+        if self._lock_tried is not None and now - self._lock_tried < self.lock_retry:
+            return False
+        self._lock_tried = now
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, '.writer.lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+        return True
+
+    def _segment(self, symbol, timestamp):
+        number = timestamp // DAY_MS
+        segment = self._writers.get((symbol, number))
+        if segment is not None and not segment.full():
+            return segment
+        if segment is None:
+            self._roll(symbol, number)
+        day = _day(timestamp)
+        directory = self._directory(symbol)
+        os.makedirs(directory, exist_ok=True)
+        parts = [name for name in os.listdir(directory) if name.startswith(day + '-') and name.endswith('.ticks')]
+        part = max((int(name[9:-6]) for name in parts), default=0)
+        if segment is not None:  # Full: continue in the next part
+            segment.close()
+            part += 1
+        segment = Segment(os.path.join(directory, f"{day}-{part:03d}.ticks"), 'r+', symbol, self.segment_rows)
+        if segment.full():
+            segment.close()
+            segment = Segment(os.path.join(directory, f"{day}-{part + 1:03d}.ticks"), 'r+', symbol, self.segment_rows)
+        self._writers[(symbol, number)] = segment
+        self._stats['segments_opened'] += 1
+        return segment
+
+    def _roll(self, symbol, number):
+        # A new day for this symbol: close its segments older than the day before (late trades may still
+        # land in yesterday's) and drop days past the retention
+        for key in [key for key in self._writers if key[0] == symbol and key[1] < number - 1]:
+            self._writers.pop(key).close()
+        if self.retention_days:
+            cutoff = _day((number - self.retention_days) * DAY_MS)
+            for path in self._paths(symbol):
+                if os.path.basename(path)[:8] < cutoff:
+                    os.remove(path)
+                    self._stats['pruned'] += 1
+
+    def flush(self):
+        """Write dirty pages back to the files (a crashed process loses nothing anyway; a crashed host might)."""
+        with self._lock:
+            for segment in self._writers.values():
+                segment.flush()
+
+    def close(self):
+        with self._lock:
+            for segment in self._writers.values():
+                segment.close()
+            self._writers.clear()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # ---- reading ----
+    def _directory(self, symbol):
+        return os.path.join(self.root, symbol.replace('/', '_').replace(':', '_'))
+
+    def _paths(self, symbol, start=None, end=None):
+        # Segment files of the symbol whose day overlaps [start, end), in day and part order
+        directory = self._directory(symbol)
+        if not os.path.isdir(directory):
+            return []
+        first = _day(start) if start is not None else None
+        last = _day(end - 1) if end is not None else None
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith('.ticks') and (first is None or name[:8] >= first) and (last is None or name[:8] <= last)]
+
+    def symbols(self):
+        """Recorded symbols, as they were received."""
+        symbols = []
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                paths = [entry for entry in sorted(os.listdir(os.path.join(self.root, name))) if entry.endswith('.ticks')] \
+                    if os.path.isdir(os.path.join(self.root, name)) else []
+                if paths:
+                    symbols.append(Segment(os.path.join(self.root, name, paths[0])).symbol)
+        return symbols
+
+    def days(self, symbol):
+        return sorted({os.path.basename(path)[:8] for path in self._paths(symbol)})
+
+    def read(self, symbol, start=None, end=None):
+        """Rows (``TICK`` records) of ``symbol`` with ``start <= t < end`` (ms), in arrival order."""
+        pieces = [Segment(path).read(start, end) for path in self._paths(symbol, start, end)]
+        rows = np.concatenate(pieces) if pieces else np.empty(0, dtype=TICK)
+        # Late trades sit in the segment of their own day; the receive time restores arrival order
+        return rows[np.argsort(rows['r'], kind='stable')]
+
+    def between(self, symbol, start=None, end=None):
+        """Like ``TickStore.between``, from the journal: column-oriented ticks, or None for an unknown symbol."""
+        from tick_store import ticks_dict
+
+        if not self._paths(symbol):
+            return None
+        rows = self.read(symbol, start, end)
+        return ticks_dict(symbol, rows['p'], rows['v'], rows['t'])
+
+    def messages(self, symbols=None, start=None, end=None):
+        """``(receive time in us, parsed trade message)`` of the recorded ticks, in arrival order.
+
+        Trades received together come back as one message, with every symbol
+        in it.  Works a day of segments at a time, so memory stays bounded.
+        """
+        symbols = self.symbols() if symbols is None else list(symbols)
+        days = sorted({day for symbol in symbols for day in self.days(symbol)
+                       if (start is None or _day_start(day) + DAY_MS > start) and (end is None or _day_start(day) < end)})
+        for day in days:
+            low = _day_start(day) if start is None else max(start, _day_start(day))
+            high = _day_start(day) + DAY_MS if end is None else min(end, _day_start(day) + DAY_MS)
+            pieces = [(symbol, self.read(symbol, low, high)) for symbol in symbols]
+            pieces = [(symbol, rows) for symbol, rows in pieces if len(rows)]
+            if not pieces:
+                continue
+            rows = np.concatenate([rows for _, rows in pieces])
+            names = np.repeat(np.arange(len(pieces)), [len(rows) for _, rows in pieces])
+            order = np.argsort(rows['r'], kind='stable')
+            rows, names = rows[order], names[order]
+            bounds = np.flatnonzero(np.diff(rows['r'])) + 1
+            timestamps, prices, volumes = rows['t'].tolist(), rows['p'].tolist(), rows['v'].tolist()
+            for first, stop in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(rows)].tolist()):
+                yield int(rows['r'][first]), {"type": "trade", "data": [
+                    {"p": prices[i], "s": pieces[names[i]][0], "t": timestamps[i], "v": volumes[i]} for i in range(first, stop)]}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['writer'] = self._lock_file is not None
+            stats['open_segments'] = len(self._writers)
+        return stats
+
+
+def replay(messages, handler, speed=1.0):
+    """Call ``handler(message)`` for each ``(receive time in us, message)``, spaced as recorded / ``speed``.
+
+    ``speed=0`` replays as fast as the handler goes.  Returns counts, the wall
+    time, and how far the handler fell behind the recorded schedule.
+    """
+    stats = {'messages': 0, 'ticks': 0, 'seconds': 0.0, 'max_behind_ms': 0.0}
+    started = first = None
+    for received, message in messages:
+        now = time.perf_counter()
+        if started is None:
+            started, first = now, received
+        if speed:
+            due = started + (received - first) / 1e6 / speed
+            if due > now:
+                time.sleep(due - now)
+            else:
+                stats['max_behind_ms'] = max(stats['max_behind_ms'], (now - due) * 1000)
+        handler(message)
+        stats['messages'] += 1
+        stats['ticks'] += len(message["data"])
+    if started is not None:
+        stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def register_journal_routes(app, journal):
+    """GET /ticks/history?symbol=...&start=...&end=... (epoch ms): recorded ticks from the journal."""
+    from flask import jsonify, request
+
+    @app.route("/ticks/history", methods=["GET"])
+    def get_tick_history():
+        symbol = request.args.get("symbol")
+        start = request.args.get("start", type=int)
+        end = request.args.get("end", type=int)
+        if not symbol or start is None or end is None:
+            return jsonify({"error": "'symbol', 'start' and 'end' are required"}), 400
+        ticks = journal.between(symbol, start, end)
+        if ticks is None:
+            return jsonify({"error": f"No recorded ticks for {symbol}"}), 404
+        return jsonify(ticks)
+
+
+def create_tick_journal(record=True):
+    """The journal in ``TICK_JOURNAL_DIR``, or None when it is not set (ticks are then not persisted)."""
+    root = os.environ.get('TICK_JOURNAL_DIR')
+    if not root:
+        return None
+    return TickJournal(
+        root,
+        record=record,
+        segment_rows=int(os.environ.get('TICK_JOURNAL_SEGMENT_ROWS', SEGMENT_ROWS)),
+        retention_days=int(os.environ.get('TICK_JOURNAL_RETENTION_DAYS', 0)),
+    )
@@ -0,0 +1,148 @@
+import os
+import threading
+
+import numpy as np
+
+
+class TickRing:
+    """Fixed-size ring of the most recent ticks of one symbol, stored column-wise."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.timestamp = np.zeros(capacity, dtype=np.int64)  # milliseconds since epoch, as sent by Finnhub
+        self.next = 0  # slot the next tick is written to
+        self.count = 0
+        self.total = 0  # ticks ever appended, including overwritten ones
+
+    def append(self, price, volume, timestamp):
+        i = self.next
+        self.price[i] = price
+        self.volume[i] = volume
+        self.timestamp[i] = timestamp
+        self.next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def _indices(self, n):
+        # Slots of the last n ticks, oldest first
+        return (self.next - n + np.arange(n)) % self.capacity
+
+    def latest(self):
+        if not self.count:
+            return None
+        i = (self.next - 1) % self.capacity
+        return float(self.price[i]), float(self.volume[i]), int(self.timestamp[i])
+
+    def last(self, n):
+        """Arrays (price, volume, timestamp) of the last ``n`` ticks, oldest first."""
+        idx = self._indices(min(n, self.count))
+        return self.price[idx], self.volume[idx], self.timestamp[idx]
+
+    def between(self, start=None, end=None):
+        """Ticks with ``start <= timestamp < end`` (milliseconds), in arrival order."""
+        price, volume, timestamp = self.last(self.count)
+        mask = np.ones(len(timestamp), dtype=bool)
+        if start is not None:
+            mask &= timestamp >= start
+        if end is not None:
+            mask &= timestamp < end
+        return price[mask], volume[mask], timestamp[mask]
+
+
+class TickStore:
+    """Per-symbol tick rings fed straight from Finnhub trade messages."""
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, parsed_message):
+        """Append every trade of a parsed WebSocket message; returns the number of ticks stored."""
+        trades = parsed_message.get("data")
+        if parsed_message.get("type") != "trade" or not trades:
+            return 0
+        with self._lock:
+            for trade in trades:
+                ring = self._rings.get(trade["s"])
+                if ring is None:
+                    ring = self._rings[trade["s"]] = TickRing(self.capacity)
+                ring.append(trade["p"], trade.get("v", 0.0), trade["t"])
+        return len(trades)
+
+    def append(self, symbol, price, volume, timestamp):
+        with self._lock:
+            ring = self._rings.get(symbol)
+            if ring is None:
+                ring = self._rings[symbol] = TickRing(self.capacity)
+            ring.append(price, volume, timestamp)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._rings)
+
+    def latest(self):
+        """Latest tick of every symbol, as ``{symbol: {"p", "v", "t"}}``."""
+        with self._lock:
+            latest = [(symbol, ring.latest()) for symbol, ring in self._rings.items()]
+        return {symbol: {"p": tick[0], "v": tick[1], "t": tick[2]} for symbol, tick in latest if tick is not None}
+
+    def newest_times(self):
+        """Time of the newest buffered tick of every symbol (trades can arrive out of order)."""
+        with self._lock:
+            return {symbol: int(ring.timestamp[:ring.count].max()) for symbol, ring in self._rings.items() if ring.count}
+
+    def last(self, symbol, n):
+        with self._lock:
+            ring = self._rings.get(symbol)
+            if ring is None:
+                return None
+            return ticks_dict(symbol, *ring.last(n))
+
+    def between(self, symbol, start=None, end=None):
+        with self._lock:
+            ring = self._rings.get(symbol)
+            if ring is None:
+                return None
+            return ticks_dict(symbol, *ring.between(start, end))
+
+    def stats(self):
+        with self._lock:
+            return {symbol: {"buffered": ring.count, "received": ring.total} for symbol, ring in self._rings.items()}
+
+
+def ticks_dict(symbol, price, volume, timestamp):
+    """Column-oriented JSON body for a run of ticks."""
+    return {"symbol": symbol, "p": price.tolist(), "v": volume.tolist(), "t": timestamp.tolist()}
+
+
+def register_tick_routes(app, store):
+    """GET /ticks/latest and GET /ticks?symbol=...&n=... or &start=...&end=... (epoch ms)."""
+    from flask import jsonify, request
+
+    @app.route("/ticks/latest", methods=["GET"])
+    def get_latest_ticks():
+        return jsonify(store.latest())
+
+    @app.route("/ticks", methods=["GET"])
+    def get_ticks():
+        symbol = request.args.get("symbol")
+        if not symbol:
+            return jsonify({"error": "'symbol' is required"}), 400
+        start = request.args.get("start", type=int)
+        end = request.args.get("end", type=int)
+        n = request.args.get("n", default=100, type=int)
+        if start is not None or end is not None:
+            ticks = store.between(symbol, start, end)
+        else:
+            ticks = store.last(symbol, max(n, 0))
+        if ticks is None:
+            return jsonify({"error": f"No ticks for {symbol}"}), 404
+        return jsonify(ticks)
+
+
+def create_tick_store():
+    return TickStore(capacity=int(os.environ.get('TICK_BUFFER_SIZE', 10000)))
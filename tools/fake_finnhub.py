@@ -0,0 +1,208 @@
+"""Local stand-in for the Finnhub trade WebSocket, for tests and benchmarks.
+
+Speaks just enough of RFC 6455 (handshake, text/close/ping frames) for
+websocket-client and browsers.  Clients send the usual
+``{"type":"subscribe","symbol":...}`` messages and receive random-walk
+trades for their symbols, or a recorded NDJSON file replayed verbatim.
+
+    python tools/fake_finnhub.py --port 8765 --rate 100
+    FINNHUB_WS_URL=ws://127.0.0.1:8765 flask --app service.py run
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode_frame(payload, opcode=0x1):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _read_exact(sock_file, n):
+    data = sock_file.read(n)
+    if data is None or len(data) < n:
+        raise ConnectionError("client went away")
+    return data
+
+
+def read_frame(sock_file):
+    """Return ``(opcode, payload)`` of the next (masked) client frame."""
+    b0, b1 = _read_exact(sock_file, 2)
+    length = b1 & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _read_exact(sock_file, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _read_exact(sock_file, 8))[0]
+    mask = _read_exact(sock_file, 4) if b1 & 0x80 else b"\0\0\0\0"
+    payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(_read_exact(sock_file, length)))
+    return b0 & 0x0F, payload
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return
+        accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        client = {"symbols": set(), "lock": threading.Lock(), "alive": True}
+        with server.clients_lock:
+            server.clients.append((self, client))
+        sender = threading.Thread(target=server.feed, args=(self, client), daemon=True)
+        sender.start()
+        try:
+            while client["alive"]:
+                opcode, payload = read_frame(self.rfile)
+                if opcode == 0x8:  # close
+                    self.send(client, b"", opcode=0x8)
+                    break
+                if opcode == 0x9:  # ping
+                    self.send(client, payload, opcode=0xA)
+                    continue
+                if opcode == 0x1:
+                    server.on_client_message(client, json.loads(payload))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            client["alive"] = False
+            with server.clients_lock:
+                server.clients = [c for c in server.clients if c[1] is not client]
+
+    def send(self, client, payload, opcode=0x1):
+        with client["lock"]:
+            self.wfile.write(encode_frame(payload, opcode))
+            self.wfile.flush()
+
+
+class FakeFinnhubServer(socketserver.ThreadingTCPServer):
+    """Threaded fake feed; ``port=0`` picks a free port, see ``url``."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, rate=50.0, messages=None, loop=True, delays=None):
+        super().__init__((host, port), _Handler)
+        self.rate = rate  # messages per second per client
+        self.messages = messages  # recorded raw messages to replay instead of random trades
+        self.delays = delays  # seconds to wait after each recorded message (default: 1 / rate)
+        self.loop = loop
+        self.clients = []
+        self.clients_lock = threading.Lock()
+        self.prices = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    def on_client_message(self, client, message):
+        if message.get("type") == "subscribe":
+            client["symbols"].add(message.get("symbol"))
+        elif message.get("type") == "unsubscribe":
+            client["symbols"].discard(message.get("symbol"))
+
+    def feed(self, handler, client):
+        delay = 1.0 / self.rate if self.rate else 0
+        try:
+            if self.messages is not None:
+                while client["alive"]:
+                    for i, message in enumerate(self.messages):
+                        if not client["alive"]:
+                            return
+                        handler.send(client, message)
+                        pause = self.delays[i] if self.delays is not None else delay
+                        if pause:
+                            time.sleep(pause)
+                    if not self.loop:
+                        return
+            while client["alive"]:
+                symbols = list(client["symbols"])
+                if symbols:
+                    handler.send(client, json.dumps({"type": "trade", "data": self.trades(symbols)}))
+                else:
+                    handler.send(client, '{"type":"ping"}')
+                time.sleep(delay or 0.001)
+        except (ConnectionError, OSError):
+            client["alive"] = False
+
+    def trades(self, symbols):
+        now = int(time.time() * 1000)
+        data = []
+        for symbol in symbols:
+            price = self.prices.get(symbol, 100.0) * (1 + random.gauss(0, 0.0005))
+            self.prices[symbol] = price
+            data.append({"c": None, "p": round(price, 4), "s": symbol, "t": now, "v": round(random.random(), 6)})
+        return data
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        with self.clients_lock:
+            for handler, client in self.clients:
+                # Drop open connections too, so clients see the outage and reconnect
+                client["alive"] = False
+                try:
+                    handler.request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=50.0, help="messages per second per client")
+    parser.add_argument("--replay", help="NDJSON file of recorded WebSocket messages to replay")
+    args = parser.parse_args()
+    messages = None
+    if args.replay:
+        with open(args.replay) as file:
+            messages = [line.strip() for line in file if line.strip()]
+    server = FakeFinnhubServer(args.host, args.port, rate=args.rate, messages=messages)
+    print(f"Fake Finnhub feed on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
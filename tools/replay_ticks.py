@@ -0,0 +1,109 @@
+"""Replay ticks recorded in the tick journal (tick_journal.py), at their recorded pace or faster.
+
+By default the trade messages go through the live message path in this
+process (``LiveData.handle_message``: tick rings, live bars, their
+indicators and the /stream fan-out) and the run reports throughput and
+per-message handler latency, so the realtime path can be benchmarked
+offline.  ``--serve`` instead plays them on a fake Finnhub WebSocket for a
+running app, and ``--ndjson`` writes them for ``tools/fake_finnhub.py --replay``.
+
+    python tools/replay_ticks.py --journal cache/ticks --start 2024-11-14 --end 2024-11-15 --speed 0
+    python tools/replay_ticks.py --journal cache/ticks --symbols BINANCE:BTCUSDT --speed 10 --serve 8765
+    FINNHUB_WS_URL=ws://127.0.0.1:8765 flask --app service.py run
+
+Times are epoch milliseconds or ISO dates/times (UTC).
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tick_journal import TickJournal, replay
+
+
+def parse_time(value):
+    if value is None or value.isdigit():
+        return None if value is None else int(value)
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def replay_in_process(messages, speed):
+    """Feed the messages to a fresh ``LiveData`` (no feed connection, nothing journaled); returns the report."""
+    from live_data import LiveData
+
+    live = LiveData('ws://replay', [])
+    latencies = []
+
+    def handle(message):
+        started = time.perf_counter()
+        live.handle_message(message)
+        latencies.append(time.perf_counter() - started)
+
+    stats = replay(messages, handle, speed)
+    live.bar_aggregator.flush()  # Close the bars still open at the end of the recording
+    if latencies:
+        latencies = np.array(latencies) * 1e6
+        stats.update(p50_us=float(np.percentile(latencies, 50)), p99_us=float(np.percentile(latencies, 99)),
+                     max_us=float(latencies.max()))
+    stats['messages_per_second'] = stats['messages'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['ticks_per_second'] = stats['ticks'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['live_bars'] = live.bar_aggregator.stats()
+    stats['symbols'] = live.tick_store.stats()
+    return stats
+
+
+def serve(messages, speed, host, port):
+    """Play the recording to every client of a fake Finnhub WebSocket, spaced as recorded / ``speed``."""
+    from fake_finnhub import FakeFinnhubServer
+
+    received = [r for r, _ in messages]
+    delays = [(after - before) / 1e6 / speed if speed else 0.0 for before, after in zip(received, received[1:])] + [0.0]
+    server = FakeFinnhubServer(host, port, rate=0, messages=[json.dumps(m) for _, m in messages], loop=False,
+                               delays=delays)
+    print(f"Replaying {len(messages)} messages to each client of {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--journal", default=os.environ.get('TICK_JOURNAL_DIR', os.path.join(ROOT, 'cache', 'ticks')))
+    parser.add_argument("--symbols", help="comma-separated (default: every recorded symbol)")
+    parser.add_argument("--start", help="epoch ms or ISO time, inclusive")
+    parser.add_argument("--end", help="epoch ms or ISO time, exclusive")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 10 = ten times faster, 0 = no waiting")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="play on a fake Finnhub WebSocket instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ndjson", metavar="FILE", help="write the messages as NDJSON instead")
+    args = parser.parse_args()
+
+    journal = TickJournal(args.journal, record=False)
+    symbols = args.symbols.split(",") if args.symbols else None
+    messages = journal.messages(symbols, parse_time(args.start), parse_time(args.end))
+    if args.ndjson:
+        count = 0
+        with open(args.ndjson, 'w') as file:
+            for _, message in messages:
+                file.write(json.dumps(message) + "\n")
+                count += 1
+        print(f"Wrote {count} messages to {args.ndjson}")
+    elif args.serve is not None:
+        serve(list(messages), args.speed, args.host, args.serve)
+    else:
+        print(json.dumps(replay_in_process(messages, args.speed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
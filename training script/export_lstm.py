@@ -0,0 +1,65 @@
+"""Export the pickled Keras LSTM to ``model.npz`` for the NumPy runtime (``lstm_runtime.py``).
+
+Needs Keras/TensorFlow, like training; the services then serve the export
+without them.  After writing, the export is checked against
+``model.predict`` on min-max scaled random-walk windows; if they differ by
+more than ``--tolerance`` the export is deleted and the command fails.
+
+    python "training script/export_lstm.py"                                       # model/model.pkl -> model/model.npz
+    python "training script/export_lstm.py" --model model/lstm/2024-11-17/model.pkl --int8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(base_dir)
+
+from lstm_runtime import NumpyLSTM, export_lstm, npz_path, sample_windows
+from model_registry import load_pickle
+from result_cache import model_identity
+
+# Largest difference from model.predict accepted, in scaled price units (0..1 over the series' range)
+TOLERANCE = {'float32': 1e-4, 'int8': 1e-2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(base_dir, "model", "model.pkl"), help="pickled Keras model")
+    parser.add_argument("--output", default=None, help="default: model.npz next to --model")
+    parser.add_argument("--int8", action="store_true", help="store the LSTM kernels as int8 (about a third of the size)")
+    parser.add_argument("--windows", type=int, default=2000, help="windows scored by the parity check")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help=f"largest accepted difference (default {TOLERANCE['float32']} float32, {TOLERANCE['int8']} int8)")
+    args = parser.parse_args()
+
+    output = args.output or npz_path(args.model)
+    quantization = 'int8' if args.int8 else 'float32'
+    tolerance = args.tolerance if args.tolerance is not None else TOLERANCE[quantization]
+    model = load_pickle(args.model)
+    spec = export_lstm(model, output, quantize='int8' if args.int8 else None, source=model_identity(args.model))
+    print(f"Wrote {output} ({os.path.getsize(output) / 1024:.0f} KiB, {quantization}): "
+          + ", ".join(f"{layer['type']}({layer['units']})" for layer in spec['layers']))
+
+    # Parity with the pickled model
+    runtime = NumpyLSTM.load(output)
+    x = sample_windows(args.windows)
+    started = time.perf_counter()
+    expected = np.asarray(model.predict(x, verbose=0), dtype=np.float64)
+    keras_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    predicted = runtime.predict(x).astype(np.float64)
+    numpy_seconds = time.perf_counter() - started
+    error = np.abs(predicted - expected)
+    print(f"Parity on {len(x)} windows: max |diff| {error.max():.2e}, mean {error.mean():.2e} "
+          f"(keras {len(x) / keras_seconds:.0f} rows/s, numpy {len(x) / numpy_seconds:.0f} rows/s)")
+    if not error.max() <= tolerance:
+        os.remove(output)
+        sys.exit(f"Export differs from model.predict by more than {tolerance}; removed {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,18 +55,18 @@ cls = SVC().fit(X_train, y_train)
 with open("../model/svm.pkl", 'wb') as file:
     pickle.dump(cls, file)
 
-df['Predicted_Signal'] = cls.predict(X)
-# Calculate daily returns
-df['Return'] = df.Close.pct_change()
-# Calculate strategy returns
-df['Strategy_Return'] = df.Return *df.Predicted_Signal.shift(1)
-# Calculate Cumulutive returns
-df['Cum_Ret'] = df['Return'].cumsum()
-df
+import sys
+sys.path.append('..')
+from backtest import run_backtest
 
-# Plot Strategy Cumulative returns 
-df['Cum_Strategy'] = df['Strategy_Return'].cumsum()
-df
+df['Predicted_Signal'] = cls.predict(X)
+# Daily, strategy and cumulative returns, plus drawdown/Sharpe/hit rate/turnover
+result = run_backtest(df[['Close']].to_numpy(), df[['Predicted_Signal']].to_numpy())
+df['Return'] = result['returns'][:, 0]
+df['Strategy_Return'] = result['strategy_returns'][:, 0]
+df['Cum_Ret'] = result['cum_returns'][:, 0]
+df['Cum_Strategy'] = result['cum_strategy'][:, 0]
+{name: value[0] for name, value in result['metrics'].items()}
 
 
 import matplotlib.pyplot as plt
@@ -0,0 +1,109 @@
+"""Train the SVM on many symbols with walk-forward CV and a parallel grid search.
+
+Runs offline on the bars already in the bar cache (``BAR_CACHE_DIR``, the
+same store the services fill); ``--online`` lets the cache download missing
+bars first.  Feature matrices are cached in ``cache/features`` and every run
+writes ``model/svm/<version>/model.pkl`` plus ``metrics.json``.
+
+    python "training script/train_svm.py" --symbols META AAPL NVDA --grid C=0.1,1,10 gamma=scale,0.1
+    python "training script/train_svm.py" --symbols-file universe.txt --promote
+    python "training script/train_svm.py" --symbols META AAPL --features indicators
+    python "training script/train_svm.py" --symbols META --features Open-Close High-Low rsi_14 macd_hist
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(base_dir)
+
+from bar_cache import create_bar_cache
+from svm_pipeline import (DEFAULT_GRID, ENGINE, FEATURE_COLUMNS, FEATURE_VERSION, INDICATOR_COLUMNS, FeatureStore,
+                          fit_final, grid_search, parse_grid, write_artifact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", nargs="*", default=[])
+    parser.add_argument("--symbols-file", help="one symbol per line")
+    parser.add_argument("--start", default="2015-01-01")
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--grid", nargs="*", default=[], help="name=v1,v2 SVC parameters (default C, gamma)")
+    parser.add_argument("--features", nargs="*", default=None,
+                        help=f"feature columns, or 'indicators' for {INDICATOR_COLUMNS} "
+                             f"(default {FEATURE_COLUMNS}; any of {ENGINE.names})")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--max-samples", type=int, default=20000, help="most recent training rows per fit")
+    parser.add_argument("--metric", default="sharpe", choices=["sharpe", "accuracy", "total_return", "hit_rate"])
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--online", action="store_true", help="download missing bars through the bar cache")
+    parser.add_argument("--feature-dir", default=os.path.join(base_dir, "cache", "features"))
+    parser.add_argument("--model-dir", default=os.path.join(base_dir, "model"))
+    parser.add_argument("--promote", action="store_true", help="also copy the model to model/svm.pkl")
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as file:
+            symbols += [line.strip() for line in file if line.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        parser.error("no symbols given")
+    end = args.end or time.strftime('%Y-%m-%d')
+    columns = INDICATOR_COLUMNS if args.features == ['indicators'] else args.features or FEATURE_COLUMNS
+    try:
+        ENGINE.check([column for column in columns if column not in FEATURE_COLUMNS])
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Features: bars from the local cache, matrices from the feature cache when unchanged
+    bar_cache = create_bar_cache(base_dir)
+    store = FeatureStore(args.feature_dir, columns)
+    paths, used, built = [], [], 0
+    for symbol in symbols:
+        bars = bar_cache.get(symbol, args.start, end) if args.online else bar_cache.cached(symbol, args.start, end)
+        if bars is None or len(bars) < 2:
+            print(f"skip {symbol}: no cached bars (run with --online or warm the bar cache)")
+            continue
+        path, was_built = store.load_or_build(symbol, bars)
+        paths.append(path)
+        used.append(symbol)
+        built += was_built
+    if not paths:
+        sys.exit("No bars available for any symbol")
+    print(f"{len(paths)} symbols, {len(columns)} features, {built} feature matrices built, {len(paths) - built} from cache")
+
+    grid = parse_grid(args.grid) if args.grid else DEFAULT_GRID
+    started = time.perf_counter()
+    results = grid_search(paths, grid, folds=args.folds, max_samples=args.max_samples,
+                          workers=args.workers, metric=args.metric)
+    print(f"grid search: {len(results)} parameter sets x {args.folds} folds in {time.perf_counter() - started:.1f}s")
+    for result in results:
+        print(f"  {json.dumps(result['params'])}  " + "  ".join(f"{k}={v:.4f}" for k, v in result['mean'].items()))
+
+    best = results[0]
+    model = fit_final(paths, best['params'], max_samples=args.max_samples)
+    directory = write_artifact(args.model_dir, model, {
+        'params': best['params'],
+        'metric': args.metric,
+        'cv': best['mean'],
+        'grid': results,
+        'symbols': used,
+        'start': args.start,
+        'end': end,
+        'folds': args.folds,
+        'max_samples': args.max_samples,
+        'feature_version': FEATURE_VERSION,
+        'features': list(columns),
+    })
+    print(f"best {json.dumps(best['params'])} -> {directory}")
+    if args.promote:
+        shutil.copyfile(os.path.join(directory, 'model.pkl'), os.path.join(args.model_dir, 'svm.pkl'))
+        print(f"promoted to {os.path.join(args.model_dir, 'svm.pkl')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW = 60  # Number of past closing prices the LSTM looks at
+
+
+def lookback_windows(values, window=WINDOW, stride=1):
+    """Build the (n, window, 1) LSTM input for every step that has ``window`` values before it.
+
+    Row k holds ``values[k * stride : k * stride + window]``, the history that
+    precedes ``values[window + k * stride]``.  This is the same tensor the
+    ``for i in range(60, len(data))`` loops used to build, but returned as a
+    read-only strided view of ``values``, without copying anything.
+    """
+    values = np.asarray(values)
+    if values.ndim == 2:
+        values = values[:, 0]
+    if len(values) <= window:
+        return np.empty((0, window, 1), dtype=values.dtype)
+    windows = sliding_window_view(values[:-1], window)[::stride]
+    return windows[:, :, np.newaxis]
+
+
+def lookback_targets(values, window=WINDOW, stride=1):
+    """Values that follow each window of ``lookback_windows`` (the training targets)."""
+    values = np.asarray(values)
+    if values.ndim == 2:
+        values = values[:, 0]
+    return values[window::stride]